@@ -0,0 +1,121 @@
+"""
+Benchmark: paging a 5,000-track Apple Music library playlist with a fresh
+httpx.AsyncClient per page versus the shared pooled client.
+
+Runs against a local stand-in for the Apple Music API that returns 25-item
+pages with `next` links, exactly like `/me/library/playlists/{id}/tracks`.
+
+Usage (from backend/):
+    python -m benchmarks.apple_music_pooling [--tracks 5000] [--handshake-ms 20] [--runs 3]
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from benchmarks.stand_in import StandInServer, percentile
+
+PAGE_SIZE = 25
+
+
+def build_apple_stand_in(track_count: int) -> Starlette:
+    async def library_tracks(request: Request):
+        playlist_id = request.path_params["playlist_id"]
+        offset = int(request.query_params.get("offset", 0))
+        end = min(offset + PAGE_SIZE, track_count)
+        data = [
+            {
+                "id": f"i.{n}",
+                "type": "library-songs",
+                "attributes": {"name": f"Song {n}", "artistName": f"Artist {n % 300}", "durationInMillis": 200000},
+            }
+            for n in range(offset, end)
+        ]
+        body = {"data": data, "meta": {"total": track_count}}
+        if end < track_count:
+            body["next"] = f"/v1/me/library/playlists/{playlist_id}/tracks?offset={end}"
+        return JSONResponse(body)
+
+    return Starlette(routes=[Route("/v1/me/library/playlists/{playlist_id}/tracks", library_tracks)])
+
+
+async def run_once(service_cls, latencies):
+    service = service_cls(user_token="bench-user-token")
+    original = service._request
+
+    async def timed(method, endpoint, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await original(method, endpoint, **kwargs)
+        finally:
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    service._request = timed
+    tracks = await service.get_playlist_tracks("p.bench")
+    return len(tracks)
+
+
+async def main(args):
+    with StandInServer(build_apple_stand_in, process=True, handshake_delay=args.handshake_ms / 1000.0,
+                       track_count=args.tracks) as server:
+        os.environ["APPLE_DEVELOPER_TOKEN"] = "bench-developer-token"
+        os.environ["APPLE_MUSIC_API_BASE_URL"] = f"{server.url}/v1"
+        # Measure the transport, not the outbound rate limiter
+        os.environ.setdefault("APPLE_MUSIC_RATE_LIMIT", "1000000")
+        os.environ.setdefault("APPLE_MUSIC_RATE_BURST", "1000000")
+
+        from services import apple_music_service
+        from services.http_client import close_http_client
+        from services.apple_music_service import AppleMusicService
+
+        class UnpooledAppleMusicService(AppleMusicService):
+            """The previous behaviour: a new AsyncClient (and connection) per page."""
+
+            async def _request(self, method, endpoint, **kwargs):
+                if endpoint.startswith("/v1/"):
+                    endpoint = endpoint[3:]
+                async with httpx.AsyncClient() as client:
+                    response = await client.request(
+                        method, f"{apple_music_service.API_BASE_URL}{endpoint}", headers=self.headers, **kwargs
+                    )
+                    response.raise_for_status()
+                    return response.json()
+
+        results = {}
+        for label, cls in (("per_request_client", UnpooledAppleMusicService), ("shared_pooled_client", AppleMusicService)):
+            latencies, handshakes, wall = [], [], []
+            for _ in range(args.runs):
+                server.reset()
+                started = time.perf_counter()
+                fetched = await run_once(cls, latencies)
+                wall.append(time.perf_counter() - started)
+                stats = server.stats()
+                handshakes.append(stats["connections"])
+                assert fetched == args.tracks, f"expected {args.tracks} tracks, got {fetched}"
+            await close_http_client()
+            results[label] = {
+                "pages_per_run": stats["requests"],
+                "handshakes_per_run": max(handshakes),
+                "page_latency_p50_ms": round(percentile(latencies, 50), 3),
+                "page_latency_p99_ms": round(percentile(latencies, 99), 3),
+                "wall_time_s": round(min(wall), 3),
+            }
+
+    print(json.dumps({"benchmark": "apple_music_pooling", "tracks": args.tracks,
+                      "handshake_ms": args.handshake_ms, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=5000)
+    parser.add_argument("--handshake-ms", type=float, default=20.0,
+                        help="simulated TLS handshake cost per new connection")
+    parser.add_argument("--runs", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+"""
+Benchmark: vectorized fuzzy matching over a synthetic 10k x 50-candidate batch.
+
+Compares services.matching.score_batch against a straightforward pairwise
+Python implementation of the same score (trigram cosine per field plus
+duration). The Python baseline is timed on a sample of sources and
+extrapolated, since the full run takes minutes.
+
+Usage (from backend/):
+    python -m benchmarks.matching [--sources 10000] [--candidates 50] [--python-sample 500]
+"""
+import argparse
+import json
+import math
+import random
+import time
+from collections import Counter
+
+from services import matching
+
+WORDS = ("love night heart fire dream light rain summer blue road girl time wild gold city "
+         "moon dance river home ghost sugar shadow electric paradise midnight echo").split()
+
+
+def synthetic_track(rng: random.Random):
+    title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+    artist = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 2))).title()
+    album = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).title()
+    return (title, artist, album, rng.randint(120000, 360000), None)
+
+
+def variant(track, rng: random.Random):
+    title, artist, album, duration, isrc = track
+    decorations = ["", " - Remastered 2011", " (feat. Someone)", " [Radio Edit]", " (Live)"]
+    return (title + rng.choice(decorations), artist, album if rng.random() > 0.3 else None,
+            duration + rng.randint(-3000, 3000), isrc)
+
+
+def build_workload(sources: int, candidates: int, seed: int = 7):
+    rng = random.Random(seed)
+    src = [synthetic_track(rng) for _ in range(sources)]
+    cands = []
+    for track in src:
+        row = [synthetic_track(rng) for _ in range(candidates - 1)]
+        row.insert(rng.randrange(candidates), variant(track, rng))
+        cands.append(row)
+    return src, cands
+
+
+def _trigrams(text: str) -> Counter:
+    padded = f" {text} " if text else ""
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(count * b[gram] for gram, count in a.items())
+    return dot / (math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values())))
+
+
+def python_score(src, cand) -> float:
+    """The pairwise loop the vectorized engine replaces."""
+    title = _cosine(_trigrams(matching.normalize(src[0])), _trigrams(matching.normalize(cand[0])))
+    artist = _cosine(_trigrams(matching.normalize(src[1])), _trigrams(matching.normalize(cand[1])))
+    album = (_cosine(_trigrams(matching.normalize(src[2])), _trigrams(matching.normalize(cand[2])))
+             if src[2] and cand[2] else matching.UNKNOWN_SIMILARITY)
+    duration = max(0.0, 1.0 - abs(src[3] - cand[3]) / matching.DURATION_TOLERANCE_MS)
+    return (matching.TITLE_WEIGHT * title + matching.ARTIST_WEIGHT * artist
+            + matching.ALBUM_WEIGHT * album + matching.DURATION_WEIGHT * duration)
+
+
+def main(args):
+    src, cands = build_workload(args.sources, args.candidates)
+    pairs = args.sources * args.candidates
+
+    matching.normalize.cache_clear()
+    started = time.perf_counter()
+    results = matching.best_matches(src, cands)
+    vectorized_s = time.perf_counter() - started
+    matched = sum(1 for r in results if r is not None)
+
+    sample = min(args.python_sample, args.sources)
+    matching.normalize.cache_clear()
+    started = time.perf_counter()
+    for s, row in zip(src[:sample], cands[:sample]):
+        max(range(len(row)), key=lambda j: python_score(s, row[j]))
+    python_s = (time.perf_counter() - started) * args.sources / sample
+
+    print(json.dumps({
+        "benchmark": "matching",
+        "sources": args.sources,
+        "candidates_per_source": args.candidates,
+        "pairs": pairs,
+        "process_pool": pairs >= matching.PROCESS_POOL_MIN_PAIRS and matching.PROCESS_POOL_WORKERS > 1,
+        "vectorized": {"seconds": round(vectorized_s, 3), "pairs_per_sec": round(pairs / vectorized_s),
+                       "matched_sources": matched},
+        "python_pairwise": {"seconds_extrapolated": round(python_s, 3), "pairs_per_sec": round(pairs / python_s),
+                            "sampled_sources": sample},
+        "speedup": round(python_s / vectorized_s, 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sources", type=int, default=10000)
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--python-sample", type=int, default=500)
+    main(parser.parse_args())
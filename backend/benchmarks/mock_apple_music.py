@@ -0,0 +1,112 @@
+"""
+Local stand-in for the parts of the Apple Music API the converter uses.
+
+Library listings are paged with `next` links like the real API. Catalog
+songs are derived from the same synthetic catalog as the Spotify stand-in
+(track n is "Song n" by "Artist n % 500" with ISRC USRC1nnnnnnn), so a
+Spotify -> Apple Music transfer finds real matches by search and by ISRC.
+"""
+import asyncio
+import re
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from benchmarks.mock_spotify import make_track_item
+
+LIBRARY_PAGE_SIZE = 25
+MAX_LIBRARY_PAGE_SIZE = 100
+
+_SONG_NUMBER = re.compile(r"\bSong (\d+)\b", re.IGNORECASE)
+
+
+def make_catalog_song(n: int) -> dict:
+    track = make_track_item(n)["track"]
+    return {
+        "id": f"{1000000000 + n}",
+        "type": "songs",
+        "attributes": {
+            "name": track["name"],
+            "artistName": track["artists"][0]["name"],
+            "albumName": track["album"]["name"],
+            "durationInMillis": track["duration_ms"],
+            "isrc": track["external_ids"]["isrc"],
+        },
+    }
+
+
+def make_library_song(n: int, include_catalog: bool = False) -> dict:
+    # Like the real API, library songs have no ISRC; their catalog song does
+    song = make_catalog_song(n)
+    attributes = {key: value for key, value in song["attributes"].items() if key != "isrc"}
+    item = {"id": f"i.{n}", "type": "library-songs", "attributes": attributes}
+    if include_catalog:
+        item["relationships"] = {"catalog": {"href": f"/v1/me/library/songs/i.{n}/catalog", "data": [song]}}
+    return item
+
+
+def _library_page(request: Request, total: int, make_item, base_path: str) -> dict:
+    limit = min(int(request.query_params.get("limit", LIBRARY_PAGE_SIZE)), MAX_LIBRARY_PAGE_SIZE)
+    offset = int(request.query_params.get("offset", 0))
+    end = min(offset + limit, total)
+    body = {"data": [make_item(n) for n in range(offset, end)], "meta": {"total": total}}
+    if end < total:
+        include = request.query_params.get("include")
+        body["next"] = f"{base_path}?offset={end}&limit={limit}" + (f"&include={include}" if include else "")
+    return body
+
+
+def build_apple_music_stand_in(playlist_count: int = 50, track_count: int = 1000, latency: float = 0.0) -> Starlette:
+    async def delay():
+        if latency:
+            await asyncio.sleep(latency)
+
+    async def library_playlists(request: Request):
+        await delay()
+        if request.method == "POST":
+            return JSONResponse({"data": [{"id": "p.created", "type": "library-playlists"}]}, status_code=201)
+        return JSONResponse(_library_page(request, playlist_count, lambda n: {
+            "id": f"p.{n}",
+            "type": "library-playlists",
+            "attributes": {"name": f"Playlist {n}", "description": {"standard": ""}, "trackCount": track_count,
+                           "isPublic": False, "lastModifiedDate": "2024-01-01T00:00:00Z"},
+        }, "/v1/me/library/playlists"))
+
+    async def library_playlist(request: Request):
+        await delay()
+        return JSONResponse({"data": [{
+            "id": request.path_params["playlist_id"],
+            "type": "library-playlists",
+            "attributes": {"name": "Playlist", "lastModifiedDate": f"2024-01-01T00:00:{track_count % 60:02d}Z"},
+        }]})
+
+    async def library_playlist_tracks(request: Request):
+        await delay()
+        playlist_id = request.path_params["playlist_id"]
+        if request.method == "POST":
+            return Response(status_code=204)
+        include_catalog = "catalog" in request.query_params.get("include", "").split(",")
+        return JSONResponse(_library_page(request, track_count, lambda n: make_library_song(n, include_catalog),
+                                          f"/v1/me/library/playlists/{playlist_id}/tracks"))
+
+    async def search(request: Request):
+        await delay()
+        match = _SONG_NUMBER.search(request.query_params.get("term", ""))
+        songs = [make_catalog_song(int(match.group(1)))] if match else []
+        return JSONResponse({"results": {"songs": {"data": songs}}} if songs else {"results": {}})
+
+    async def songs_by_isrc(request: Request):
+        await delay()
+        codes = [c for c in request.query_params.get("filter[isrc]", "").split(",") if c]
+        data = [make_catalog_song(int(code[5:])) for code in codes if code.upper().startswith("USRC1")]
+        return JSONResponse({"data": data})
+
+    return Starlette(routes=[
+        Route("/v1/me/library/playlists", library_playlists, methods=["GET", "POST"]),
+        Route("/v1/me/library/playlists/{playlist_id}", library_playlist),
+        Route("/v1/me/library/playlists/{playlist_id}/tracks", library_playlist_tracks, methods=["GET", "POST"]),
+        Route("/v1/catalog/{storefront}/search", search),
+        Route("/v1/catalog/{storefront}/songs", songs_by_isrc),
+    ])
@@ -0,0 +1,175 @@
+"""
+Local stand-in for the parts of the Spotify Web API the converter uses.
+
+Pages, `total`/`limit`/`next` fields and item shapes follow the real API
+closely enough for SpotifyService; response latency is configurable.
+Playlist items come back as full as the real ones (market lists, album art,
+URLs) unless trimmed with the `fields` parameter, which is honoured.
+"""
+import asyncio
+from typing import Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+
+def _page(request: Request, total: int, max_limit: int, make_item):
+    limit = min(int(request.query_params.get("limit", 20)), max_limit)
+    offset = int(request.query_params.get("offset", 0))
+    end = min(offset + limit, total)
+    base = str(request.url.remove_query_params(["limit", "offset"]))
+    return {
+        "items": [make_item(n) for n in range(offset, end)],
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "next": f"{base}?offset={end}&limit={limit}" if end < total else None,
+    }
+
+
+def make_track_item(n: int) -> dict:
+    return {
+        "added_at": "2024-01-01T00:00:00Z",
+        "track": {
+            "id": f"track{n}",
+            "uri": f"spotify:track:track{n}",
+            "name": f"Song {n}",
+            "duration_ms": 180000 + n % 60000,
+            "artists": [{"id": f"artist{n % 500}", "name": f"Artist {n % 500}"}],
+            "album": {"id": f"album{n % 2000}", "name": f"Album {n % 2000}"},
+            "external_ids": {"isrc": f"USRC1{n:07d}"},
+        },
+    }
+
+
+# Spotify lists ~185 markets per track and again per album; stand-in codes
+MARKETS = [a + b for a in "ABCDEFGHIJKLMNOPQRSTUVWXYZ" for b in "ABCDEFG"][:185]
+
+
+def _resource(kind: str, resource_id: str, **extra) -> dict:
+    return {
+        "external_urls": {"spotify": f"https://open.spotify.com/{kind}/{resource_id}"},
+        "href": f"https://api.spotify.com/v1/{kind}s/{resource_id}",
+        "id": resource_id,
+        "type": kind,
+        "uri": f"spotify:{kind}:{resource_id}",
+        **extra,
+    }
+
+
+def make_full_track_item(n: int) -> dict:
+    """make_track_item with everything else a real playlist item carries."""
+    slim = make_track_item(n)
+    track = slim["track"]
+    artists = [_resource("artist", a["id"], name=a["name"]) for a in track["artists"]]
+    album = _resource(
+        "album", track["album"]["id"], name=track["album"]["name"], album_type="album", artists=artists,
+        available_markets=MARKETS, release_date="2020-01-01", release_date_precision="day", total_tracks=12,
+        images=[{"height": size, "width": size, "url": f"https://i.scdn.co/image/{track['album']['id']}{size:04d}"
+                                                       f"a5b2c1d0e9f8a7b6c5d4e3f2a1b0"}
+                for size in (640, 300, 64)],
+    )
+    return {
+        "added_at": slim["added_at"],
+        "added_by": _resource("user", "bench-user"),
+        "is_local": False,
+        "primary_color": None,
+        "video_thumbnail": {"url": None},
+        "track": _resource(
+            "track", track["id"], name=track["name"], duration_ms=track["duration_ms"], artists=artists,
+            album=album, available_markets=MARKETS, external_ids=track["external_ids"], disc_number=1,
+            track_number=n % 12 + 1, explicit=False, popularity=n % 100, is_local=False, episode=False,
+            track=True, preview_url=f"https://p.scdn.co/mp3-preview/{track['id']}0f1e2d3c4b5a69788796a5b4c3d2e1f0",
+        ),
+    }
+
+
+def parse_fields(fields: str) -> dict:
+    """Parses a `fields` filter such as "total,items(track(name,album(name)))" into nested dicts."""
+    root: dict = {}
+    stack = [root]
+    name = ""
+    for char in fields + ",":
+        if char in ",()" and name:
+            stack[-1][name.strip()] = None
+        if char == "(":
+            stack[-1][name.strip()] = {}
+            stack.append(stack[-1][name.strip()])
+        elif char == ")":
+            stack.pop()
+        if char in ",()":
+            name = ""
+        else:
+            name += char
+    return root
+
+
+def apply_fields(value, spec: Optional[dict]):
+    if spec is None:
+        return value
+    if isinstance(value, list):
+        return [apply_fields(v, spec) for v in value]
+    if isinstance(value, dict):
+        return {k: apply_fields(value[k], sub) for k, sub in spec.items() if k in value}
+    return value
+
+
+def build_spotify_stand_in(playlist_count: int = 50, track_count: int = 1000, latency: float = 0.0) -> Starlette:
+    async def delay():
+        if latency:
+            await asyncio.sleep(latency)
+
+    async def me(request: Request):
+        await delay()
+        return JSONResponse({"id": "bench-user", "display_name": "Bench User", "email": None})
+
+    async def my_playlists(request: Request):
+        await delay()
+        return JSONResponse(_page(request, playlist_count, 50, lambda n: {
+            "id": f"playlist{n}",
+            "name": f"Playlist {n}",
+            "description": "",
+            "public": True,
+            "snapshot_id": f"snap{n}",
+            "owner": {"display_name": "Bench User"},
+            "images": [],
+            "tracks": {"total": track_count},
+        }))
+
+    async def playlist(request: Request):
+        await delay()
+        return JSONResponse({"id": request.path_params["playlist_id"], "snapshot_id": f"snap-{track_count}"})
+
+    async def playlist_tracks(request: Request):
+        await delay()
+        if request.method == "DELETE":
+            return JSONResponse({"snapshot_id": f"snap-{track_count}-removed"})
+        if request.method == "POST":
+            body = await request.json()
+            return JSONResponse({"snapshot_id": f"snap-{len(body.get('uris', []))}"}, status_code=201)
+        page = _page(request, track_count, 100, make_full_track_item)
+        fields = request.query_params.get("fields")
+        return JSONResponse(apply_fields(page, parse_fields(fields)) if fields else page)
+
+    async def search(request: Request):
+        await delay()
+        q = request.query_params.get("q", "")
+        page = _page(request, 1, 50, lambda n: make_track_item(abs(hash(q)) % 100000)["track"])
+        return JSONResponse({"tracks": page})
+
+    async def create_playlist(request: Request):
+        await delay()
+        body = await request.json()
+        return JSONResponse({"id": "created-playlist", "name": body.get("name"), "snapshot_id": "snap0"},
+                            status_code=201)
+
+    return Starlette(routes=[
+        Route("/v1/me", me),
+        Route("/v1/me/playlists", my_playlists),
+        Route("/v1/playlists/{playlist_id}", playlist),
+        Route("/v1/playlists/{playlist_id}/tracks", playlist_tracks, methods=["GET", "POST", "DELETE"]),
+        Route("/v1/search", search),
+        Route("/v1/users/{user_id}/playlists", create_playlist, methods=["POST"]),
+    ])
@@ -0,0 +1,138 @@
+"""
+Local stand-in for YouTube Music, plus a client for it.
+
+ytmusicapi talks to the private InnerTube API, whose renderer-heavy
+responses are impractical to imitate faithfully. Instead the stand-in
+serves simplified JSON on the same endpoint paths (`browse`, `search`,
+`playlist/create`, `browse/edit_playlist`). It uses the same paging:
+library playlists come 25 per page and playlist tracks 100 per
+continuation. StandInYTMusic implements the client methods
+YouTubeMusicService calls (YTMusicClient's), with ytmusicapi's default
+limits, and sends its requests through the same scheduled `requests`
+session. Passed as
+YouTubeMusicService(client=...), it exercises the service, the outbound
+scheduler and real HTTP; only ytmusicapi's response parsing is left out.
+"""
+import asyncio
+from typing import Iterator, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from benchmarks.mock_spotify import make_track_item
+from services.youtube_music_service import ScheduledHTTPAdapter, scheduled_session
+
+LIBRARY_PAGE_SIZE = 25
+PLAYLIST_PAGE_SIZE = 100
+
+
+def make_ytm_track(n: int) -> dict:
+    track = make_track_item(n)["track"]
+    return {
+        "videoId": f"vid{n:07d}",
+        "title": track["name"],
+        "artists": [{"name": track["artists"][0]["name"], "id": track["artists"][0]["id"]}],
+        "album": {"name": track["album"]["name"], "id": track["album"]["id"]},
+        "duration_seconds": track["duration_ms"] // 1000,
+        "resultType": "song",
+    }
+
+
+def _continued(items_total: int, page_size: int, continuation: Optional[str], make_item) -> dict:
+    offset = int(continuation or 0)
+    end = min(offset + page_size, items_total)
+    return {"items": [make_item(n) for n in range(offset, end)],
+            "continuation": str(end) if end < items_total else None}
+
+
+def build_youtube_music_stand_in(playlist_count: int = 50, track_count: int = 1000, latency: float = 0.0) -> Starlette:
+    async def delay():
+        if latency:
+            await asyncio.sleep(latency)
+
+    async def browse(request: Request):
+        await delay()
+        body = await request.json()
+        browse_id = body.get("browseId", "")
+        if browse_id == "FEmusic_liked_playlists":
+            return JSONResponse(_continued(playlist_count, LIBRARY_PAGE_SIZE, body.get("continuation"), lambda n: {
+                "playlistId": f"PL{n:06d}", "title": f"Playlist {n}", "description": "", "count": str(track_count),
+            }))
+        return JSONResponse(_continued(track_count, PLAYLIST_PAGE_SIZE, body.get("continuation"), make_ytm_track))
+
+    async def search(request: Request):
+        await delay()
+        query = (await request.json()).get("query", "")
+        words = query.split()
+        # "Song <n> ..." queries resolve to catalog track n, like a relevant first hit
+        if len(words) > 1 and words[0] == "Song" and words[1].isdigit():
+            return JSONResponse({"items": [make_ytm_track(int(words[1]))]})
+        return JSONResponse({"items": []})
+
+    async def create_playlist(request: Request):
+        await delay()
+        return JSONResponse({"playlistId": "PLcreated"})
+
+    async def edit_playlist(request: Request):
+        await delay()
+        return JSONResponse({"status": "STATUS_SUCCEEDED"})
+
+    return Starlette(routes=[
+        Route("/youtubei/v1/browse", browse, methods=["POST"]),
+        Route("/youtubei/v1/search", search, methods=["POST"]),
+        Route("/youtubei/v1/playlist/create", create_playlist, methods=["POST"]),
+        Route("/youtubei/v1/browse/edit_playlist", edit_playlist, methods=["POST"]),
+    ])
+
+
+class StandInYTMusic:
+    """The subset of ytmusicapi.YTMusic that YouTubeMusicService uses, backed by the stand-in."""
+
+    def __init__(self, base_url: str, user_key: str = "bench-user"):
+        self.base_url = base_url
+        self.session = scheduled_session(user_key)
+        # The stand-in is plain HTTP; route it through the scheduler like https://
+        self.session.mount("http://", ScheduledHTTPAdapter(user_key))
+
+    def _post(self, endpoint: str, body: dict) -> dict:
+        response = self.session.post(f"{self.base_url}/youtubei/v1/{endpoint}", json=body, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def _browse_pages(self, browse_id: str) -> Iterator[List[dict]]:
+        continuation = None
+        while True:
+            page = self._post("browse", {"browseId": browse_id, "continuation": continuation})
+            yield page["items"]
+            continuation = page["continuation"]
+            if continuation is None:
+                return
+
+    def _browse_all(self, browse_id: str, limit: Optional[int]) -> List[dict]:
+        items = []
+        for page in self._browse_pages(browse_id):
+            items.extend(page)
+            if limit is not None and len(items) >= limit:
+                return items[:limit]
+        return items
+
+    def get_library_playlists(self, limit: Optional[int] = 25) -> List[dict]:
+        return self._browse_all("FEmusic_liked_playlists", limit)
+
+    def get_playlist(self, playlistId: str, limit: Optional[int] = 100, related: bool = False,
+                     suggestions_limit: int = 0) -> dict:
+        return {"id": playlistId, "tracks": self._browse_all(f"VL{playlistId}", limit)}
+
+    def iter_playlist_pages(self, playlistId: str) -> Iterator[List[dict]]:
+        return self._browse_pages(f"VL{playlistId}")
+
+    def search(self, query: str, filter: Optional[str] = None, limit: int = 20, **kwargs) -> List[dict]:
+        return self._post("search", {"query": query, "filter": filter})["items"][:limit]
+
+    def create_playlist(self, title: str, description: str, **kwargs) -> str:
+        return self._post("playlist/create", {"title": title, "description": description})["playlistId"]
+
+    def add_playlist_items(self, playlistId: str, videoIds: List[str], **kwargs) -> dict:
+        return self._post("browse/edit_playlist", {"playlistId": playlistId, "videoIds": videoIds})
@@ -0,0 +1,195 @@
+"""
+Benchmark: bytes on the wire and parse time per 1,000 tracks, upstream and
+in our own responses.
+
+  spotify_playlist_items  pages of a --tracks track playlist from the Spotify
+                          stand-in (gzip, like the real API), full items
+                          against items trimmed with PLAYLIST_TRACKS_FIELDS
+  apple_music_tracks      the same playlist from the Apple Music stand-in at
+                          the default page size against LIBRARY_TRACKS_PAGE_SIZE
+                          with the catalog songs (for ISRCs) included
+  api_tracks              our NDJSON track stream of that playlist through the
+                          FastAPI app, without and with Accept-Encoding: gzip
+  api_playlists           our playlist list of --playlists playlists, the same
+
+For each: requests, body bytes (decoded), wire bytes (as transferred) and the
+client's parse time (decompress + JSON decode + map to track rows), median
+of --repeat parses, all scaled to 1,000 tracks (per playlist list for
+api_playlists).
+
+Usage (from backend/):
+    python -m benchmarks.payloads [--tracks 1000] [--playlists 200] [--repeat 20]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+from starlette.middleware.gzip import GZipMiddleware
+
+from benchmarks.mock_apple_music import LIBRARY_PAGE_SIZE, build_apple_music_stand_in
+from benchmarks.mock_spotify import build_spotify_stand_in
+from benchmarks.stand_in import StandInServer
+from benchmarks.suite import configure_environment
+
+
+def build_gzip_spotify_stand_in(**kwargs):
+    return GZipMiddleware(build_spotify_stand_in(**kwargs))
+
+
+def fetch_pages(base_url: str, path: str, params: dict) -> list:
+    """Follows a listing's `next` links to its end; returns the raw responses."""
+    responses = []
+    with httpx.Client(base_url=base_url) as client:
+        response = client.get(path, params=params)
+        while True:
+            response.raise_for_status()
+            responses.append(response)
+            # The query (limit, include) is carried over into `next`
+            url = response.json().get("next")
+            if not url:
+                return responses
+            response = client.get(url)
+
+
+def fetch_offset_pages(base_url: str, path: str, params: dict) -> list:
+    """Pages by offset up to `total`, as SpotifyService does (`next` may be trimmed away)."""
+    with httpx.Client(base_url=base_url) as client:
+        responses = [client.get(path, params={**params, "offset": 0})]
+        first = responses[0].raise_for_status().json()
+        for offset in range(first["limit"], first["total"], first["limit"]):
+            responses.append(client.get(path, params={**params, "offset": offset}).raise_for_status())
+    return responses
+
+
+def parse_ms(bodies: list, parse, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for body in bodies:
+            parse(body)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def measure(responses: list, parse, repeat: int, scale: float) -> dict:
+    bodies = [r.content for r in responses]
+    return {
+        "requests": round(len(responses) * scale, 1),
+        "body_bytes": round(sum(len(b) for b in bodies) * scale),
+        "wire_bytes": round(sum(r.num_bytes_downloaded for r in responses) * scale),
+        "parse_ms": round(parse_ms(bodies, parse, repeat) * scale, 2),
+    }
+
+
+def measure_wire(wire: list, decode, parse, repeat: int, scale: float) -> dict:
+    """Like measure, for bodies as transferred: parsing includes decompressing them."""
+    return {
+        "requests": round(len(wire) * scale, 1),
+        "body_bytes": round(sum(len(decode(b)) for b in wire) * scale),
+        "wire_bytes": round(sum(len(b) for b in wire) * scale),
+        "parse_ms": round(parse_ms(wire, lambda b: parse(decode(b)), repeat) * scale, 2),
+    }
+
+
+def compare(before: dict, after: dict) -> dict:
+    return {
+        "before": before,
+        "after": after,
+        "wire_bytes_saved_pct": round((1 - after["wire_bytes"] / before["wire_bytes"]) * 100, 1),
+        "parse_speedup": round(before["parse_ms"] / after["parse_ms"], 2) if after["parse_ms"] else None,
+    }
+
+
+def spotify_playlist_items(server, args) -> dict:
+    from routes.playlists import spotify_track_row
+    from services.spotify_service import PLAYLIST_TRACKS_FIELDS, PLAYLIST_TRACKS_PAGE_SIZE
+
+    def parse(body: bytes):
+        return [spotify_track_row(item) for item in json.loads(body)["items"]]
+
+    path = "/v1/playlists/bench/tracks"
+    full = fetch_offset_pages(server.url, path, {"limit": PLAYLIST_TRACKS_PAGE_SIZE})
+    slim = fetch_offset_pages(server.url, path, {"limit": PLAYLIST_TRACKS_PAGE_SIZE, "fields": PLAYLIST_TRACKS_FIELDS})
+    scale = 1000 / args.tracks
+    return compare(measure(full, parse, args.repeat, scale), measure(slim, parse, args.repeat, scale))
+
+
+def apple_music_tracks(server, args) -> dict:
+    from routes.playlists import apple_music_track_row
+    from services.apple_music_service import LIBRARY_TRACKS_INCLUDE, LIBRARY_TRACKS_PAGE_SIZE
+
+    def parse(body: bytes):
+        return [apple_music_track_row(item) for item in json.loads(body)["data"]]
+
+    path = "/v1/me/library/playlists/p.0/tracks"
+    default = fetch_pages(server.url, path, {})
+    tuned = fetch_pages(server.url, path, {"limit": LIBRARY_TRACKS_PAGE_SIZE, "include": LIBRARY_TRACKS_INCLUDE})
+    scale = 1000 / args.tracks
+    return {**compare(measure(default, parse, args.repeat, scale), measure(tuned, parse, args.repeat, scale)),
+            "default_page_size": LIBRARY_PAGE_SIZE, "page_size": LIBRARY_TRACKS_PAGE_SIZE}
+
+
+async def api_responses(args) -> dict:
+    """Our own responses, as received by a browser with and without gzip."""
+    import gzip
+    from main import app, GZIP_LEVEL
+    from services.rate_scheduler import outbound
+    outbound.attach(asyncio.get_running_loop())
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/auth/apple-music", json={"userToken": "bench-user-token"})
+        response.raise_for_status()
+
+        async def fetch(path: str, encoding: str) -> bytes:
+            # Read raw, so the bytes are what went over the wire
+            async with client.stream("GET", path, headers={"Accept-Encoding": encoding}) as response:
+                response.raise_for_status()
+                return b"".join([chunk async for chunk in response.aiter_raw()])
+
+        def parse_ndjson(body: bytes):
+            return [json.loads(line) for line in body.splitlines() if line]
+
+        results = {}
+        for name, path, parse, scale in (
+            ("api_tracks", "/api/playlists/apple-music/p.0/tracks", parse_ndjson, 1000 / args.tracks),
+            ("api_playlists", "/api/playlists/apple-music", json.loads, 1.0),
+        ):
+            plain = await fetch(path, "identity")
+            compressed = await fetch(path, "gzip")
+            results[name] = compare(measure_wire([plain], lambda b: b, parse, args.repeat, scale),
+                                    measure_wire([compressed], gzip.decompress, parse, args.repeat, scale))
+        results["gzip_level"] = GZIP_LEVEL
+        return results
+
+
+def main(args):
+    with StandInServer(build_gzip_spotify_stand_in, process=True, track_count=args.tracks) as spotify, \
+            StandInServer(build_apple_music_stand_in, process=True, playlist_count=args.playlists,
+                          track_count=args.tracks) as apple_music:
+        configure_environment(argparse.Namespace(upstream_rps=10000.0),
+                              {"spotify": spotify, "apple-music": apple_music})
+        results = {
+            "spotify_playlist_items": spotify_playlist_items(spotify, args),
+            "apple_music_tracks": apple_music_tracks(apple_music, args),
+            **asyncio.run(api_responses(args)),
+        }
+
+    print(json.dumps({
+        "benchmark": "payloads",
+        "tracks": args.tracks,
+        "playlists": args.playlists,
+        "per": "1000 tracks",
+        **results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--playlists", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,115 @@
+"""
+Load test: spotipy + asyncio.to_thread versus the native async SpotifyClient.
+
+Simulated users repeatedly load their profile and full playlist list from a
+local mock Spotify API (in a separate process). Reports upstream requests/sec
+and the peak number of threads in the process for each implementation.
+
+The default latency approximates a cloud-to-Spotify round trip. With very low
+latency both implementations are bound by local CPU instead of waiting on the
+network, which is not the situation this benchmark is meant to model.
+
+Usage (from backend/):
+    python -m benchmarks.spotify_load [--users 100] [--duration 5] [--latency-ms 150]
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+
+from benchmarks.mock_spotify import build_spotify_stand_in
+from benchmarks.stand_in import StandInServer
+
+
+class SpotipyThreadedService:
+    """The previous implementation: synchronous spotipy calls run in worker threads."""
+
+    def __init__(self, access_token: str, prefix: str):
+        import spotipy
+        self.client = spotipy.Spotify(auth=access_token)
+        self.client.prefix = prefix
+
+    async def get_current_user(self):
+        return await asyncio.to_thread(self.client.current_user)
+
+    async def get_user_playlists(self):
+        results = await asyncio.to_thread(self.client.current_user_playlists)
+        playlists = []
+        while results:
+            playlists.extend(results['items'])
+            results = await asyncio.to_thread(self.client.next, results) if results['next'] else None
+        return playlists
+
+
+async def run(make_service, users: int, duration: float, server: StandInServer):
+    peak_threads = threading.active_count()
+    stop = time.perf_counter() + duration
+
+    async def sample_threads():
+        nonlocal peak_threads
+        while time.perf_counter() < stop:
+            peak_threads = max(peak_threads, threading.active_count())
+            await asyncio.sleep(0.01)
+
+    async def user():
+        service = make_service()
+        while time.perf_counter() < stop:
+            await service.get_current_user()
+            await service.get_user_playlists()
+
+    server.reset()
+    started = time.perf_counter()
+    await asyncio.gather(sample_threads(), *(user() for _ in range(users)))
+    elapsed = time.perf_counter() - started
+    requests = server.stats()["requests"]
+
+    from services.http_client import close_http_client
+    await close_http_client()
+    return {
+        "upstream_requests": requests,
+        "requests_per_sec": round(requests / elapsed, 1),
+        "peak_threads": peak_threads,
+    }
+
+
+def main(args):
+    with StandInServer(build_spotify_stand_in, process=True, playlist_count=args.playlists,
+                       latency=args.latency_ms / 1000.0) as server:
+        os.environ["SPOTIFY_API_BASE_URL"] = f"{server.url}/v1"
+        # Measure the client, not the outbound rate limiter
+        os.environ.setdefault("SPOTIFY_RATE_LIMIT", "1000000")
+        os.environ.setdefault("SPOTIFY_RATE_BURST", "1000000")
+        from services.spotify_client import SpotifyClient
+        from services.spotify_service import SpotifyService
+
+        def native_service():
+            # Skip SpotifyOAuth construction; only the API client matters here
+            service = SpotifyService.__new__(SpotifyService)
+            service.client = SpotifyClient("bench-token")
+            return service
+
+        def spotipy_service():
+            return SpotipyThreadedService("bench-token", f"{server.url}/v1/")
+
+        baseline_threads = threading.active_count()
+        # Each implementation gets its own event loop, so worker threads
+        # started by one run do not count against the other.
+        results = {
+            "spotipy_to_thread": asyncio.run(run(spotipy_service, args.users, args.duration, server)),
+            "native_async": asyncio.run(run(native_service, args.users, args.duration, server)),
+        }
+
+    print(json.dumps({"benchmark": "spotify_load", "users": args.users, "duration_s": args.duration,
+                      "latency_ms": args.latency_ms, "baseline_threads": baseline_threads,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--latency-ms", type=float, default=150.0)
+    parser.add_argument("--playlists", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,152 @@
+"""
+Helpers for running local stand-in servers that imitate upstream music APIs.
+
+The stand-ins are plain ASGI apps served by uvicorn, either on a background
+thread or in a separate process (so the server does not compete with the
+code under test for the GIL). Benchmarks exercise the real service code over
+real sockets without touching Spotify, Apple Music or YouTube Music.
+"""
+import asyncio
+import json
+import multiprocessing
+import socket
+import threading
+import time
+from typing import Callable, Set, Tuple
+
+import httpx
+import uvicorn
+
+STATS_PATH = "/__stand_in/stats"
+RESET_PATH = "/__stand_in/reset"
+
+
+class ConnectionCounter:
+    """
+    ASGI middleware that counts requests and distinct client connections.
+
+    Each TCP connection has its own (host, port) pair, so the number of unique
+    `scope["client"]` values is the number of handshakes the client paid for.
+    A per-connection delay can be injected to model TLS handshake latency,
+    which plain loopback HTTP would otherwise hide. With `rate_limit` set,
+    requests beyond a token bucket of that rate get 429 with Retry-After, as
+    the real APIs do. Counters are read and reset over HTTP so they work when
+    the server runs in another process.
+    """
+
+    def __init__(self, app: Callable, handshake_delay: float = 0.0, rate_limit: float = 0.0, burst: int = 0):
+        self.app = app
+        self.handshake_delay = handshake_delay
+        self.rate_limit = rate_limit
+        self.burst = burst or max(1, int(rate_limit))
+        self.tokens = float(self.burst)
+        self.refilled = time.monotonic()
+        self.connections: Set[Tuple[str, int]] = set()
+        self.requests = 0
+        self.throttled = 0
+
+    def _allow(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled) * self.rate_limit)
+        self.refilled = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            if scope["path"] in (STATS_PATH, RESET_PATH):
+                if scope["path"] == RESET_PATH:
+                    self.connections.clear()
+                    self.requests = 0
+                    self.throttled = 0
+                body = json.dumps({"requests": self.requests, "connections": len(self.connections),
+                                   "throttled": self.throttled}).encode()
+                await send({"type": "http.response.start", "status": 200,
+                            "headers": [(b"content-type", b"application/json")]})
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            self.requests += 1
+            client = tuple(scope.get("client") or ("", 0))
+            if client not in self.connections:
+                self.connections.add(client)
+                if self.handshake_delay:
+                    await asyncio.sleep(self.handshake_delay)
+
+            if self.rate_limit and not self._allow():
+                self.throttled += 1
+                retry_after = str(max(1, round((1 - self.tokens) / self.rate_limit)))
+                await send({"type": "http.response.start", "status": 429,
+                            "headers": [(b"retry-after", retry_after.encode())]})
+                await send({"type": "http.response.body", "body": b""})
+                return
+        await self.app(scope, receive, send)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(factory: Callable, factory_kwargs: dict, handshake_delay: float, rate_limit: float, port: int):
+    app = ConnectionCounter(factory(**factory_kwargs), handshake_delay=handshake_delay, rate_limit=rate_limit)
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+
+
+class StandInServer:
+    """
+    Serves `factory(**factory_kwargs)` for the duration of a `with` block.
+
+    With `process=True` the server runs in a child process; `factory` must
+    then be a module-level function so it can be pickled.
+    """
+
+    def __init__(self, factory: Callable, process: bool = False, handshake_delay: float = 0.0,
+                 rate_limit: float = 0.0, **factory_kwargs):
+        self.port = free_port()
+        args = (factory, factory_kwargs, handshake_delay, rate_limit, self.port)
+        if process:
+            self.worker = multiprocessing.get_context("spawn").Process(target=_serve, args=args, daemon=True)
+        else:
+            self.worker = threading.Thread(target=_serve, args=args, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def stats(self) -> dict:
+        return httpx.get(f"{self.url}{STATS_PATH}").json()
+
+    def reset(self) -> dict:
+        return httpx.post(f"{self.url}{RESET_PATH}").json()
+
+    def __enter__(self):
+        self.worker.start()
+        deadline = time.time() + 20
+        while True:
+            try:
+                self.stats()
+                return self
+            except httpx.TransportError:
+                if time.time() > deadline:
+                    raise RuntimeError("Stand-in server failed to start")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        if isinstance(self.worker, threading.Thread):
+            # uvicorn installs no signal handlers off the main thread; the
+            # daemon thread is torn down with the process.
+            return
+        self.worker.terminate()
+        self.worker.join(timeout=5)
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
@@ -0,0 +1,122 @@
+"""
+Benchmark: worker cold start and per-request service construction.
+
+Measures, each in fresh interpreters (median of --runs):
+  - time to import the app (`import main`) with the lazy platform registry,
+    then, in the same interpreter, what loading every platform module and
+    spotipy's OAuth adds on top: the part of startup that used to be eager
+  - first use of each platform: loading its service module and SDK
+and in-process (mean of --iterations):
+  - constructing a SpotifyService for a request with the shared OAuth
+    object, against also building a SpotifyOAuth as every request used to
+
+Usage (from backend/):
+    python -m benchmarks.startup [--runs 7] [--iterations 20000]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ENVIRONMENT = {
+    "SPOTIFY_CLIENT_ID": "bench-client-id",
+    "SPOTIFY_CLIENT_SECRET": "bench-client-secret",
+    "APPLE_DEVELOPER_TOKEN": "bench-developer-token",
+    "LOG_LEVEL": "WARNING",
+}
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+app_seconds = time.perf_counter() - started
+sdks = [m for m in ("spotipy", "ytmusicapi", "requests") if m in sys.modules]
+started = time.perf_counter()
+import services.spotify_service, services.apple_music_service, services.youtube_music_service, spotipy.oauth2
+print(json.dumps({"app_seconds": app_seconds, "eager_seconds": time.perf_counter() - started,
+                  "sdks_loaded": sdks}))
+"""
+
+FIRST_USE_PROBE = """
+import json, time
+import main
+from services.platforms import get_adapter
+started = time.perf_counter()
+get_adapter({platform!r}).service_class
+print(json.dumps({{"seconds": time.perf_counter() - started}}))
+"""
+
+
+def run_probe(code: str) -> dict:
+    env = {**os.environ, **{k: v for k, v in ENVIRONMENT.items() if k not in os.environ}}
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, env=env)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def summarize_ms(seconds) -> dict:
+    return {"median_ms": round(statistics.median(seconds) * 1000, 1), "min_ms": round(min(seconds) * 1000, 1)}
+
+
+def per_call_us(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - started) / iterations * 1e6, 2)
+
+
+def construction(iterations: int) -> dict:
+    for key, value in ENVIRONMENT.items():
+        os.environ.setdefault(key, value)
+    from spotipy.oauth2 import SpotifyOAuth
+    from services.spotify_service import REDIRECT_URI, SCOPE, SpotifyService
+    from services.apple_music_service import AppleMusicService
+
+    token = {"access_token": "bench-token"}
+
+    def per_request_oauth():
+        # What SpotifyService.__init__ did on every request
+        SpotifyOAuth(client_id=os.environ["SPOTIFY_CLIENT_ID"], client_secret=os.environ["SPOTIFY_CLIENT_SECRET"],
+                     redirect_uri=REDIRECT_URI, scope=SCOPE)
+        return SpotifyService(auth_token=token)
+
+    shared = per_call_us(lambda: SpotifyService(auth_token=token), iterations)
+    rebuilt = per_call_us(per_request_oauth, iterations)
+    return {
+        "spotify_service_us": shared,
+        "spotify_service_with_new_oauth_us": rebuilt,
+        "spotify_speedup": round(rebuilt / shared, 1) if shared else None,
+        "apple_music_service_us": per_call_us(lambda: AppleMusicService(user_token="bench-user-token"), iterations),
+    }
+
+
+def main(args):
+    imports = [run_probe(IMPORT_PROBE) for _ in range(args.runs)]
+    first_use = {
+        platform: summarize_ms([run_probe(FIRST_USE_PROBE.format(platform=platform))["seconds"]
+                                for _ in range(args.runs)])
+        for platform in ("spotify", "apple-music", "youtube-music")
+    }
+
+    print(json.dumps({
+        "benchmark": "startup",
+        "runs": args.runs,
+        "import_app": {
+            "lazy_registry": {**summarize_ms([r["app_seconds"] for r in imports]),
+                              "sdks_loaded": imports[-1]["sdks_loaded"]},
+            "all_platforms_eager": summarize_ms([r["app_seconds"] + r["eager_seconds"] for r in imports]),
+            # Paired per interpreter, so noise between runs cancels out
+            "saved_ms": round(statistics.median(r["eager_seconds"] for r in imports) * 1000, 1),
+        },
+        "first_use": first_use,
+        "per_request_construction": construction(args.iterations),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--iterations", type=int, default=20000)
+    main(parser.parse_args())
@@ -0,0 +1,294 @@
+"""
+Offline benchmark suite: scripted scenarios against local stand-ins for
+Spotify, Apple Music and YouTube Music (see mock_*.py). No real API is
+touched. The stand-ins add per-request latency and enforce a rate limit
+with 429 + Retry-After.
+
+Scenarios:
+  list_playlists    list a library of --playlists playlists, per platform
+  fetch_playlist    fetch a --tracks track playlist, per platform
+  transfer          full Spotify -> Apple Music transfer of --transfer-tracks tracks
+  concurrent_users  --users users concurrently log in, list playlists and
+                    stream a playlist through the FastAPI app (Apple Music)
+
+Each scenario runs in its own process so its peak RSS is its own. Results
+go to stdout (and --output) as JSON: throughput, p50/p95/p99 latency, peak
+RSS and upstream request/429 counts, for comparison across changes.
+
+Usage (from backend/):
+    python -m benchmarks.suite [--scenarios list_playlists,transfer] [--output results.json]
+"""
+import argparse
+import asyncio
+import atexit
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+from benchmarks.mock_apple_music import build_apple_music_stand_in
+from benchmarks.mock_spotify import build_spotify_stand_in
+from benchmarks.stand_in import StandInServer, percentile
+
+
+def build_youtube_music_stand_in(**kwargs):
+    # Imported lazily: the YouTube Music stand-in imports the services, which
+    # read their configuration at import, before configure_environment has run
+    from benchmarks.mock_youtube_music import build_youtube_music_stand_in as build
+    return build(**kwargs)
+
+
+PLATFORMS = ("spotify", "apple-music", "youtube-music")
+STAND_INS = {
+    "spotify": build_spotify_stand_in,
+    "apple-music": build_apple_music_stand_in,
+    "youtube-music": build_youtube_music_stand_in,
+}
+BASE_URL_ENV = {"spotify": "SPOTIFY_API_BASE_URL", "apple-music": "APPLE_MUSIC_API_BASE_URL"}
+RATE_ENV = {"spotify": "SPOTIFY", "apple-music": "APPLE_MUSIC", "youtube-music": "YOUTUBE_MUSIC"}
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def configure_environment(args, servers: dict):
+    """Points the services at the stand-ins. Must run before services are imported."""
+    os.environ.setdefault("SPOTIFY_CLIENT_ID", "bench-client-id")
+    os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "bench-client-secret")
+    os.environ.setdefault("APPLE_DEVELOPER_TOKEN", "bench-developer-token")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Every SQLite file goes to a fresh directory, removed at exit, so runs
+    # leave no state behind and do not see each other's
+    state_dir = tempfile.mkdtemp(prefix="bench-state-")
+    atexit.register(shutil.rmtree, state_dir, ignore_errors=True)
+    for variable, filename in (("TRACK_INDEX_PATH", "track_index.sqlite3"),
+                               ("SYNC_STORE_PATH", "sync_state.sqlite3"),
+                               ("SHARED_STATE_PATH", "shared_state.sqlite3"),
+                               ("SESSION_STORE_PATH", "sessions.sqlite3")):
+        os.environ[variable] = os.path.join(state_dir, filename)
+    for platform, server in servers.items():
+        if platform in BASE_URL_ENV:
+            os.environ[BASE_URL_ENV[platform]] = f"{server.url}/v1"
+    # The scheduler paces at the stand-ins' limit, as it would against the real APIs
+    for prefix in RATE_ENV.values():
+        os.environ[f"{prefix}_RATE_LIMIT"] = str(args.upstream_rps)
+        os.environ[f"{prefix}_RATE_BURST"] = str(int(args.upstream_rps))
+
+
+def make_service(platform: str, servers: dict, user: int = 0):
+    if platform == "spotify":
+        from services.spotify_service import SpotifyService
+        return SpotifyService({"access_token": f"bench-token-{user}"})
+    if platform == "apple-music":
+        from services.apple_music_service import AppleMusicService
+        return AppleMusicService(user_token=f"bench-user-token-{user}")
+    from benchmarks.mock_youtube_music import StandInYTMusic
+    from services.youtube_music_service import YouTubeMusicService
+    return YouTubeMusicService(client=StandInYTMusic(servers[platform].url, f"bench-user-{user}"))
+
+
+async def call(method, *args):
+    if asyncio.iscoroutinefunction(method):
+        return await method(*args)
+    return await asyncio.to_thread(method, *args)
+
+
+def summarize(scenario: str, platform: str, latencies: list, items: int, wall: float,
+              servers: dict, rss_before: float, **extra) -> dict:
+    from services.rate_scheduler import outbound
+    upstream = {name: server.stats() for name, server in servers.items()}
+    return {
+        "scenario": scenario,
+        "platform": platform,
+        "operations": len(latencies),
+        "items": items,
+        "wall_s": round(wall, 3),
+        "throughput_ops_s": round(len(latencies) / wall, 2) if wall else 0.0,
+        "items_per_s": round(items / wall, 1) if wall else 0.0,
+        "latency_ms": {f"p{p}": round(percentile(latencies, p) * 1000, 1) for p in (50, 95, 99)},
+        "peak_rss_mb": peak_rss_mb(),
+        "rss_growth_mb": round(peak_rss_mb() - rss_before, 1),
+        "upstream_requests": sum(s["requests"] for s in upstream.values()),
+        "upstream_throttled": sum(s["throttled"] for s in upstream.values()),
+        "upstream_retries": sum(s["retries"] for s in outbound.stats().values()),
+        **extra,
+    }
+
+
+async def timed_runs(iterations: int, run):
+    latencies, items = [], 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        items += await run()
+        latencies.append(time.perf_counter() - call_started)
+    return latencies, items, time.perf_counter() - started
+
+
+# --- Scenarios ---
+
+async def list_playlists(args, platform: str):
+    latency = args.latency_ms / 1000
+    with StandInServer(STAND_INS[platform], process=True, rate_limit=args.upstream_rps,
+                       playlist_count=args.playlists, track_count=100, latency=latency) as server:
+        servers = {platform: server}
+        configure_environment(args, servers)
+        from services.rate_scheduler import outbound
+        outbound.attach(asyncio.get_running_loop())
+        rss_before = peak_rss_mb()
+        service = make_service(platform, servers)
+
+        async def run():
+            return len(await call(service.get_user_playlists))
+
+        latencies, items, wall = await timed_runs(args.iterations, run)
+        return summarize("list_playlists", platform, latencies, items, wall, servers, rss_before,
+                         expected_items=args.playlists * args.iterations)
+
+
+async def fetch_playlist(args, platform: str):
+    latency = args.latency_ms / 1000
+    with StandInServer(STAND_INS[platform], process=True, rate_limit=args.upstream_rps,
+                       playlist_count=1, track_count=args.tracks, latency=latency) as server:
+        servers = {platform: server}
+        configure_environment(args, servers)
+        from services.rate_scheduler import outbound
+        outbound.attach(asyncio.get_running_loop())
+        rss_before = peak_rss_mb()
+        service = make_service(platform, servers)
+
+        async def run():
+            return len(await call(service.get_playlist_tracks, "bench-playlist"))
+
+        latencies, items, wall = await timed_runs(1, run)
+        return summarize("fetch_playlist", platform, latencies, items, wall, servers, rss_before,
+                         expected_items=args.tracks)
+
+
+async def transfer(args, platform: str = "apple-music"):
+    latency = args.latency_ms / 1000
+    with StandInServer(build_spotify_stand_in, process=True, rate_limit=args.upstream_rps,
+                       playlist_count=1, track_count=args.transfer_tracks, latency=latency) as source, \
+            StandInServer(STAND_INS[platform], process=True, rate_limit=args.upstream_rps,
+                          playlist_count=1, track_count=0, latency=latency) as destination:
+        servers = {"spotify": source, platform: destination}
+        configure_environment(args, servers)
+        from services.rate_scheduler import outbound
+        outbound.attach(asyncio.get_running_loop())
+        rss_before = peak_rss_mb()
+
+        from models.transfer import TransferRequest
+        from routes.transfer import PLATFORMS as ROUTE_PLATFORMS
+        from services.transfer_service import TransferJob
+
+        request = TransferRequest(sourcePlatform="spotify", destinationPlatform=platform,
+                                  sourcePlaylistId="bench-playlist", playlistName="Benchmark transfer")
+        job = TransferJob(request, source=make_service("spotify", servers),
+                          source_mapper=ROUTE_PLATFORMS["spotify"][1],
+                          destination=make_service(platform, servers),
+                          destination_mapper=ROUTE_PLATFORMS[platform][2])
+
+        async def run():
+            await job.run()
+            if job.outcome != "completed":
+                raise RuntimeError(f"Transfer {job.outcome}: {job.error}")
+            return job.total_tracks
+
+        latencies, items, wall = await timed_runs(1, run)
+        return summarize("transfer", f"spotify->{platform}", latencies, items, wall, servers, rss_before,
+                         matched=job.successful_matches, expected_items=args.transfer_tracks)
+
+
+async def concurrent_users(args, platform: str = "apple-music"):
+    latency = args.latency_ms / 1000
+    with StandInServer(build_apple_music_stand_in, process=True, rate_limit=args.upstream_rps,
+                       playlist_count=25, track_count=args.user_tracks, latency=latency) as server:
+        servers = {platform: server}
+        configure_environment(args, servers)
+        import httpx
+        from main import app
+        from services.rate_scheduler import outbound
+        outbound.attach(asyncio.get_running_loop())
+        rss_before = peak_rss_mb()
+        latencies, items = [], 0
+
+        async def user(n: int):
+            nonlocal items
+            # A distinct client address per user, as real users have
+            transport = httpx.ASGITransport(app=app, client=(f"10.0.{n // 250}.{n % 250 + 1}", 50000))
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for method, path, body in (
+                    ("POST", "/auth/apple-music", {"userToken": f"bench-user-token-{n}"}),
+                    ("GET", "/api/playlists/apple-music", None),
+                    ("GET", "/api/playlists/apple-music/p.0/tracks", None),
+                ):
+                    started = time.perf_counter()
+                    response = await client.request(method, path, json=body)
+                    latencies.append(time.perf_counter() - started)
+                    response.raise_for_status()
+                items += response.text.count("\n")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(n) for n in range(args.users)))
+        wall = time.perf_counter() - started
+        return summarize("concurrent_users", platform, latencies, items, wall, servers, rss_before,
+                         users=args.users, expected_items=args.users * args.user_tracks)
+
+
+SCENARIOS = {
+    "list_playlists": (list_playlists, PLATFORMS),
+    "fetch_playlist": (fetch_playlist, PLATFORMS),
+    "transfer": (transfer, ("apple-music",)),
+    "concurrent_users": (concurrent_users, ("apple-music",)),
+}
+
+
+def _run_in_process(name: str, platform: str, args, results):
+    scenario, _ = SCENARIOS[name]
+    try:
+        results.put(asyncio.run(scenario(args, platform)))
+    except Exception as e:
+        results.put({"scenario": name, "platform": platform, "error": f"{type(e).__name__}: {e}"})
+
+
+def main(args):
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name in args.scenarios.split(","):
+        _, platforms = SCENARIOS[name]
+        for platform in platforms:
+            queue = context.Queue()
+            worker = context.Process(target=_run_in_process, args=(name, platform, args, queue))
+            worker.start()
+            results.append(queue.get())
+            worker.join()
+
+    report = json.dumps({
+        "benchmark": "suite",
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+    }, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--latency-ms", type=float, default=25.0, help="stand-in response latency")
+    parser.add_argument("--upstream-rps", type=float, default=300.0, help="stand-in rate limit per platform")
+    parser.add_argument("--playlists", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--tracks", type=int, default=10000)
+    parser.add_argument("--transfer-tracks", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--user-tracks", type=int, default=200)
+    parser.add_argument("--output")
+    main(parser.parse_args())
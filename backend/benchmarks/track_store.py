@@ -0,0 +1,114 @@
+"""
+Benchmark: memory and throughput of Pydantic Track lists versus TrackBatch
+for one 20k-track playlist.
+
+Raw Spotify pages are parsed from JSON bytes on every run, as they arrive
+off the wire, so repeated artist and album names are distinct strings until
+something interns them. Measures:
+  - retained memory of the converted representation once the raw pages are
+    dropped (tracemalloc)
+  - conversion and NDJSON encoding throughput (best of --runs)
+
+Usage (from backend/):
+    python -m benchmarks.track_store [--tracks 20000] [--runs 5]
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+
+from benchmarks.mock_spotify import make_track_item
+from routes.playlists import map_spotify_track, spotify_track_row
+from services.track_store import TrackBatch
+
+PAGE_SIZE = 100
+
+
+def raw_pages(wire: list) -> list:
+    return [json.loads(page) for page in wire]
+
+
+def pydantic_convert(pages):
+    return [t for page in pages for t in (map_spotify_track(item) for item in page) if t is not None]
+
+
+def pydantic_encode(tracks) -> bytes:
+    # The encoding the tracks endpoint used before TrackBatch
+    return "".join(json.dumps(jsonable_encoder(t)) + "\n" for t in tracks).encode("utf-8")
+
+
+def batch_convert(pages):
+    batch = TrackBatch()
+    for page in pages:
+        batch.extend(TrackBatch.from_items(page, spotify_track_row))
+    return batch
+
+
+def retained_bytes(wire, convert) -> int:
+    gc.collect()
+    tracemalloc.start()
+    pages = raw_pages(wire)
+    result = convert(pages)
+    del pages
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def best_time(fn, runs: int) -> float:
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def measure(name, wire, convert, encode, runs, tracks):
+    pages = raw_pages(wire)
+    converted = convert(pages)
+    convert_s = best_time(lambda: convert(pages), runs)
+    encode_s = best_time(lambda: encode(converted), runs)
+    body = encode(converted)
+    return {
+        "implementation": name,
+        "retained_kib": round(retained_bytes(wire, convert) / 1024),
+        "convert_ms": round(convert_s * 1000, 1),
+        "encode_ms": round(encode_s * 1000, 1),
+        "tracks_per_sec": round(tracks / (convert_s + encode_s)),
+        "ndjson_bytes": len(body),
+    }, body
+
+
+def main(args):
+    items = [make_track_item(n) for n in range(args.tracks)]
+    wire = [json.dumps(items[i:i + PAGE_SIZE]).encode() for i in range(0, len(items), PAGE_SIZE)]
+    del items
+
+    before, before_body = measure("pydantic_track_list", wire, pydantic_convert, pydantic_encode,
+                                  args.runs, args.tracks)
+    after, after_body = measure("track_batch_orjson", wire, batch_convert, TrackBatch.to_ndjson,
+                                args.runs, args.tracks)
+
+    same = [json.loads(line) for line in before_body.splitlines()] == \
+           [json.loads(line) for line in after_body.splitlines()]
+    print(json.dumps({
+        "benchmark": "track_store",
+        "tracks": args.tracks,
+        "results": [before, after],
+        "identical_output": same,
+        "memory_ratio": round(before["retained_kib"] / max(after["retained_kib"], 1), 1),
+        "throughput_speedup": round(after["tracks_per_sec"] / before["tracks_per_sec"], 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=20000)
+    parser.add_argument("--runs", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,131 @@
+"""
+Benchmark: the shared state (services/shared_state.py) under several worker
+processes, as when the app runs under multiple uvicorn/gunicorn workers.
+
+For each worker count in --workers, that many processes run each operation
+against one SQLite store for --duration seconds:
+  hit         inbound rate-limit counter, a distinct key per client
+  kv          set + get of a playlist-cache-sized value
+  take_token  outbound token bucket, one bucket per worker
+and report aggregate ops/s and scaling against one worker.
+
+Correctness, with the same worker counts:
+  shared_limit  every worker hits ONE key with a limit of --limit per hour;
+                the store must allow exactly --limit in total (the per-process
+                memory store allows workers x --limit)
+  shared_bucket every worker draws from ONE bucket (--rate/s, --burst); grants
+                must not exceed burst + rate x elapsed
+
+Scaling is bounded by the CPUs available (cpu_count in the output).
+
+Usage (from backend/):
+    python -m benchmarks.workers [--workers 1,2,4] [--duration 2]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+VALUE = b"x" * 4096
+# Long enough that a run never straddles a window boundary, past which the
+# sliding window rightly starts letting the previous window's hits age out
+LIMIT_WINDOW = 3600.0
+
+
+async def _operate(store, operation: str, worker: int, args) -> dict:
+    ops = allowed = 0
+    started = time.perf_counter()
+    deadline = started + args.duration
+    while time.perf_counter() < deadline:
+        if operation == "hit":
+            allowed += await store.hit(f"bench:{worker}:{ops % 1000}", 1_000_000, 60.0)
+        elif operation == "kv":
+            await store.set(f"bench:{worker}:{ops % 1000}", VALUE, 60.0)
+            allowed += await store.get(f"bench:{worker}:{ops % 1000}") is not None
+        elif operation == "take_token":
+            allowed += await store.take_token(f"bench:{worker}", 1e9, 1_000_000) == 0
+        elif operation == "shared_limit":
+            allowed += await store.hit("bench:one-client", args.limit, LIMIT_WINDOW)
+        elif operation == "shared_bucket":
+            wait = await store.take_token("bench:one-bucket", args.rate, args.burst)
+            if wait:
+                await asyncio.sleep(min(wait, 0.01))
+            else:
+                allowed += 1
+        ops += 1
+    return {"ops": ops, "allowed": allowed, "seconds": time.perf_counter() - started}
+
+
+def _run_worker(kind: str, path: str, operation: str, worker: int, args, barrier, queue):
+    from services.shared_state import MemorySharedState, SQLiteSharedState
+
+    store = SQLiteSharedState(path) if kind == "sqlite" else MemorySharedState()
+    if kind == "sqlite":
+        store._connection()  # open (and create the schema) before the clock starts
+    barrier.wait()
+    queue.put(asyncio.run(_operate(store, operation, worker, args)))
+
+
+def run(kind: str, operation: str, workers: int, args, directory: str) -> dict:
+    path = os.path.join(directory, f"{operation}-{workers}.sqlite3")
+    context = multiprocessing.get_context("spawn")
+    barrier, queue = context.Barrier(workers), context.Queue()
+    processes = [context.Process(target=_run_worker, args=(kind, path, operation, worker, args, barrier, queue))
+                 for worker in range(workers)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return {
+        "ops": sum(r["ops"] for r in results),
+        "allowed": sum(r["allowed"] for r in results),
+        "seconds": max(r["seconds"] for r in results),
+    }
+
+
+def main(args):
+    worker_counts = [int(n) for n in args.workers.split(",")]
+    throughput, correctness = {}, {}
+    with tempfile.TemporaryDirectory() as directory:
+        for operation in ("hit", "kv", "take_token"):
+            rows = []
+            for workers in worker_counts:
+                result = run("sqlite", operation, workers, args, directory)
+                rows.append({"workers": workers, "ops_per_sec": round(result["ops"] / result["seconds"])})
+            for row in rows:
+                row["scaling"] = round(row["ops_per_sec"] / rows[0]["ops_per_sec"], 2)
+            throughput[operation] = rows
+
+        for workers in worker_counts:
+            limit = {kind: run(kind, "shared_limit", workers, args, directory)["allowed"]
+                     for kind in ("sqlite", "memory")}
+            bucket = run("sqlite", "shared_bucket", workers, args, directory)
+            ceiling = args.burst + args.rate * bucket["seconds"]
+            correctness[str(workers)] = {
+                "shared_limit": {"limit": args.limit, "allowed_sqlite": limit["sqlite"],
+                                 "allowed_memory": limit["memory"], "ok": limit["sqlite"] == args.limit},
+                "shared_bucket": {"granted": bucket["allowed"], "ceiling": round(ceiling, 1),
+                                  "ok": bucket["allowed"] <= ceiling},
+            }
+
+    print(json.dumps({
+        "benchmark": "workers",
+        "cpu_count": os.cpu_count(),
+        "duration_s": args.duration,
+        "throughput": throughput,
+        "correctness": correctness,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--duration", type=float, default=2.0)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=50.0)
+    parser.add_argument("--burst", type=int, default=20)
+    main(parser.parse_args())
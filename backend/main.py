@@ -1,26 +1,65 @@
 import os
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.sessions import SessionMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 # Routers
-from routes import auth, playlists
-# from routes import transfer
+from routes import auth, playlists, transfer
+from services.http_client import init_http_client, close_http_client
+from services.rate_scheduler import outbound
+from services.session_store import MemorySessionStore, ServerSessionMiddleware, session_store
+from services.metrics import MetricsMiddleware, create_thread_pool, registry
+from services.spotify_tokens import SpotifyReauthRequired
+from services.log import get_logger
+
+# Workers behind asyncio.to_thread (sync SDKs, SQLite); Python's default size
+THREAD_POOL_SIZE = int(os.environ.get("THREAD_POOL_SIZE", str(min(32, (os.cpu_count() or 1) + 4))))
+# Responses smaller than this go out uncompressed; gzip would barely shrink them
+GZIP_MINIMUM_SIZE = int(os.environ.get("GZIP_MINIMUM_SIZE", "1000"))
+# Level 6 compresses JSON nearly as well as 9 at a fraction of the CPU
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+
+logger = get_logger("main")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled outbound HTTP client shared by every service instance
+    await init_http_client()
+    # asyncio.to_thread runs on this pool; it reports its queue depth in /metrics
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(create_thread_pool(THREAD_POOL_SIZE))
+    # Sync SDK calls in worker threads queue on this loop's rate limiters
+    outbound.attach(loop)
+    if isinstance(session_store, MemorySessionStore):
+        logger.warning("Sessions are kept in memory: every user is logged out on restart, and with several "
+                       "workers each one only knows its own logins. Set SESSION_STORE=sqlite to persist and "
+                       "share them.")
+    yield
+    await close_http_client()
+
 
 app = FastAPI(
     title="Universal Music Playlist Converter API",
     description="The backend API for converting playlists between music streaming services.",
     version="2.0.0",
+    lifespan=lifespan,
 )
 
-# Session Middleware (should be added before CORS)
-app.add_middleware(
-    SessionMiddleware, secret_key=os.environ.get("SESSION_SECRET_KEY", "your-super-secret-key")
-)
+# Session Middleware (should be added before CORS). Session data lives
+# server-side; the cookie only carries an opaque session ID.
+app.add_middleware(ServerSessionMiddleware, store=session_store)
+
+# Compresses JSON and NDJSON for clients that accept gzip; each streamed
+# chunk is flushed as it goes, and event streams are left uncompressed
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_LEVEL)
 
 # CORS Middleware
 origins = [
@@ -35,15 +74,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency per route. Added last, so it is the outermost middleware
+# and its timings cover all of the above.
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(SpotifyReauthRequired)
+async def spotify_reauth_required(request: Request, exc: SpotifyReauthRequired):
+    """An expired Spotify login is the client's to renew, not a server error."""
+    return JSONResponse(status_code=401, content={
+        "detail": "Spotify session expired. Please sign in to Spotify again.", "reauthenticate": "spotify"})
+
 @app.get("/health", tags=["Status"])
 async def health_check():
     """Health check endpoint to ensure the API is running."""
     return {"status": "ok", "timestamp": "..."}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(playlists.router, prefix="/api/playlists", tags=["Playlists"])
-# app.include_router(transfer.router, prefix="/api/transfer", tags=["Transfer"])
+app.include_router(transfer.router, prefix="/api/transfer", tags=["Transfer"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -7,6 +7,7 @@ class Track(BaseModel):
     artist: str
     album: Optional[str] = None
     duration_ms: int = Field(..., alias="durationMs")
+    isrc: Optional[str] = None
 
 class Playlist(BaseModel):
     id: str
@@ -0,0 +1,84 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Union
+
+from models.playlist import Track
+
+class TransferRequest(BaseModel):
+    source_platform: str = Field(..., alias="sourcePlatform")
+    destination_platform: str = Field(..., alias="destinationPlatform")
+    source_playlist_id: str = Field(..., alias="sourcePlaylistId")
+    playlist_name: str = Field(..., alias="playlistName")
+    playlist_description: Optional[str] = Field("", alias="playlistDescription")
+
+class SyncRequest(BaseModel):
+    """Re-sync of a playlist pair an earlier transfer created."""
+    source_platform: str = Field(..., alias="sourcePlatform")
+    destination_platform: str = Field(..., alias="destinationPlatform")
+    source_playlist_id: str = Field(..., alias="sourcePlaylistId")
+    destination_playlist_id: str = Field(..., alias="destinationPlaylistId")
+
+class FailedMatch(BaseModel):
+    track: Track
+    reason: str
+
+class TransferStatus(BaseModel):
+    id: str
+    source_platform: str = Field(..., alias="sourcePlatform")
+    destination_platform: str = Field(..., alias="destinationPlatform")
+    source_playlist_id: str = Field(..., alias="sourcePlaylistId")
+    playlist_name: str = Field(..., alias="playlistName")
+    playlist_description: str = Field("", alias="playlistDescription")
+    # starting | fetching_source | matching_tracks | creating_playlist | adding_tracks | completed | failed | cancelled
+    status: str
+    progress: float = 0
+    total_tracks: int = Field(0, alias="totalTracks")
+    processed_tracks: int = Field(0, alias="processedTracks")
+    successful_matches: int = Field(0, alias="successfulMatches")
+    failed_matches: List[FailedMatch] = Field([], alias="failedMatches")
+    start_time: str = Field(..., alias="startTime")
+    end_time: Optional[str] = Field(None, alias="endTime")
+    error: Optional[str] = None
+    destination_playlist_id: Optional[str] = Field(None, alias="destinationPlaylistId")
+    # full | incremental
+    mode: str = "full"
+    tracks_added: int = Field(0, alias="tracksAdded")
+    tracks_removed: int = Field(0, alias="tracksRemoved")
+    # Incremental sync found the source unchanged and made no further calls
+    up_to_date: bool = Field(False, alias="upToDate")
+
+class LibraryTransferRequest(BaseModel):
+    source_platform: str = Field(..., alias="sourcePlatform")
+    destination_platform: str = Field(..., alias="destinationPlatform")
+    # Source playlist IDs as returned by GET /api/playlists/{platform}, or "all"
+    playlist_ids: Union[List[str], Literal["all"]] = Field("all", alias="playlistIds")
+
+class LibraryPlaylistStatus(BaseModel):
+    source_playlist_id: str = Field(..., alias="sourcePlaylistId")
+    playlist_name: str = Field(..., alias="playlistName")
+    # pending | fetching_source | matching_tracks | adding_tracks | completed | failed
+    status: str
+    total_tracks: int = Field(0, alias="totalTracks")
+    added_tracks: int = Field(0, alias="addedTracks")
+    destination_playlist_id: Optional[str] = Field(None, alias="destinationPlaylistId")
+    error: Optional[str] = None
+
+class LibraryTransferStatus(BaseModel):
+    id: str
+    source_platform: str = Field(..., alias="sourcePlatform")
+    destination_platform: str = Field(..., alias="destinationPlatform")
+    # starting | listing_playlists | fetching_source | matching_tracks | adding_tracks | completed | failed | cancelled
+    status: str
+    progress: float = 0
+    total_playlists: int = Field(0, alias="totalPlaylists")
+    completed_playlists: int = Field(0, alias="completedPlaylists")
+    # Track counts over all playlists; matching runs once per unique track
+    total_tracks: int = Field(0, alias="totalTracks")
+    unique_tracks: int = Field(0, alias="uniqueTracks")
+    processed_tracks: int = Field(0, alias="processedTracks")
+    successful_matches: int = Field(0, alias="successfulMatches")
+    failed_matches: List[FailedMatch] = Field([], alias="failedMatches")
+    lookups_saved: int = Field(0, alias="lookupsSaved")
+    playlists: List[LibraryPlaylistStatus] = []
+    start_time: str = Field(..., alias="startTime")
+    end_time: Optional[str] = Field(None, alias="endTime")
+    error: Optional[str] = None
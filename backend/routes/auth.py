@@ -3,19 +3,18 @@ import time
 import asyncio
 from fastapi import APIRouter, Request, Response, Depends
 from starlette.responses import RedirectResponse
-import httpx
 from uuid import uuid4
 
-from services.spotify_service import SpotifyService
-from services.apple_music_service import AppleMusicService
-from services.youtube_music_service import YouTubeMusicService
+from services.platforms import get_adapter
+from services.playlist_cache import playlist_cache
+from services.session_store import rotate_session_id
+from routes.playlists import playlist_cache_key
+from services.ytmusic_pool import ytmusic_pool, credentials_key
 from models.auth import AuthStatusResponse, AuthStatus, UserInfo, YouTubeMusicHeaders
+from services.log import get_logger
 
 router = APIRouter()
-
-# In a real app, this should be a long, random, secret string
-# and loaded from environment variables
-SESSION_SECRET_KEY = os.environ.get("SESSION_SECRET_KEY", "your-super-secret-key")
+logger = get_logger("auth")
 
 # Placeholder for Spotipy client
 # sp_oauth = ...
@@ -25,7 +24,7 @@ SESSION_SECRET_KEY = os.environ.get("SESSION_SECRET_KEY", "your-super-secret-key
 async def spotify_login(request: Request):
     state = str(uuid4())
     request.session['spotify_state'] = state
-    spotify_service = SpotifyService()
+    spotify_service = get_adapter("spotify").create()
     auth_url = spotify_service.get_authorize_url(state=state)
     return RedirectResponse(auth_url)
 
@@ -37,20 +36,19 @@ async def spotify_callback(request: Request, response: Response, code: str, stat
         if not session_state or state != session_state:
             return Response(content="State mismatch", status_code=400)
         
-        spotify_service = SpotifyService()
+        spotify_service = get_adapter("spotify").create()
         token_info = await spotify_service.get_access_token(code)
         request.session['spotify_token'] = token_info
         
         # Get user info
-        user_spotify_service = SpotifyService(auth_token=token_info)
+        user_spotify_service = get_adapter("spotify").create(auth_token=token_info)
         user = await user_spotify_service.get_current_user()
         request.session['spotify_user'] = user.dict()
+        rotate_session_id(request)
         
         return RedirectResponse(url=os.environ.get("FRONTEND_URL", "http://localhost:3000") + "?platform=spotify&status=success")
     except Exception as e:
-        print(f"Spotify callback error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Spotify callback error: %s", e)
         return Response(content=f"Authentication failed: {str(e)}", status_code=500)
 
 
@@ -67,6 +65,7 @@ async def apple_music_login(request: Request, user_token: dict):
         # Give it a reasonable expiry time, e.g., 6 months, as user tokens are long-lived
         "expires_at": int(time.time()) + (180 * 24 * 60 * 60)
     }
+    rotate_session_id(request)
     return {"success": True, "message": "Apple Music authenticated successfully"}
 
 
@@ -78,7 +77,7 @@ async def youtube_music_login(request: Request, headers_data: dict):
         return Response(content="Missing headers_raw", status_code=400)
 
     try:
-        ytm_service = YouTubeMusicService(headers_raw=headers_raw)
+        ytm_service = get_adapter("youtube-music").create(headers_raw=headers_raw)
         
         # Run synchronous test_authentication in a thread to avoid blocking
         auth_result = await asyncio.to_thread(ytm_service.test_authentication)
@@ -86,27 +85,24 @@ async def youtube_music_login(request: Request, headers_data: dict):
         if not auth_result:
             return Response(content="Invalid YouTube Music headers", status_code=401)
     except Exception as e:
-        print(f"Error initializing YouTube Music service: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error initializing YouTube Music service: %s", e)
         return Response(content="Failed to initialize YouTube Music service", status_code=500)
 
-    # Store headers in a temporary file to avoid session size limits
-    import tempfile
-    import os
-    
-    temp_dir = tempfile.gettempdir()
-    headers_file = os.path.join(temp_dir, f"ytm_headers_{int(time.time())}.txt")
-    
-    with open(headers_file, 'w') as f:
-        f.write(headers_raw)
-    
-    # Store only essential data in session
-    request.session['youtube_music_headers_file'] = headers_file
+    expires_at = int(time.time()) + (24 * 60 * 60 * 7) # 1 week
+
+    # Keep the verified client ready so later requests skip setup entirely
+    client_key = credentials_key(headers_raw)
+    ytmusic_pool.put(client_key, ytm_service.client, expires_at)
+
+    # Sessions are stored server-side, so the raw headers can live there
+    # instead of in a temporary file
+    request.session['youtube_music_headers'] = headers_raw
+    request.session['youtube_music_client_key'] = client_key
     request.session['youtube_music_auth'] = {
         "authenticated": True,
-        "expires_at": int(time.time()) + (24 * 60 * 60 * 7) # 1 week
+        "expires_at": expires_at
     }
+    rotate_session_id(request)
     
     return {"success": True, "message": "YouTube Music authenticated successfully"}
 
@@ -116,7 +112,9 @@ async def youtube_music_login(request: Request, headers_data: dict):
 async def get_status(request: Request):
     now = int(time.time())
     
-    spotify_authed = 'spotify_token' in request.session and request.session['spotify_token'].get('expires_at', 0) > now
+    # An expired Spotify access token still counts while it can be refreshed
+    spotify_token = request.session.get('spotify_token') or {}
+    spotify_authed = bool(spotify_token.get('refresh_token')) or spotify_token.get('expires_at', 0) > now
     apple_authed = 'apple_music_token' in request.session and request.session['apple_music_token'].get('expires_at', 0) > now
     youtube_authed = 'youtube_music_auth' in request.session and request.session['youtube_music_auth'].get('expires_at', 0) > now
     
@@ -139,19 +137,16 @@ async def logout(request: Request, platform: str):
     session_keys = {
         'spotify': ['spotify_token', 'spotify_user'],
         'apple-music': ['apple_music_token'],
-        'youtube-music': ['youtube_music_headers_file', 'youtube_music_auth']
+        'youtube-music': ['youtube_music_headers', 'youtube_music_client_key', 'youtube_music_auth']
     }
     
     if platform in session_keys:
-        # Clean up YouTube Music headers file before removing from session
-        if platform == 'youtube-music' and 'youtube_music_headers_file' in request.session:
-            headers_file = request.session['youtube_music_headers_file']
-            try:
-                if os.path.exists(headers_file):
-                    os.unlink(headers_file)
-                    print(f"[DEBUG] Cleaned up headers file: {headers_file}")
-            except Exception as e:
-                print(f"[DEBUG] Failed to cleanup headers file: {e}")
+        # Logging back in starts from a fresh playlist list
+        user_key = playlist_cache_key(request, platform)
+        if user_key:
+            await playlist_cache.invalidate(platform, user_key)
+        if platform == 'youtube-music' and 'youtube_music_client_key' in request.session:
+            ytmusic_pool.evict(request.session['youtube_music_client_key'])
         
         for key in session_keys[platform]:
             if key in request.session:
@@ -1,75 +1,90 @@
 from fastapi import APIRouter, Request, Depends, Response, HTTPException
-from typing import List
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import StreamingResponse
+from typing import TYPE_CHECKING, List, Optional
 import asyncio
-import os
-import time
+import hashlib
 
-from models.playlist import Playlist
-from services.spotify_service import SpotifyService
-from services.apple_music_service import AppleMusicService
-from services.youtube_music_service import YouTubeMusicService
+import orjson
+
+from models.playlist import Playlist, Track
+from services.platforms import get_adapter
+from services.ytmusic_pool import ytmusic_pool, credentials_key
+from services.playlist_cache import playlist_cache, signature_of, PlaylistCacheEntry
+from services.shared_state import shared_state
+from services.spotify_tokens import spotify_token_key, spotify_tokens
+from services.track_store import TrackBatch, TrackRow
+from services.log import get_logger
+
+if TYPE_CHECKING:
+    # Service modules (and their SDKs) load on first use through the platform registry
+    from services.spotify_service import SpotifyService
+    from services.apple_music_service import AppleMusicService
+    from services.youtube_music_service import YouTubeMusicService
 
 router = APIRouter()
+logger = get_logger("playlists")
 
-# Simple rate limiting
-_request_cache = {}
+# Simple rate limiting: at most 5 requests per 2 seconds per client and
+# platform, counted in the shared state so the limit holds across workers
+INBOUND_LIMIT = 5
+INBOUND_WINDOW = 2.0
 
-def check_rate_limit(request: Request, platform: str) -> bool:
+async def check_rate_limit(request: Request, platform: str) -> bool:
     """Simple rate limiting to prevent infinite loops"""
     client_ip = request.client.host
-    now = time.time()
-    key = f"{client_ip}:{platform}"
-    
-    if key in _request_cache:
-        last_request_time, request_count = _request_cache[key]
-        
-        # If less than 2 seconds since last request, increment counter
-        if now - last_request_time < 2:
-            request_count += 1
-            _request_cache[key] = (now, request_count)
-            
-            # If more than 5 requests in 2 seconds, rate limit
-            if request_count > 5:
-                print(f"⚠️ [RATE LIMIT] Too many requests for {platform} from {client_ip}")
-                return False
-        else:
-            # Reset counter if more than 2 seconds passed
-            _request_cache[key] = (now, 1)
-    else:
-        _request_cache[key] = (now, 1)
-    
+    if not await shared_state.hit(f"inbound:{client_ip}:{platform}", INBOUND_LIMIT, INBOUND_WINDOW):
+        logger.warning("Rate limit exceeded", extra={"fields": {"platform": platform, "client": client_ip}})
+        return False
     return True
 
 # --- Dependency functions for authentication ---
 
-def get_spotify_service(request: Request) -> SpotifyService:
+def get_spotify_service(request: Request) -> "SpotifyService":
     token_info = request.session.get('spotify_token')
     if not token_info:
         raise HTTPException(status_code=401, detail="Not authenticated with Spotify")
-    return SpotifyService(auth_token=token_info)
+    user_key = spotify_token_key(token_info, (request.session.get('spotify_user') or {}).get('id'))
+    # A token refreshed since (for another request or a running transfer)
+    # replaces the one in the session
+    current = spotify_tokens.current(user_key, token_info)
+    if current is not token_info:
+        request.session['spotify_token'] = current
+    service = get_adapter("spotify").create(auth_token=current, user_key=user_key)
+    # Refreshed ahead of expiry for as long as the service is in use
+    spotify_tokens.attach(user_key, service.client)
+    return service
 
-def get_apple_music_service(request: Request) -> AppleMusicService:
+def get_apple_music_service(request: Request) -> "AppleMusicService":
     token_info = request.session.get('apple_music_token')
     if not token_info:
         raise HTTPException(status_code=401, detail="Not authenticated with Apple Music")
-    return AppleMusicService(user_token=token_info['user_token'])
+    return get_adapter("apple-music").create(user_token=token_info['user_token'])
+
+def get_ytm_service(request: Request) -> "YouTubeMusicService":
+    # Fast path: a ready client for these credentials is already pooled
+    client_key = request.session.get('youtube_music_client_key')
+    if client_key:
+        client = ytmusic_pool.get(client_key)
+        if client is not None:
+            return get_adapter("youtube-music").create(client=client)
 
-def get_ytm_service(request: Request) -> YouTubeMusicService:
-    headers_file = request.session.get('youtube_music_headers_file')
-    if not headers_file:
+    headers_raw = request.session.get('youtube_music_headers')
+    if not headers_raw:
         raise HTTPException(status_code=401, detail="Not authenticated with YouTube Music")
-    
-    # Read headers from the temporary file
-    if not os.path.exists(headers_file):
-        raise HTTPException(status_code=401, detail="YouTube Music authentication expired")
-    
+
     try:
-        with open(headers_file, 'r') as f:
-            headers_raw = f.read()
-        return YouTubeMusicService(headers_raw=headers_raw)
+        service = get_adapter("youtube-music").create(headers_raw=headers_raw)
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Failed to load YouTube Music authentication: {str(e)}")
 
+    if service.client is not None:
+        key = credentials_key(headers_raw)
+        expires_at = request.session.get('youtube_music_auth', {}).get('expires_at', 0)
+        ytmusic_pool.put(key, service.client, expires_at)
+        request.session['youtube_music_client_key'] = key
+    return service
+
 
 # --- Data mapping functions ---
 
@@ -110,65 +125,191 @@ def map_ytm_playlist(p: dict) -> Playlist:
         platform='youtube-music'
     )
 
+def spotify_track_row(item: dict) -> Optional[TrackRow]:
+    t = item.get('track')
+    # Removed tracks and some local files come back as null / without an id
+    if not t or not t.get('id'):
+        return None
+    return (
+        t['id'],
+        t.get('name', ''),
+        ', '.join(a['name'] for a in t.get('artists', [])),
+        (t.get('album') or {}).get('name'),
+        t.get('duration_ms', 0),
+        (t.get('external_ids') or {}).get('isrc'),
+    )
+
+def apple_music_isrc(item: dict) -> Optional[str]:
+    # Catalog songs carry it; library songs only through their included catalog song
+    isrc = item.get('attributes', {}).get('isrc')
+    if isrc:
+        return isrc
+    catalog = ((item.get('relationships') or {}).get('catalog') or {}).get('data') or []
+    return catalog[0].get('attributes', {}).get('isrc') if catalog else None
+
+def apple_music_track_row(item: dict) -> Optional[TrackRow]:
+    attrs = item.get('attributes', {})
+    return (
+        item['id'],
+        attrs.get('name', ''),
+        attrs.get('artistName', ''),
+        attrs.get('albumName'),
+        attrs.get('durationInMillis', 0),
+        apple_music_isrc(item),
+    )
+
+def ytm_track_row(item: dict) -> Optional[TrackRow]:
+    if not item.get('videoId'):
+        return None
+    return (
+        item['videoId'],
+        item.get('title', ''),
+        ', '.join(a['name'] for a in item.get('artists') or []),
+        (item.get('album') or {}).get('name'),
+        (item.get('duration_seconds') or 0) * 1000,
+        None,
+    )
+
+def track_from_row(row: Optional[TrackRow]) -> Optional[Track]:
+    if row is None:
+        return None
+    track_id, title, artist, album, duration_ms, isrc = row
+    return Track(id=track_id, title=title, artist=artist, album=album, durationMs=duration_ms, isrc=isrc)
+
+def map_spotify_track(item: dict) -> Optional[Track]:
+    return track_from_row(spotify_track_row(item))
+
+def map_apple_music_track(item: dict) -> Optional[Track]:
+    return track_from_row(apple_music_track_row(item))
+
+def map_ytm_track(item: dict) -> Optional[Track]:
+    return track_from_row(ytm_track_row(item))
+
+# --- Change signals used to revalidate cached playlist lists ---
+
+def spotify_playlist_signal(p: dict) -> str:
+    return f"{p['id']}:{p.get('snapshot_id', '')}:{p['tracks']['total']}:{p.get('name', '')}"
+
+def apple_music_playlist_signal(p: dict) -> str:
+    attrs = p.get('attributes', {})
+    return f"{p['id']}:{attrs.get('lastModifiedDate', '')}:{attrs.get('trackCount', 0)}:{attrs.get('name', '')}"
+
+def ytm_playlist_signal(p: dict) -> str:
+    return f"{p['playlistId']}:{p.get('count', 0)}:{p.get('title', '')}"
+
+def playlist_cache_key(request: Request, platform: str) -> Optional[str]:
+    """Identifies whose playlists are being requested without any upstream call."""
+    if platform == "spotify":
+        return (request.session.get('spotify_user') or {}).get('id')
+    if platform == "apple-music":
+        token = (request.session.get('apple_music_token') or {}).get('user_token')
+        return hashlib.sha256(token.encode("utf-8")).hexdigest() if token else None
+    if platform == "youtube-music":
+        return request.session.get('youtube_music_client_key')
+    return None
+
+def playlist_list_response(entry: PlaylistCacheEntry, request: Request) -> Response:
+    # no-cache lets browsers keep the body but revalidate with If-None-Match
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if entry.matches(request.headers.get('if-none-match')):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
 # --- API Endpoints ---
 
 @router.get("/{platform}", response_model=List[Playlist])
 async def get_playlists(platform: str, request: Request):
-    print(f"🔍 [DEBUG] Playlist request for platform: {platform}")
+    logger.debug("Playlist request for platform: %s", platform)
+
+    # Fresh cache entries are served (or answered with 304) without touching
+    # the upstream API or the rate limiter.
+    user_key = playlist_cache_key(request, platform)
+    cached = await playlist_cache.get(platform, user_key) if user_key else None
+    if cached and cached.is_fresh():
+        return playlist_list_response(cached, request)
     
-    if not check_rate_limit(request, platform):
-        return {"error": "Rate limit exceeded"}
+    if not await check_rate_limit(request, platform):
+        raise HTTPException(status_code=429, detail="Rate limit exceeded", headers={"Retry-After": "2"})
     
     if platform == "spotify":
-        print("🎵 [DEBUG] Fetching Spotify playlists...")
         service = get_spotify_service(request)
         playlists_raw = await service.get_user_playlists()
-        result = [map_spotify_playlist(p) for p in playlists_raw]
-        print(f"✅ [DEBUG] Spotify: Returning {len(result)} playlists")
-        return result
+        signature = signature_of(spotify_playlist_signal(p) for p in playlists_raw)
+        mapper = map_spotify_playlist
         
     elif platform == "apple-music":
-        print("🍎 [DEBUG] Fetching Apple Music playlists...")
         service = get_apple_music_service(request)
         playlists_raw = await service.get_user_playlists()
-        result = [map_apple_music_playlist(p) for p in playlists_raw]
-        print(f"✅ [DEBUG] Apple Music: Returning {len(result)} playlists")
-        return result
+        signature = signature_of(apple_music_playlist_signal(p) for p in playlists_raw)
+        mapper = map_apple_music_playlist
 
     elif platform == "youtube-music":
-        print("📺 [DEBUG] Fetching YouTube Music playlists...")
         service = get_ytm_service(request)
         # ytmusicapi is sync, run in thread to not block event loop
         playlists_raw = await asyncio.to_thread(service.get_user_playlists)
-        result = [map_ytm_playlist(p) for p in playlists_raw]
-        print(f"✅ [DEBUG] YouTube Music: Returning {len(result)} playlists")
-        return result
+        signature = signature_of(ytm_playlist_signal(p) for p in playlists_raw)
+        mapper = map_ytm_playlist
 
-    print(f"❌ [DEBUG] Unknown platform: {platform}")
-    raise HTTPException(status_code=404, detail="Platform not supported")
+    else:
+        raise HTTPException(status_code=404, detail="Platform not supported")
+
+    if cached and cached.signature == signature:
+        # Nothing changed upstream: keep the body and ETag, skip re-mapping
+        entry = await playlist_cache.revalidated(platform, user_key, cached)
+    else:
+        result = [mapper(p) for p in playlists_raw]
+        entry = await playlist_cache.put(platform, user_key, jsonable_encoder(result), signature)
+    logger.debug("Returning playlists", extra={"fields": {"platform": platform, "count": len(playlists_raw)}})
+    return playlist_list_response(entry, request)
 
 @router.get("/{platform}/{playlist_id}/tracks")
-async def get_playlist_tracks(platform: str, playlist_id: str, request: Request):
-    # Implementation will be similar, getting the service
-    # and then calling get_playlist_tracks, followed by mapping.
-    return {"message": f"Tracks for {platform} playlist {playlist_id}"}
+async def get_playlist_tracks(platform: str, playlist_id: str, request: Request, format: Optional[str] = None):
+    """
+    Streams the playlist's tracks as normalized Track records, one upstream
+    page at a time. NDJSON by default; server-sent events when requested with
+    `?format=sse` or `Accept: text/event-stream`.
+    """
+    if platform == "spotify":
+        service, row_mapper = get_spotify_service(request), spotify_track_row
+    elif platform == "apple-music":
+        service, row_mapper = get_apple_music_service(request), apple_music_track_row
+    elif platform == "youtube-music":
+        service, row_mapper = get_ytm_service(request), ytm_track_row
+    else:
+        raise HTTPException(status_code=404, detail="Platform not supported")
+
+    use_sse = format == "sse" or (format is None and "text/event-stream" in request.headers.get("accept", ""))
+    # Pages go straight from raw items to a TrackBatch and out through orjson
+    encode = TrackBatch.to_sse if use_sse else TrackBatch.to_ndjson
+
+    async def stream():
+        count = 0
+        try:
+            async for page in service.iter_playlist_tracks(playlist_id):
+                batch = TrackBatch.from_items(page, row_mapper)
+                count += len(batch)
+                yield encode(batch)
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band
+            logger.error("Track stream for %s/%s failed: %s", platform, playlist_id, e)
+            error = orjson.dumps({"error": str(e)})
+            yield (b"event: error\ndata: " + error + b"\n\n") if use_sse else error + b"\n"
+            return
+        if use_sse:
+            yield b"event: end\ndata: " + orjson.dumps({"count": count}) + b"\n\n"
+
+    media_type = "text/event-stream" if use_sse else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type, headers={"Cache-Control": "no-cache"})
 
 # Test endpoint for YouTube Music
 @router.get("/youtube-music/test")
 async def test_youtube_music(request: Request):
     """Test endpoint to verify YouTube Music connectivity"""
     try:
-        headers_file = request.session.get('youtube_music_headers_file')
-        if not headers_file:
-            return {"error": "Not authenticated with YouTube Music", "authenticated": False}
-        
-        if not os.path.exists(headers_file):
-            return {"error": "YouTube Music authentication expired", "authenticated": False}
-        
-        with open(headers_file, 'r') as f:
-            headers_raw = f.read()
-        
-        service = YouTubeMusicService(headers_raw=headers_raw)
+        try:
+            service = get_ytm_service(request)
+        except HTTPException as e:
+            return {"error": e.detail, "authenticated": False}
         
         # Test basic connectivity
         auth_result = await asyncio.to_thread(service.test_authentication)
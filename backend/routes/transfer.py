@@ -0,0 +1,174 @@
+from fastapi import APIRouter, Request, HTTPException
+from starlette.responses import StreamingResponse
+from typing import List
+import asyncio
+
+from models.transfer import (
+    TransferRequest, TransferStatus, SyncRequest, LibraryTransferRequest, LibraryTransferStatus,
+)
+from routes.playlists import (
+    get_spotify_service, get_apple_music_service, get_ytm_service,
+    map_spotify_track, map_apple_music_track, map_ytm_track,
+    map_spotify_playlist, map_apple_music_playlist, map_ytm_playlist, playlist_cache_key,
+)
+from services.transfer_service import TransferJob, SyncJob, transfer_engine
+from services.transfer_events import transfer_events
+from services.sync_store import sync_store
+from services.library_transfer import LibraryTransferJob
+from services.track_index import track_index
+from services.log import get_logger
+
+router = APIRouter()
+logger = get_logger("transfer")
+
+# Service factory, mapper for playlist items, mapper for search results, mapper for playlists
+PLATFORMS = {
+    "spotify": (get_spotify_service, map_spotify_track, lambda t: map_spotify_track({'track': t}),
+                map_spotify_playlist),
+    "apple-music": (get_apple_music_service, map_apple_music_track, map_apple_music_track,
+                    map_apple_music_playlist),
+    "youtube-music": (get_ytm_service, map_ytm_track, map_ytm_track, map_ytm_playlist),
+}
+
+async def get_owned_status(request: Request, transfer_id: str, model=TransferStatus):
+    # Only transfers started from this session are visible to it. The job may
+    # be running on another worker; the engine then reads the shared status.
+    if transfer_id not in request.session.get('transfer_ids', []):
+        raise HTTPException(status_code=404, detail="Transfer not found")
+    status = await transfer_engine.status(transfer_id)
+    if not isinstance(status, model):
+        raise HTTPException(status_code=404, detail="Transfer not found")
+    return status
+
+def remember_job(request: Request, job):
+    request.session['transfer_ids'] = request.session.get('transfer_ids', [])[-49:] + [job.id]
+
+@router.post("/start")
+async def start_transfer(transfer_request: TransferRequest, request: Request):
+    source_platform = transfer_request.source_platform
+    destination_platform = transfer_request.destination_platform
+    if source_platform not in PLATFORMS or destination_platform not in PLATFORMS:
+        raise HTTPException(status_code=404, detail="Platform not supported")
+
+    get_source, source_mapper, _, _ = PLATFORMS[source_platform]
+    get_destination, _, search_mapper, _ = PLATFORMS[destination_platform]
+    job = TransferJob(
+        transfer_request,
+        source=get_source(request),
+        source_mapper=source_mapper,
+        destination=get_destination(request),
+        destination_mapper=search_mapper,
+        destination_cache_key=playlist_cache_key(request, destination_platform),
+    )
+    transfer_engine.start(job)
+
+    remember_job(request, job)
+    logger.info("Started transfer %s: %s -> %s", job.id, source_platform, destination_platform)
+    return {"transferId": job.id}
+
+@router.post("/sync")
+async def start_sync(sync_request: SyncRequest, request: Request):
+    """Re-runs an earlier transfer incrementally, applying only what changed at the source."""
+    source_platform = sync_request.source_platform
+    destination_platform = sync_request.destination_platform
+    if source_platform not in PLATFORMS or destination_platform not in PLATFORMS:
+        raise HTTPException(status_code=404, detail="Platform not supported")
+
+    get_source, source_mapper, _, _ = PLATFORMS[source_platform]
+    get_destination, _, search_mapper, _ = PLATFORMS[destination_platform]
+    source, destination = get_source(request), get_destination(request)
+
+    record = await sync_store.load((source_platform, sync_request.source_playlist_id,
+                                    destination_platform, sync_request.destination_playlist_id))
+    if record is None:
+        raise HTTPException(status_code=404, detail="No earlier transfer of this playlist pair to sync")
+    transfer_request = TransferRequest(
+        sourcePlatform=source_platform,
+        destinationPlatform=destination_platform,
+        sourcePlaylistId=sync_request.source_playlist_id,
+        playlistName=record.playlist_name,
+    )
+    job = SyncJob(
+        transfer_request,
+        source=source,
+        source_mapper=source_mapper,
+        destination=destination,
+        destination_mapper=search_mapper,
+        destination_playlist_id=sync_request.destination_playlist_id,
+        record=record,
+        destination_cache_key=playlist_cache_key(request, destination_platform),
+    )
+    transfer_engine.start(job)
+
+    remember_job(request, job)
+    logger.info("Started sync %s: %s -> %s", job.id, source_platform, destination_platform)
+    return {"transferId": job.id}
+
+@router.get("/status/{transfer_id}", response_model=TransferStatus)
+async def get_transfer_status(transfer_id: str, request: Request):
+    return await get_owned_status(request, transfer_id)
+
+@router.get("/events/{transfer_id}")
+async def stream_transfer_status(transfer_id: str, request: Request):
+    """
+    Server-sent events with the transfer's status (TransferStatus or
+    LibraryTransferStatus) whenever it changes, at most every
+    TRANSFER_EVENTS_INTERVAL seconds, then `end` once it has finished.
+    """
+    await get_owned_status(request, transfer_id, (TransferStatus, LibraryTransferStatus))
+
+    async def stream():
+        async for data in transfer_events.subscribe(transfer_id):
+            yield b": keep-alive\n\n" if data is None else b"event: status\ndata: " + data + b"\n\n"
+        yield b"event: end\ndata: {}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/history", response_model=List[TransferStatus])
+async def get_transfer_history(request: Request):
+    statuses = await asyncio.gather(*(transfer_engine.status(transfer_id)
+                                      for transfer_id in request.session.get('transfer_ids', [])))
+    return [status for status in reversed(statuses) if isinstance(status, TransferStatus)]
+
+@router.post("/library/start")
+async def start_library_transfer(transfer_request: LibraryTransferRequest, request: Request):
+    """Transfers several playlists (or the whole library), matching each unique track once."""
+    source_platform = transfer_request.source_platform
+    destination_platform = transfer_request.destination_platform
+    if source_platform not in PLATFORMS or destination_platform not in PLATFORMS:
+        raise HTTPException(status_code=404, detail="Platform not supported")
+    if transfer_request.playlist_ids != "all" and not transfer_request.playlist_ids:
+        raise HTTPException(status_code=400, detail="No playlists selected")
+
+    get_source, source_mapper, _, playlist_mapper = PLATFORMS[source_platform]
+    get_destination, _, search_mapper, _ = PLATFORMS[destination_platform]
+    job = LibraryTransferJob(
+        transfer_request,
+        source=get_source(request),
+        source_mapper=source_mapper,
+        playlist_mapper=playlist_mapper,
+        destination=get_destination(request),
+        destination_mapper=search_mapper,
+        destination_cache_key=playlist_cache_key(request, destination_platform),
+    )
+    transfer_engine.start(job)
+
+    remember_job(request, job)
+    logger.info("Started library transfer %s: %s -> %s", job.id, source_platform, destination_platform)
+    return {"transferId": job.id}
+
+@router.get("/library/status/{transfer_id}", response_model=LibraryTransferStatus)
+async def get_library_transfer_status(transfer_id: str, request: Request):
+    return await get_owned_status(request, transfer_id, LibraryTransferStatus)
+
+@router.post("/cancel/{transfer_id}")
+async def cancel_transfer(transfer_id: str, request: Request):
+    status = await get_owned_status(request, transfer_id, (TransferStatus, LibraryTransferStatus))
+    cancelled = await transfer_engine.cancel(transfer_id)
+    return {"success": cancelled, "status": status.status}
+
+@router.get("/index/stats")
+async def get_track_index_stats():
+    """Hit/miss counters for the shared track mapping index."""
+    return track_index.stats()
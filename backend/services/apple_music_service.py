@@ -1,12 +1,45 @@
 import os
+import asyncio
+import hashlib
 import httpx
 from typing import List, Dict, Any
 
+from services.http_client import get_http_client
+from services.rate_scheduler import outbound
+from services.single_flight import single_flight
+from services.batch_writes import write_chunks
+from services.metrics import upstream_pages
+
 # In a full implementation, you might generate a developer token automatically.
 # For now, we assume it's set as an environment variable.
 # See: https://developer.apple.com/documentation/applemusicapi/getting_keys_and_creating_tokens
 DEVELOPER_TOKEN = os.environ.get("APPLE_DEVELOPER_TOKEN", "")
-API_BASE_URL = "https://api.music.apple.com/v1"
+API_BASE_URL = os.environ.get("APPLE_MUSIC_API_BASE_URL", "https://api.music.apple.com/v1")
+STOREFRONT = os.environ.get("APPLE_MUSIC_STOREFRONT", "us")
+
+# Per-endpoint timeouts. Library pages can be slow to assemble on Apple's side
+# for large libraries, so they get a longer read timeout than the default.
+LIBRARY_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+# Largest page sizes the library endpoints accept; the default is 25 items
+LIBRARY_PLAYLISTS_PAGE_SIZE = 100
+LIBRARY_TRACKS_PAGE_SIZE = 100
+# Library songs have no ISRC; their catalog song does, so it is included inline
+LIBRARY_TRACKS_INCLUDE = "catalog"
+
+# Track relationships sent per add call. Apple does not publish a hard cap.
+ADD_CHUNK_SIZE = int(os.environ.get("APPLE_MUSIC_ADD_CHUNK_SIZE", "100"))
+
+# filter[isrc] accepts at most 25 codes per catalog request
+ISRC_BATCH_SIZE = 25
+ISRC_CONCURRENCY = int(os.environ.get("APPLE_MUSIC_ISRC_CONCURRENCY", "4"))
+
+def _with_params(endpoint: str, params: Dict[str, Any]) -> str:
+    """Apple's `next` links carry only the offset, so the page size (and include) is added to each one."""
+    url = httpx.URL(endpoint)
+    missing = {key: value for key, value in params.items() if key not in url.params}
+    return str(url.copy_merge_params(missing)) if missing else endpoint
+
 
 class AppleMusicService:
     def __init__(self, user_token: str):
@@ -16,17 +49,35 @@ class AppleMusicService:
             raise ValueError("Apple Music Developer Token is not configured.")
 
         self.user_token = user_token
+        self.user_key = hashlib.sha256(user_token.encode("utf-8")).hexdigest()[:16]
         self.headers = {
             "Authorization": f"Bearer {DEVELOPER_TOKEN}",
             "Music-User-Token": self.user_token,
         }
 
-    async def _request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
-        async with httpx.AsyncClient() as client:
-            response = await client.request(method, f"{API_BASE_URL}{endpoint}", headers=self.headers, **kwargs)
-            response.raise_for_status()
-            return response.json()
+    async def _request(self, method: str, endpoint: str, operation: str = "request", **kwargs) -> Dict[str, Any]:
+        # Reuse the app-wide pooled client so paging keeps the connection alive
+        client = get_http_client()
+        # `next` links returned by Apple are already rooted at /v1
+        if endpoint.startswith("/v1/"):
+            endpoint = endpoint[3:]
+        response = await outbound.send(
+            "apple-music", self.user_key,
+            lambda: client.request(method, f"{API_BASE_URL}{endpoint}", headers=self.headers, **kwargs),
+            operation,
+            idempotent=method == "GET",
+        )
+        response.raise_for_status()
+        # Library write endpoints answer 201/204 without a body
+        return response.json() if response.content else {}
 
+    @single_flight(lambda self: self.user_key)
+    async def _get_page(self, endpoint: str, operation: str) -> Dict[str, Any]:
+        # Coalesced so concurrent identical listings share each page fetch
+        upstream_pages.inc("apple-music")
+        return await self._request("GET", endpoint, operation, timeout=LIBRARY_TIMEOUT)
+
+    @single_flight(lambda self: self.user_key)
     async def get_user_playlists(self) -> List[Dict[str, Any]]:
         """
         Fetches all of the user's playlists.
@@ -35,25 +86,94 @@ class AppleMusicService:
         endpoint = "/me/library/playlists"
         
         while endpoint:
-            data = await self._request("GET", endpoint)
+            data = await self._get_page(_with_params(endpoint, {"limit": LIBRARY_PLAYLISTS_PAGE_SIZE}), "library_playlists")
             playlists.extend(data.get("data", []))
             endpoint = data.get("next")
             
         return playlists
 
-    async def get_playlist_tracks(self, playlist_id: str) -> List[Dict[str, Any]]:
+    async def get_playlist_snapshot(self, playlist_id: str):
         """
-        Fetches all tracks for a given library playlist ID.
+        The library playlist's lastModifiedDate. Apple has no removal
+        endpoint for library playlist tracks, so this is also the only way
+        to tell a playlist changed without reading all of it.
+        """
+        data = await self._request("GET", f"/me/library/playlists/{playlist_id}", "library_playlist")
+        playlists = data.get("data", [])
+        return playlists[0].get("attributes", {}).get("lastModifiedDate") if playlists else None
+
+    async def iter_playlist_tracks(self, playlist_id: str):
+        """
+        Yields pages of tracks for a given library playlist ID as they arrive.
         """
-        tracks = []
         # Note: The 'v1/me/library/playlists/{id}/tracks' endpoint might not exist in this exact form.
         # You often have to fetch the playlist first, then get the tracks relationship.
         # This is a simplified representation. The actual implementation might be more complex.
         endpoint = f"/me/library/playlists/{playlist_id}/tracks"
         
         while endpoint:
-            data = await self._request("GET", endpoint)
-            tracks.extend(data.get("data", []))
+            page_endpoint = _with_params(endpoint, {"limit": LIBRARY_TRACKS_PAGE_SIZE, "include": LIBRARY_TRACKS_INCLUDE})
+            data = await self._get_page(page_endpoint, "library_playlist_tracks")
+            yield data.get("data", [])
             endpoint = data.get("next")
-            
-        return tracks 
\ No newline at end of file
+
+    @single_flight(lambda self: self.user_key)
+    async def get_playlist_tracks(self, playlist_id: str) -> List[Dict[str, Any]]:
+        """
+        Fetches all tracks for a given library playlist ID.
+        """
+        tracks = []
+        async for page in self.iter_playlist_tracks(playlist_id):
+            tracks.extend(page)
+        return tracks
+
+    async def search_tracks(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Searches the catalog for songs matching a free-text query.
+        """
+        params = {"term": query, "types": "songs", "limit": limit}
+        data = await self._request("GET", f"/catalog/{STOREFRONT}/search", "search", params=params)
+        return data.get("results", {}).get("songs", {}).get("data", [])
+
+    async def lookup_isrcs(self, isrcs: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Resolves ISRCs to catalog songs, ISRC_BATCH_SIZE codes per request.
+        Returns a mapping of upper-case ISRC to the first matching song;
+        ISRCs with no catalog match are left out.
+        """
+        codes = list(dict.fromkeys(isrc.upper() for isrc in isrcs if isrc))
+        semaphore = asyncio.Semaphore(ISRC_CONCURRENCY)
+        found: Dict[str, Dict[str, Any]] = {}
+
+        async def fetch(batch: List[str]):
+            async with semaphore:
+                data = await self._request("GET", f"/catalog/{STOREFRONT}/songs", "catalog_songs_by_isrc",
+                                           params={"filter[isrc]": ",".join(batch)})
+            for song in data.get("data", []):
+                isrc = (song.get("attributes", {}).get("isrc") or "").upper()
+                # Several releases can share an ISRC; keep the first listed
+                if isrc in batch and isrc not in found:
+                    found[isrc] = song
+
+        await asyncio.gather(*(fetch(codes[i:i + ISRC_BATCH_SIZE])
+                               for i in range(0, len(codes), ISRC_BATCH_SIZE)))
+        return found
+
+    async def create_playlist(self, name: str, description: str = "") -> str:
+        """
+        Creates a library playlist and returns its ID.
+        """
+        body = {"attributes": {"name": name, "description": description}}
+        data = await self._request("POST", "/me/library/playlists", "create_playlist", json=body)
+        return data["data"][0]["id"]
+
+    async def add_tracks(self, playlist_id: str, track_ids: List[str], preserve_order: bool = True) -> int:
+        """
+        Appends catalog songs to a library playlist as bulk track
+        relationships, ADD_CHUNK_SIZE per call. Returns the number of calls.
+        """
+        async def write(chunk):
+            body = {"data": [{"id": track_id, "type": "songs"} for track_id in chunk]}
+            return await self._request("POST", f"/me/library/playlists/{playlist_id}/tracks", "add_tracks", json=body)
+
+        return await write_chunks(list(track_ids), ADD_CHUNK_SIZE, write, ordered=preserve_order)
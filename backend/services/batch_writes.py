@@ -0,0 +1,105 @@
+import os
+import time
+import asyncio
+from typing import Awaitable, Callable, List, Sequence, Tuple
+
+import httpx
+
+from services.rate_scheduler import UNSENT_ERRORS, backoff_delay
+
+# Extra attempts per chunk that certainly did not apply, once the scheduler's
+# own retries (429s and connect errors, for writes) have run out
+CHUNK_RETRIES = int(os.environ.get("WRITE_CHUNK_RETRIES", "2"))
+# Chunks in flight at once when the caller does not need them kept in order
+CHUNK_CONCURRENCY = int(os.environ.get("WRITE_CHUNK_CONCURRENCY", "4"))
+
+
+class WriteNotApplied(Exception):
+    """Raised by a chunk writer when the platform certainly did not apply the write."""
+
+
+class ChunkWriteError(Exception):
+    """A chunk still failed after its retries. `written` tracks made it in before it."""
+
+    def __init__(self, written: int, failed: List[Tuple[int, int]], cause: BaseException):
+        super().__init__(f"{len(failed)} chunk(s) failed after {written} tracks were written: {cause}")
+        self.written = written
+        self.failed = failed  # (start index, size) of each failed chunk
+        self.cause = cause
+
+
+def chunked(items: Sequence, size: int) -> List[Tuple[int, list]]:
+    return [(start, list(items[start:start + size])) for start in range(0, len(items), size)]
+
+
+def is_retriable(error: BaseException) -> bool:
+    """
+    Only failures that certainly left the playlist untouched: resending an
+    append after a timeout, a 5xx or an unknown error could add it twice.
+    """
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429
+    return isinstance(error, (WriteNotApplied, *UNSENT_ERRORS))
+
+
+async def _write_chunk(write: Callable[[list], Awaitable], chunk: list, retries: int):
+    for attempt in range(retries + 1):
+        try:
+            return await write(chunk)
+        except Exception as e:
+            if attempt == retries or not is_retriable(e):
+                raise
+            await asyncio.sleep(backoff_delay(attempt))
+
+
+async def write_chunks(items: Sequence, chunk_size: int, write: Callable[[list], Awaitable],
+                       ordered: bool = True, concurrency: int = CHUNK_CONCURRENCY,
+                       retries: int = CHUNK_RETRIES) -> int:
+    """
+    Writes `items` in chunks of `chunk_size` and returns the number of chunks.
+
+    Ordered writes go one chunk at a time, since none of the platforms keep
+    the order of concurrent appends. Unordered writes run up to `concurrency`
+    chunks at once. Either way only a failing chunk is retried.
+    """
+    chunks = chunked(items, chunk_size)
+    if ordered:
+        written = 0
+        for start, chunk in chunks:
+            try:
+                await _write_chunk(write, chunk, retries)
+            except Exception as e:
+                raise ChunkWriteError(written, [(start, len(chunk))], e) from e
+            written += len(chunk)
+        return len(chunks)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(chunk):
+        async with semaphore:
+            return await _write_chunk(write, chunk, retries)
+
+    results = await asyncio.gather(*(run(chunk) for _, chunk in chunks), return_exceptions=True)
+    failed = [(start, len(chunk)) for (start, chunk), r in zip(chunks, results) if isinstance(r, BaseException)]
+    if failed:
+        error = next(r for r in results if isinstance(r, BaseException))
+        raise ChunkWriteError(len(items) - sum(size for _, size in failed), failed, error)
+    return len(chunks)
+
+
+def write_chunks_blocking(items: Sequence, chunk_size: int, write: Callable[[list], object],
+                          retries: int = CHUNK_RETRIES) -> int:
+    """Sync, always-ordered counterpart of write_chunks for ytmusicapi."""
+    chunks = chunked(items, chunk_size)
+    written = 0
+    for start, chunk in chunks:
+        for attempt in range(retries + 1):
+            try:
+                write(chunk)
+                break
+            except Exception as e:
+                if attempt == retries or not is_retriable(e):
+                    raise ChunkWriteError(written, [(start, len(chunk))], e) from e
+                time.sleep(backoff_delay(attempt))
+        written += len(chunk)
+    return len(chunks)
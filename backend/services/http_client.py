@@ -0,0 +1,71 @@
+import os
+import httpx
+from typing import Optional
+
+from services.log import get_logger
+
+# Pool tuning for the app-wide outbound HTTP client. All values can be
+# overridden from the environment so they can be tuned per deployment.
+MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.environ.get("HTTP_HTTP2", "false").lower() in ("1", "true", "yes")
+
+# Default timeout; individual calls pass their own `timeout=` where an
+# endpoint is known to be slower (e.g. large library pages).
+DEFAULT_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+_client: Optional[httpx.AsyncClient] = None
+logger = get_logger("http")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _build_client() -> httpx.AsyncClient:
+    http2 = HTTP2_ENABLED
+    if http2 and not _http2_available():
+        logger.warning("HTTP/2 requested but the 'h2' package is not installed, falling back to HTTP/1.1")
+        http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=DEFAULT_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS,
+            max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+async def init_http_client() -> httpx.AsyncClient:
+    """Creates the shared client. Called from the FastAPI lifespan on startup."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Closes the shared client and its pooled connections on shutdown."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared client, creating it lazily when used outside the
+    app lifespan (scripts, benchmarks).
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
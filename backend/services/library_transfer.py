@@ -0,0 +1,285 @@
+import os
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from models.playlist import Playlist, Track
+from models.transfer import (
+    FailedMatch, LibraryPlaylistStatus, LibraryTransferRequest, LibraryTransferStatus,
+)
+from services.transfer_service import (
+    ADD_BATCH_SIZE, PLATFORM_CONCURRENCY, TrackMatcher, _now, call_service, forget_playlist_listing,
+)
+from services.log import get_logger
+
+# Source playlists fetched (and destination playlists written) at once per library transfer
+PLAYLIST_CONCURRENCY = int(os.environ.get("LIBRARY_TRANSFER_PLAYLIST_CONCURRENCY", "4"))
+
+logger = get_logger("library_transfer")
+
+TrackKey = Tuple[str, str]
+
+
+def track_key(track: Track) -> TrackKey:
+    # The same recording can sit in many playlists, sometimes under different
+    # source IDs (single vs album release); the ISRC identifies it across both.
+    return ("isrc", track.isrc.upper()) if track.isrc else ("id", track.id)
+
+
+class LibraryPlaylist:
+    """One source playlist of a library transfer and its destination copy."""
+
+    def __init__(self, playlist: Playlist):
+        self.playlist = playlist
+        self.status = "pending"
+        self.total_tracks = 0
+        self.added_tracks = 0
+        self.destination_playlist_id: Optional[str] = None
+        self.error: Optional[str] = None
+
+    def to_status(self) -> LibraryPlaylistStatus:
+        return LibraryPlaylistStatus(
+            sourcePlaylistId=self.playlist.id,
+            playlistName=self.playlist.name,
+            status=self.status,
+            totalTracks=self.total_tracks,
+            addedTracks=self.added_tracks,
+            destinationPlaylistId=self.destination_playlist_id,
+            error=self.error,
+        )
+
+
+class LibraryTransferJob:
+    """
+    Transfers many playlists at once. Source playlists are fetched
+    concurrently; each unique track is matched once, however many playlists
+    it appears in, and its match is fanned out to every destination playlist
+    that needs it.
+    """
+
+    def __init__(self, request: LibraryTransferRequest, source, source_mapper: Callable,
+                 playlist_mapper: Callable, destination, destination_mapper: Callable,
+                 destination_cache_key: Optional[str] = None):
+        self.id = str(uuid4())
+        self.request = request
+        self.source = source
+        self.source_mapper = source_mapper
+        self.playlist_mapper = playlist_mapper
+        self.destination = destination
+        # Whose cached destination playlist list to drop once this job writes there
+        self.destination_cache_key = destination_cache_key
+        self.destination_changed = False
+        self.matcher = TrackMatcher(request.source_platform, request.destination_platform,
+                                    destination, destination_mapper)
+
+        self.playlists: Optional[List[LibraryPlaylist]] = None
+        self.total_tracks = 0
+        self.successful_matches = 0
+        self.failed_matches: List[FailedMatch] = []
+        self.start_time = _now()
+        self.end_time: Optional[str] = None
+        self.error: Optional[str] = None
+
+        self.outcome: Optional[str] = None  # completed | failed | cancelled
+        self.task: Optional[asyncio.Task] = None
+        # One future per unique track, resolved to its destination ID (or None)
+        self._matches: Dict[TrackKey, asyncio.Future] = {}
+
+    @property
+    def unique_tracks(self) -> int:
+        return len(self._matches)
+
+    @property
+    def processed_tracks(self) -> int:
+        return self.successful_matches + len(self.failed_matches)
+
+    @property
+    def lookups_saved(self) -> int:
+        return self.total_tracks - self.unique_tracks
+
+    @property
+    def stage(self) -> str:
+        # Playlists move through the stages independently; report the earliest
+        if self.outcome:
+            return self.outcome
+        if self.task is None:
+            return "starting"
+        if self.playlists is None:
+            return "listing_playlists"
+        statuses = {p.status for p in self.playlists}
+        for stage in ("pending", "fetching_source", "matching_tracks"):
+            if stage in statuses:
+                return "fetching_source" if stage == "pending" else stage
+        return "adding_tracks"
+
+    def to_status(self) -> LibraryTransferStatus:
+        playlists = self.playlists or []
+        unique = self.unique_tracks
+        progress = 100.0 if self.outcome == "completed" else (
+            round(self.processed_tracks / unique * 100, 1) if unique else 0.0)
+        return LibraryTransferStatus(
+            id=self.id,
+            sourcePlatform=self.request.source_platform,
+            destinationPlatform=self.request.destination_platform,
+            status=self.stage,
+            progress=progress,
+            totalPlaylists=len(playlists),
+            completedPlaylists=sum(p.status == "completed" for p in playlists),
+            totalTracks=self.total_tracks,
+            uniqueTracks=unique,
+            processedTracks=self.processed_tracks,
+            successfulMatches=self.successful_matches,
+            failedMatches=self.failed_matches,
+            lookupsSaved=self.lookups_saved,
+            playlists=[p.to_status() for p in playlists],
+            startTime=self.start_time,
+            endTime=self.end_time,
+            error=self.error,
+        )
+
+    async def _resolve_playlists(self) -> List[LibraryPlaylist]:
+        items = await call_service(self.source.get_user_playlists)
+        playlists = [p for p in (self.playlist_mapper(item) for item in items) if p is not None]
+        if self.request.playlist_ids == "all":
+            return [LibraryPlaylist(p) for p in playlists]
+
+        by_id = {p.id: p for p in playlists}
+        entries = []
+        for playlist_id in dict.fromkeys(self.request.playlist_ids):
+            playlist = by_id.get(playlist_id)
+            if playlist is None:
+                entry = LibraryPlaylist(Playlist(id=playlist_id, name=playlist_id, trackCount=0,
+                                                 platform=self.request.source_platform))
+                entry.status, entry.error = "failed", "Playlist not found in the source library"
+            else:
+                entry = LibraryPlaylist(playlist)
+            entries.append(entry)
+        return entries
+
+    async def _fetch(self, entry: LibraryPlaylist, match_queue: asyncio.Queue) -> List[asyncio.Future]:
+        """Reads one source playlist, queueing only tracks no other playlist has queued yet."""
+        loop = asyncio.get_running_loop()
+        futures = []
+        # Registered here and not queued yet: other playlists may already wait on them
+        new: List[Tuple[Track, asyncio.Future]] = []
+        try:
+            async for page in self.source.iter_playlist_tracks(entry.playlist.id):
+                for track in (t for t in (self.source_mapper(item) for item in page) if t is not None):
+                    key = track_key(track)
+                    future = self._matches.get(key)
+                    if future is None:
+                        future = self._matches[key] = loop.create_future()
+                        new.append((track, future))
+                    futures.append(future)
+                    self.total_tracks += 1
+                entry.total_tracks = len(futures)
+                if new:
+                    tracks = [track for track, _ in new]
+                    known = await self.matcher.lookup_page(tracks, self.id)
+                    await match_queue.put((tracks, known, [future for _, future in new]))
+                    new.clear()
+        except BaseException as e:
+            # Settle them, so playlists sharing these tracks carry on without
+            # them rather than wait forever
+            for track, future in new:
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    self.failed_matches.append(FailedMatch(track=track, reason=f"Lookup failed: {e}"))
+                    future.set_result(None)
+            raise
+        return futures
+
+    async def _match(self, match_queue: asyncio.Queue):
+        while True:
+            tracks, known, futures = await match_queue.get()
+            try:
+                results = await self.matcher.match_page(tracks, known)
+            except Exception as e:
+                # Settle the page, so its playlists carry on without these tracks
+                logger.warning("Library transfer %s: matching a page failed: %s", self.id, e)
+                results = [e] * len(tracks)
+            for track, result, future in zip(tracks, results, futures):
+                if isinstance(result, Exception):
+                    match, reason = None, f"Search failed: {result}"
+                else:
+                    match, reason = result, "No match found on destination"
+                if match is None:
+                    self.failed_matches.append(FailedMatch(track=track, reason=reason))
+                else:
+                    self.successful_matches += 1
+                if not future.done():
+                    future.set_result(match)
+
+    async def _transfer_playlist(self, entry: LibraryPlaylist, match_queue: asyncio.Queue,
+                                 semaphore: asyncio.Semaphore):
+        if entry.status == "failed":
+            return
+        try:
+            async with semaphore:
+                entry.status = "fetching_source"
+                futures = await self._fetch(entry, match_queue)
+
+            entry.status = "matching_tracks"
+            matched = [m for m in await asyncio.gather(*futures) if m is not None]
+
+            async with semaphore:
+                entry.status = "adding_tracks"
+                playlist = entry.playlist
+                self.destination_changed = True
+                entry.destination_playlist_id = await call_service(
+                    self.destination.create_playlist, playlist.name, playlist.description or "")
+                batch_size = ADD_BATCH_SIZE.get(self.request.destination_platform, 100)
+                for start in range(0, len(matched), batch_size):
+                    batch = matched[start:start + batch_size]
+                    await call_service(self.destination.add_tracks, entry.destination_playlist_id, batch)
+                    entry.added_tracks += len(batch)
+            entry.status = "completed"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # One broken playlist doesn't stop the rest of the library
+            logger.warning("Library transfer %s: playlist %s failed: %s", self.id, entry.playlist.id, e)
+            entry.status, entry.error = "failed", str(e)
+
+    async def run(self):
+        workers = PLATFORM_CONCURRENCY.get(self.request.destination_platform, 4)
+        # Pages of new tracks waiting for a matcher
+        match_queue: asyncio.Queue = asyncio.Queue(maxsize=workers)
+        matchers = [asyncio.ensure_future(self._match(match_queue)) for _ in range(workers)]
+        semaphore = asyncio.Semaphore(PLAYLIST_CONCURRENCY)
+        work: Optional[asyncio.Future] = None
+        try:
+            self.playlists = await self._resolve_playlists()
+            work = asyncio.ensure_future(asyncio.gather(*(self._transfer_playlist(entry, match_queue, semaphore)
+                                                          for entry in self.playlists)))
+            # Matchers only stop when cancelled; without them the playlists would wait forever
+            done, _ = await asyncio.wait({work, *matchers}, return_when=asyncio.FIRST_COMPLETED)
+            if work not in done:
+                stopped = next(iter(done))
+                raise RuntimeError(f"A track matcher stopped: "
+                                   f"{'cancelled' if stopped.cancelled() else stopped.exception()}")
+            await work
+            failed = sum(p.status == "failed" for p in self.playlists)
+            if self.playlists and failed == len(self.playlists):
+                self.error = "Every playlist failed to transfer"
+                self.outcome = "failed"
+            else:
+                self.outcome = "completed"
+            logger.info("Library transfer %s finished", self.id, extra={"fields": {
+                "playlists": len(self.playlists), "failed_playlists": failed, "total_tracks": self.total_tracks,
+                "unique_tracks": self.unique_tracks, "lookups_saved": self.lookups_saved,
+            }})
+        except asyncio.CancelledError:
+            self.outcome = "cancelled"
+        except Exception as e:
+            logger.error("Library transfer %s failed: %s", self.id, e)
+            self.error = str(e)
+            self.outcome = "failed"
+        finally:
+            for task in (work, *matchers):
+                if task is not None:
+                    task.cancel()
+            if self.destination_changed:
+                await forget_playlist_listing(self.request.destination_platform, self.destination_cache_key, self.id)
+            self.end_time = _now()
@@ -0,0 +1,57 @@
+import os
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+import orjson
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")  # json | text
+ROOT_LOGGER = "playlist_converter"
+
+_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+_listener = None
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line. Structured fields go in `extra={"fields": {...}}`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+
+def setup_logging():
+    """
+    Routes the app's loggers through a queue. Callers (often on the event
+    loop) only enqueue the record; a background thread formats and writes it.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JSONFormatter() if LOG_FORMAT == "json"
+                         else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _listener = logging.handlers.QueueListener(_queue, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.addHandler(logging.handlers.QueueHandler(_queue))
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
@@ -0,0 +1,207 @@
+import os
+import multiprocessing
+import re
+import threading
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Confidence calculation (see PROJECT_STRUCTURE.md): text similarity carries
+# 80% of the score, duration similarity 20%, and 0.6 is the minimum to match.
+TITLE_WEIGHT = 0.45
+ARTIST_WEIGHT = 0.25
+ALBUM_WEIGHT = 0.10
+DURATION_WEIGHT = 0.20
+MATCH_THRESHOLD = float(os.environ.get("MATCH_THRESHOLD", "0.6"))
+
+# Durations further apart than this score zero on the duration component
+DURATION_TOLERANCE_MS = 15000
+# Neutral similarity used when either side lacks an album or duration
+UNKNOWN_SIMILARITY = 0.5
+
+NGRAM = 3
+VECTOR_DIM = 512
+# Sources scored per NumPy chunk; bounds the (chunk x candidates x dim) tensor
+CHUNK_SOURCES = 256
+# Batches with more source/candidate pairs than this are spread over processes
+PROCESS_POOL_MIN_PAIRS = int(os.environ.get("MATCHING_PROCESS_POOL_MIN_PAIRS", "200000"))
+PROCESS_POOL_WORKERS = int(os.environ.get("MATCHING_PROCESS_POOL_WORKERS", str(os.cpu_count() or 1)))
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+# (title, artist, album, duration_ms, isrc)
+TrackFields = Tuple[str, str, Optional[str], int, Optional[str]]
+
+_FEATURING = re.compile(r"[\(\[]?\s*\b(feat|ft|featuring)\b\.?.*?([\)\]]|$)")
+# A release tag after " - ": "2011 Remaster", "Radio Edit", "Live at Wembley",
+# a bare year. Anything else there is part of the title ("Left - Live Forever").
+_VERSION_TAG = (r"(?:\d{4}\s+)?(?:digital(?:ly)?\s+)?"
+                r"(?:remaster(?:ed)?|remix(?:ed)?|mono|stereo|deluxe|acoustic|radio|single|album|extended|live"
+                r"|demo|instrumental)(?:\s+(?:version|edit|mix|recording))?(?:\s+\d{4})?")
+_VERSION = re.compile(
+    r"[\(\[][^\(\)\[\]]*\b(?:remaster(?:ed)?|remix|version|edit|mono|stereo|deluxe|live)\b[^\(\)\[\]]*[\)\]]"
+    rf"|\s-\s+(?:{_VERSION_TAG}(?:\s+(?:at|from|in)\s.*)?|\d{{4}})\s*$")
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=200000)
+def normalize(text: Optional[str]) -> str:
+    """Casefolds and strips featuring credits, remaster/version tags and punctuation."""
+    if not text:
+        return ""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.casefold()
+    # Cheap substring checks spare most titles the regex passes
+    if "ft" in text or "feat" in text:
+        text = _FEATURING.sub(" ", text)
+    if "(" in text or "[" in text or "-" in text:
+        text = _VERSION.sub(" ", text)
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def ngram_vectors(strings: Sequence[str]) -> np.ndarray:
+    """
+    Hashed character n-gram vectors (L2-normalised) for already-normalised
+    strings. All n-grams of all strings are hashed in one pass over a single
+    concatenated byte buffer.
+    """
+    count = len(strings)
+    vectors = np.zeros((count, VECTOR_DIM), dtype=np.float32)
+    if not count:
+        return vectors
+
+    encoded = [f" {s} ".encode("utf-8") if s else b"" for s in strings]
+    lengths = np.fromiter((len(e) for e in encoded), dtype=np.int64, count=count)
+    buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.int64)
+    if not len(buffer):
+        return vectors
+
+    owner = np.repeat(np.arange(count), lengths)
+    ends = np.repeat(np.cumsum(lengths), lengths)
+    starts = np.flatnonzero(np.arange(len(buffer)) + NGRAM <= ends)
+
+    # Stable polynomial hash (Python's hash() is salted per process, which
+    # would break the process-pool path)
+    hashes = np.zeros(len(starts), dtype=np.int64)
+    for offset in range(NGRAM):
+        hashes = (hashes * 257 + buffer[starts + offset]) & 0xFFFFFFFF
+    buckets = ((hashes * 2654435761) & 0xFFFFFFFF) % VECTOR_DIM
+
+    flat = np.bincount(owner[starts] * VECTOR_DIM + buckets, minlength=count * VECTOR_DIM)
+    vectors[:] = flat.reshape(count, VECTOR_DIM)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def _field_similarity(sources: Sequence[Optional[str]], candidates: Sequence[Optional[str]], width: int) -> np.ndarray:
+    # Candidate lists repeat artists and albums heavily, so each distinct raw
+    # string is normalised and vectorised once, and every source is scored
+    # against all of them with a single matrix product.
+    unique = {}
+    index = np.fromiter((unique.setdefault(c, len(unique)) for c in candidates),
+                        dtype=np.int64, count=len(candidates)).reshape(len(sources), width)
+    src_vectors = ngram_vectors([normalize(s) for s in sources])
+    cand_vectors = ngram_vectors([normalize(c) for c in unique])
+    return np.take_along_axis(src_vectors @ cand_vectors.T, index, axis=1)
+
+
+def _score_chunk(sources: List[TrackFields], candidates: List[List[TrackFields]]) -> np.ndarray:
+    """Scores one chunk; returns (len(sources), width) with -1 for padding."""
+    width = max((len(c) for c in candidates), default=0)
+    if not sources or not width:
+        return np.full((len(sources), width), -1.0, dtype=np.float32)
+
+    padding: TrackFields = ("", "", None, 0, None)
+    flat = [field for c in candidates for field in (list(c) + [padding] * (width - len(c)))]
+    src_title, src_artist, src_album, src_duration, src_isrc = zip(*sources)
+    cand_title, cand_artist, cand_album, cand_duration, cand_isrc = zip(*flat)
+    shape = (len(sources), width)
+
+    title = _field_similarity(src_title, cand_title, width)
+    artist = _field_similarity(src_artist, cand_artist, width)
+    album = _field_similarity(src_album, cand_album, width)
+
+    has_album = (np.array([bool(a) for a in src_album])[:, None]
+                 & np.array([bool(a) for a in cand_album]).reshape(shape))
+    album = np.where(has_album, album, UNKNOWN_SIMILARITY)
+
+    src_ms = np.array([d or 0 for d in src_duration], dtype=np.float32)[:, None]
+    cand_ms = np.array([d or 0 for d in cand_duration], dtype=np.float32).reshape(shape)
+    duration = np.clip(1.0 - np.abs(src_ms - cand_ms) / DURATION_TOLERANCE_MS, 0.0, 1.0)
+    duration = np.where((src_ms > 0) & (cand_ms > 0), duration, UNKNOWN_SIMILARITY)
+
+    scores = (TITLE_WEIGHT * title + ARTIST_WEIGHT * artist
+              + ALBUM_WEIGHT * album + DURATION_WEIGHT * duration).astype(np.float32)
+
+    # Identical ISRCs are the same recording regardless of metadata
+    if any(src_isrc):
+        src_codes = np.array([(i or "").upper() for i in src_isrc], dtype=object)[:, None]
+        cand_codes = np.array([(i or "").upper() for i in cand_isrc], dtype=object).reshape(shape)
+        scores[(src_codes == cand_codes) & (cand_codes != "")] = 1.0
+
+    lengths = np.array([len(c) for c in candidates])
+    scores[np.arange(width)[None, :] >= lengths[:, None]] = -1.0
+    return scores
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """
+    One pool for the process, started on the first batch big enough to need
+    it. Workers come from a forkserver: forking this threaded server directly
+    could copy locks other threads hold into children that never release them.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS,
+                                                mp_context=multiprocessing.get_context("forkserver"))
+    return _process_pool
+
+
+def to_fields(track) -> TrackFields:
+    """Extracts the fields the matcher uses from a Track (or anything shaped like one)."""
+    return (track.title, track.artist, track.album, track.duration_ms, getattr(track, "isrc", None))
+
+
+def score_batch(sources: Sequence[TrackFields], candidates: Sequence[Sequence[TrackFields]]) -> np.ndarray:
+    """
+    Scores every candidate of every source track in [0, 1].
+
+    Returns an array of shape (len(sources), max candidates) where padding
+    cells are -1. Very large batches are split across a process pool.
+    """
+    width = max((len(c) for c in candidates), default=0)
+    chunks = [(list(sources[i:i + CHUNK_SOURCES]), [list(c) for c in candidates[i:i + CHUNK_SOURCES]])
+              for i in range(0, len(sources), CHUNK_SOURCES)]
+
+    if len(sources) * width >= PROCESS_POOL_MIN_PAIRS and PROCESS_POOL_WORKERS > 1 and len(chunks) > 1:
+        results = list(_get_process_pool().map(_score_chunk, *zip(*chunks)))
+    else:
+        results = [_score_chunk(*chunk) for chunk in chunks]
+
+    scores = np.full((len(sources), width), -1.0, dtype=np.float32)
+    row = 0
+    for result in results:
+        scores[row:row + result.shape[0], :result.shape[1]] = result
+        row += result.shape[0]
+    return scores
+
+
+def best_matches(sources: Sequence[TrackFields], candidates: Sequence[Sequence[TrackFields]],
+                 threshold: float = MATCH_THRESHOLD) -> List[Optional[Tuple[int, float]]]:
+    """For each source, (index of the best candidate, confidence) or None below threshold."""
+    scores = score_batch(sources, candidates)
+    if not scores.size:
+        return [None] * len(sources)
+    best = scores.argmax(axis=1)
+    confidence = scores[np.arange(len(sources)), best]
+    return [(int(b), float(c)) if c >= threshold else None for b, c in zip(best, confidence)]
@@ -0,0 +1,252 @@
+import re
+import time
+import threading
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Latency buckets in seconds, from fast cache hits to slow library pages
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}" for labels, v in values]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = [(labels, list(values)) for labels, values in self._series.items()]
+        lines = []
+        for labels, values in series:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {_format_value(cumulative)}")
+        return lines
+
+
+class CallbackMetric:
+    """Reads its samples at scrape time from state kept elsewhere (e.g. scheduler counters)."""
+
+    def __init__(self, name: str, help: str, type: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[Labels, float]]]):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}"
+                for labels, v in self.collect()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Inbound request latency by route.", ("method", "route", "status")))
+upstream_request_duration = registry.register(Histogram(
+    "upstream_request_duration_seconds", "Latency of each outbound API attempt.",
+    ("platform", "operation", "status")))
+upstream_pages = registry.register(Counter(
+    "upstream_pages_fetched_total", "Listing pages fetched from upstream APIs.", ("platform",)))
+thread_pool_wait = registry.register(Histogram(
+    "thread_pool_wait_seconds", "Time thread pool calls waited for a free worker.",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)))
+
+
+class InstrumentedThreadPool(ThreadPoolExecutor):
+    """
+    A thread pool, such as the loop's default executor (what
+    asyncio.to_thread runs on), counting queued and running calls so
+    saturation shows up in /metrics.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.name = kwargs.get("thread_name_prefix") or "pool"
+        self.queued = 0
+        self.active = 0
+        self._counter_lock = threading.Lock()
+
+    def submit(self, fn, /, *args, **kwargs):
+        submitted = time.perf_counter()
+        with self._counter_lock:
+            self.queued += 1
+
+        def run():
+            thread_pool_wait.observe(time.perf_counter() - submitted)
+            with self._counter_lock:
+                self.queued -= 1
+                self.active += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._counter_lock:
+                    self.active -= 1
+
+        try:
+            return super().submit(run)
+        except BaseException:
+            with self._counter_lock:
+                self.queued -= 1
+            raise
+
+
+_thread_pools: List[InstrumentedThreadPool] = []
+
+
+def create_thread_pool(max_workers=None, name: str = "to_thread") -> InstrumentedThreadPool:
+    pool = InstrumentedThreadPool(max_workers=max_workers, thread_name_prefix=name)
+    _thread_pools.append(pool)
+    return pool
+
+
+def _pool_samples(field: str):
+    totals: Dict[str, int] = {}
+    for pool in _thread_pools:
+        totals[pool.name] = totals.get(pool.name, 0) + getattr(pool, field)
+    return [((name,), value) for name, value in totals.items()]
+
+
+registry.register(CallbackMetric(
+    "thread_pool_queue_depth", "Calls waiting for a worker, per thread pool.", "gauge", ("pool",),
+    lambda: _pool_samples("queued")))
+registry.register(CallbackMetric(
+    "thread_pool_active", "Calls currently running, per thread pool.", "gauge", ("pool",),
+    lambda: _pool_samples("active")))
+
+
+_route_patterns: Dict[str, "re.Pattern"] = {}
+
+
+def route_template(scope: Scope) -> str:
+    """
+    The matched route's path template, e.g. /api/playlists/{platform}.
+    Routes of included routers may report their path without the router
+    prefix, so the prefix is recovered from the request path.
+    """
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if not path_format:
+        return "unmatched"
+    pattern = _route_patterns.get(route.path_regex.pattern)
+    if pattern is None:
+        pattern = _route_patterns[route.path_regex.pattern] = re.compile(route.path_regex.pattern.lstrip("^"))
+    match = pattern.search(scope["path"])
+    return (scope["path"][:match.start()] if match else "") + path_format
+
+
+class MetricsMiddleware:
+    """Records latency per route template (not raw path, to keep label cardinality bounded)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.observe(time.perf_counter() - started, scope["method"], route_template(scope), status)
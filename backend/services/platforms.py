@@ -0,0 +1,48 @@
+import importlib
+import threading
+from typing import Dict, List
+
+
+class PlatformAdapter:
+    """
+    Resolves a platform's service class on first use. Importing the service
+    module pulls in the platform SDK (spotipy, ytmusicapi), so a worker only
+    pays for the platforms its requests actually touch.
+    """
+
+    def __init__(self, platform: str, module: str, class_name: str):
+        self.platform = platform
+        self.module = module
+        self.class_name = class_name
+        self._service_class = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._service_class is not None
+
+    @property
+    def service_class(self):
+        if self._service_class is None:
+            with self._lock:
+                if self._service_class is None:
+                    self._service_class = getattr(importlib.import_module(self.module), self.class_name)
+        return self._service_class
+
+    def create(self, *args, **kwargs):
+        return self.service_class(*args, **kwargs)
+
+
+PLATFORM_ADAPTERS: Dict[str, PlatformAdapter] = {
+    "spotify": PlatformAdapter("spotify", "services.spotify_service", "SpotifyService"),
+    "apple-music": PlatformAdapter("apple-music", "services.apple_music_service", "AppleMusicService"),
+    "youtube-music": PlatformAdapter("youtube-music", "services.youtube_music_service", "YouTubeMusicService"),
+}
+
+
+def get_adapter(platform: str) -> PlatformAdapter:
+    return PLATFORM_ADAPTERS[platform]
+
+
+def loaded_platforms() -> List[str]:
+    return [platform for platform, adapter in PLATFORM_ADAPTERS.items() if adapter.loaded]
@@ -0,0 +1,117 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import orjson
+
+from services.shared_state import shared_state
+
+PLAYLIST_CACHE_TTL = float(os.environ.get("PLAYLIST_CACHE_TTL", "60"))
+PLAYLIST_CACHE_SIZE = int(os.environ.get("PLAYLIST_CACHE_SIZE", "1024"))
+# How long a shared entry is kept for revalidation after its last check
+PLAYLIST_CACHE_RETENTION = float(os.environ.get("PLAYLIST_CACHE_RETENTION", str(24 * 3600)))
+
+
+class PlaylistCacheEntry:
+    """A user's serialized playlist list plus what is needed to revalidate it."""
+
+    __slots__ = ("body", "etag", "signature", "checked_at")
+
+    def __init__(self, body: bytes, signature: str, checked_at: Optional[float] = None):
+        self.body = body
+        self.signature = signature
+        # Strong validator: derived from the exact bytes we send
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.checked_at = time.time() if checked_at is None else checked_at
+
+    def dumps(self) -> bytes:
+        # Header line, then the body as-is, so it is never re-encoded
+        return orjson.dumps([self.signature, self.checked_at]) + b"\n" + self.body
+
+    @classmethod
+    def loads(cls, data: bytes) -> "PlaylistCacheEntry":
+        header, body = data.split(b"\n", 1)
+        signature, checked_at = orjson.loads(header)
+        return cls(body, signature, checked_at)
+
+    def is_fresh(self, ttl: float = PLAYLIST_CACHE_TTL) -> bool:
+        return time.time() - self.checked_at < ttl
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or self.etag in candidates
+
+
+class PlaylistCache:
+    """
+    Per-user cache of GET /api/playlists/{platform} responses.
+
+    Within the TTL entries are served without any upstream call. After that
+    the route refetches the listing and compares a cheap change signature
+    (Spotify snapshot_id, Apple lastModifiedDate, YouTube Music counts); if it
+    is unchanged the entry is simply marked fresh again and keeps its ETag.
+
+    With a shared `store`, entries are kept there instead, so every worker
+    serves (and revalidates) the same entry and ETag.
+    """
+
+    def __init__(self, max_size: int = PLAYLIST_CACHE_SIZE, store=None):
+        self.max_size = max_size
+        self.store = store
+        self._entries: "OrderedDict[Tuple[str, str], PlaylistCacheEntry]" = OrderedDict()
+
+    @staticmethod
+    def _store_key(platform: str, user_key: str) -> str:
+        return f"playlists:{platform}:{user_key}"
+
+    async def _save(self, platform: str, user_key: str, entry: PlaylistCacheEntry):
+        if self.store is not None:
+            await self.store.set(self._store_key(platform, user_key), entry.dumps(), PLAYLIST_CACHE_RETENTION)
+            return
+        self._entries[(platform, user_key)] = entry
+        self._entries.move_to_end((platform, user_key))
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get(self, platform: str, user_key: str) -> Optional[PlaylistCacheEntry]:
+        if self.store is not None:
+            data = await self.store.get(self._store_key(platform, user_key))
+            return PlaylistCacheEntry.loads(data) if data is not None else None
+        entry = self._entries.get((platform, user_key))
+        if entry is not None:
+            self._entries.move_to_end((platform, user_key))
+        return entry
+
+    async def put(self, platform: str, user_key: str, payload, signature: str) -> PlaylistCacheEntry:
+        body = orjson.dumps(payload)
+        entry = PlaylistCacheEntry(body, signature)
+        if user_key:
+            await self._save(platform, user_key, entry)
+        return entry
+
+    async def revalidated(self, platform: str, user_key: str, entry: PlaylistCacheEntry) -> PlaylistCacheEntry:
+        entry.checked_at = time.time()
+        if self.store is not None:
+            await self._save(platform, user_key, entry)
+        return entry
+
+    async def invalidate(self, platform: str, user_key: str) -> None:
+        if self.store is not None:
+            await self.store.delete(self._store_key(platform, user_key))
+        self._entries.pop((platform, user_key), None)
+
+
+def signature_of(signals) -> str:
+    """Collapses per-playlist change signals into one comparable digest."""
+    digest = hashlib.sha256()
+    for signal in signals:
+        digest.update(signal.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+playlist_cache = PlaylistCache(store=shared_state if shared_state.shared else None)
@@ -0,0 +1,277 @@
+import os
+import time
+import random
+import asyncio
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from services.metrics import CallbackMetric, registry, upstream_request_duration
+from services.shared_state import shared_state
+
+# Sustained requests/sec and burst size per platform. These are starting
+# points; each limiter backs off on 429s and creeps back up on success.
+PLATFORM_RATES = {
+    "spotify": (float(os.environ.get("SPOTIFY_RATE_LIMIT", "20")), int(os.environ.get("SPOTIFY_RATE_BURST", "40"))),
+    "apple-music": (float(os.environ.get("APPLE_MUSIC_RATE_LIMIT", "20")), int(os.environ.get("APPLE_MUSIC_RATE_BURST", "40"))),
+    "youtube-music": (float(os.environ.get("YOUTUBE_MUSIC_RATE_LIMIT", "5")), int(os.environ.get("YOUTUBE_MUSIC_RATE_BURST", "10"))),
+}
+
+MAX_RETRIES = int(os.environ.get("OUTBOUND_MAX_RETRIES", "4"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Failures before the request went out. Only these (and 429) are retried for
+# writes: after a timeout or 5xx the write may already have been applied.
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Honours Retry-After when given, otherwise exponential backoff with jitter."""
+    if retry_after is not None:
+        return retry_after + random.uniform(0, BACKOFF_BASE)
+    return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * random.uniform(0.5, 1.5)
+
+
+class PlatformLimiter:
+    """
+    Token bucket for one upstream platform with fair queuing across users.
+
+    Waiters are grouped per user and served round-robin, so one user's
+    5,000-track transfer cannot starve another user's playlist listing.
+    The rate halves on every 429 (and pauses for Retry-After) and recovers
+    additively on successful calls.
+
+    With a `shared` state store the bucket itself lives there, so every
+    worker process draws from one host-wide budget; queuing and fairness
+    stay per worker.
+    """
+
+    def __init__(self, rate: float, burst: int, shared=None, name: str = ""):
+        self.shared = shared
+        self.name = name
+        self.max_rate = rate
+        self.min_rate = max(rate / 16, 0.1)
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.counters = {"requests": 0, "throttled": 0, "retries": 0}
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _take_local(self) -> float:
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        return 0.0
+
+    async def _take(self) -> float:
+        """Takes a token and returns 0, or returns how long to wait for one."""
+        if self.shared is None:
+            return self._take_local()
+        # The shared bucket works in wall-clock time
+        paused_for = self.paused_until - time.monotonic()
+        return await self.shared.take_token(f"outbound:{self.name}", self.rate, self.burst,
+                                            time.time() + paused_for if paused_for > 0 else 0.0)
+
+    async def acquire(self, user_key: str):
+        if self.shared is None and not self._queues and self._take_local() == 0:
+            return
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queues.setdefault(user_key, deque()).append(future)
+        if self._dispatcher is None or self._dispatcher.done() or self._dispatcher.get_loop() is not loop:
+            self._dispatcher = loop.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        while self._queues:
+            # Round-robin: serve the user at the head, then move them to the back
+            user_key, queue = next(iter(self._queues.items()))
+            if queue[0].done():
+                # Waiter was cancelled; drop it without spending a token
+                queue.popleft()
+                if not queue:
+                    del self._queues[user_key]
+                continue
+            wait = await self._take()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            del self._queues[user_key]
+            future = queue.popleft()
+            if queue:
+                self._queues[user_key] = queue
+            if not future.done():
+                future.set_result(None)
+
+    def throttled(self, retry_after: Optional[float]):
+        self.counters["throttled"] += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+
+    def succeeded(self):
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class OutboundScheduler:
+    """Every upstream call goes through here: rate limiting, fairness and retries."""
+
+    def __init__(self, rates: Dict[str, Tuple[float, int]] = PLATFORM_RATES, shared=None):
+        self.shared = shared
+        self.limiters = {platform: PlatformLimiter(rate, burst, shared, platform)
+                         for platform, (rate, burst) in rates.items()}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Binds the event loop whose limiters worker threads queue on."""
+        self._loop = loop
+
+    def limiter(self, platform: str) -> PlatformLimiter:
+        if platform not in self.limiters:
+            self.limiters[platform] = PlatformLimiter(5, 10, self.shared, platform)
+        return self.limiters[platform]
+
+    async def acquire(self, platform: str, user_key: str):
+        self._loop = asyncio.get_running_loop()
+        await self.limiter(platform).acquire(user_key)
+
+    async def send(self, platform: str, user_key: str, send: Callable[[], Awaitable[httpx.Response]],
+                   operation: str = "request", idempotent: bool = True) -> httpx.Response:
+        """
+        Runs `send` under the platform's limiter, retrying 429/5xx responses
+        and transport errors with jittered backoff. Requests that are not
+        `idempotent` are only retried on 429 and on errors raised before they
+        were sent. The last response is returned as-is so callers keep using
+        raise_for_status().
+        """
+        limiter = self.limiter(platform)
+        for attempt in range(MAX_RETRIES + 1):
+            await self.acquire(platform, user_key)
+            limiter.counters["requests"] += 1
+            started = time.perf_counter()
+            try:
+                response = await send()
+            except httpx.TransportError as e:
+                upstream_request_duration.observe(time.perf_counter() - started, platform, operation, "error")
+                if attempt == MAX_RETRIES or not (idempotent or isinstance(e, UNSENT_ERRORS)):
+                    raise
+                limiter.counters["retries"] += 1
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            upstream_request_duration.observe(time.perf_counter() - started, platform, operation,
+                                              str(response.status_code))
+            if response.status_code not in RETRY_STATUSES:
+                limiter.succeeded()
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status_code == 429:
+                limiter.throttled(retry_after)
+            if attempt == MAX_RETRIES or not (idempotent or response.status_code == 429):
+                return response
+            limiter.counters["retries"] += 1
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+        return response
+
+    def acquire_blocking(self, platform: str, user_key: str):
+        """
+        Waits for a slot from a worker thread (sync SDKs run via
+        asyncio.to_thread) by queuing on the event loop's limiter.
+        """
+        try:
+            asyncio.get_running_loop()
+            return  # on the loop thread itself; blocking here would deadlock
+        except RuntimeError:
+            pass
+        loop = self._loop
+        if loop is None or not loop.is_running():
+            return
+        asyncio.run_coroutine_threadsafe(self.limiter(platform).acquire(user_key), loop).result()
+
+    def send_blocking(self, platform: str, user_key: str, send: Callable, operation: str = "request",
+                      idempotent: bool = True):
+        """
+        Sync counterpart of send() for SDKs built on `requests` (ytmusicapi),
+        called from worker threads. Errors are raised, not retried.
+        """
+        limiter = self.limiter(platform)
+        for attempt in range(MAX_RETRIES + 1):
+            self.acquire_blocking(platform, user_key)
+            limiter.counters["requests"] += 1
+            started = time.perf_counter()
+            try:
+                response = send()
+            except Exception:
+                upstream_request_duration.observe(time.perf_counter() - started, platform, operation, "error")
+                raise
+            upstream_request_duration.observe(time.perf_counter() - started, platform, operation,
+                                              str(response.status_code))
+            if response.status_code not in RETRY_STATUSES:
+                limiter.succeeded()
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if response.status_code == 429:
+                limiter.throttled(retry_after)
+            if attempt == MAX_RETRIES or not (idempotent or response.status_code == 429):
+                return response
+            limiter.counters["retries"] += 1
+            time.sleep(backoff_delay(attempt, retry_after))
+        return response
+
+    def stats(self) -> Dict[str, dict]:
+        return {
+            platform: dict(limiter.counters, rate=round(limiter.rate, 2),
+                           queued=sum(len(q) for q in limiter._queues.values()))
+            for platform, limiter in self.limiters.items()
+        }
+
+
+# Rate limits are per app at the upstream APIs, so workers share one budget
+# whenever the shared state is actually shared between them
+outbound = OutboundScheduler(shared=shared_state if shared_state.shared else None)
+
+
+def _limiter_samples(field: str):
+    return [((platform,), limiter.counters[field]) for platform, limiter in outbound.limiters.items()]
+
+
+registry.register(CallbackMetric("upstream_requests_total", "Outbound API attempts, including retries.",
+                                 "counter", ("platform",), lambda: _limiter_samples("requests")))
+registry.register(CallbackMetric("upstream_retries_total", "Outbound attempts that were retried.",
+                                 "counter", ("platform",), lambda: _limiter_samples("retries")))
+registry.register(CallbackMetric("upstream_throttled_total", "429 responses received from upstream APIs.",
+                                 "counter", ("platform",), lambda: _limiter_samples("throttled")))
+registry.register(CallbackMetric(
+    "upstream_rate_limit", "Current adaptive request rate per platform (requests/sec).", "gauge", ("platform",),
+    lambda: [((platform,), limiter.rate) for platform, limiter in outbound.limiters.items()]))
+registry.register(CallbackMetric(
+    "upstream_queued_requests", "Outbound calls waiting for a rate-limit slot.", "gauge", ("platform",),
+    lambda: [((platform,), sum(len(q) for q in limiter._queues.values()))
+             for platform, limiter in outbound.limiters.items()]))
@@ -0,0 +1,224 @@
+import os
+import time
+import secrets
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Literal, Optional, Tuple
+
+import orjson
+from starlette.datastructures import MutableHeaders
+from starlette.middleware.sessions import Session
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.shared_state import SHARED_STATE
+
+# Follows SHARED_STATE unless set: workers sharing state need shared sessions too
+SESSION_STORE = os.environ.get("SESSION_STORE", SHARED_STATE)  # memory | sqlite
+SESSION_STORE_PATH = os.environ.get("SESSION_STORE_PATH", "sessions.sqlite3")
+SESSION_STORE_SIZE = int(os.environ.get("SESSION_STORE_SIZE", "10000"))
+SESSION_MAX_AGE = int(os.environ.get("SESSION_MAX_AGE", str(14 * 24 * 3600)))
+
+# (serialized session, expires_at)
+SessionRecord = Tuple[bytes, float]
+
+
+class MemorySessionStore:
+    """
+    Session ID -> session data, kept in a bounded LRU that drops expired entries.
+
+    Sessions are lost on restart and private to one worker process; set
+    SESSION_STORE=sqlite for deployments with several workers.
+    """
+
+    def __init__(self, size: int = SESSION_STORE_SIZE):
+        self.size = size
+        self._sessions: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def load(self, session_id: str) -> Optional[Tuple[dict, float]]:
+        """Returns (data, expires_at), or None for unknown or expired sessions."""
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is None:
+                return None
+            if record[1] <= time.time():
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+        return orjson.loads(record[0]), record[1]
+
+    async def save(self, session_id: str, data: dict, max_age: int) -> float:
+        expires_at = time.time() + max_age
+        with self._lock:
+            self._sessions[session_id] = (orjson.dumps(data), expires_at)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.size:
+                self._sessions.popitem(last=False)
+        return expires_at
+
+    async def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in a SQLite file (WAL), so they survive restarts and are shared
+    by workers on one host. No in-process cache: another worker may have
+    changed the session since this one last saw it.
+    """
+
+    # Expired rows are purged every this many writes
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str = SESSION_STORE_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    expires_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_expiry ON sessions (expires_at)")
+        return self._conn
+
+    def _load_sync(self, session_id: str) -> Optional[SessionRecord]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT data, expires_at FROM sessions WHERE id = ? AND expires_at > ?",
+                (session_id, time.time()),
+            ).fetchone()
+        return row
+
+    def _save_sync(self, session_id: str, data: bytes, expires_at: float):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO sessions (id, data, expires_at) VALUES (?, ?, ?)",
+                             (session_id, data, expires_at))
+                self._writes += 1
+                if self._writes % self.PURGE_EVERY == 0:
+                    conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),))
+
+    def _delete_sync(self, session_id: str):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    async def load(self, session_id: str) -> Optional[Tuple[dict, float]]:
+        row = await asyncio.to_thread(self._load_sync, session_id)
+        if row is None:
+            return None
+        return orjson.loads(row[0]), row[1]
+
+    async def save(self, session_id: str, data: dict, max_age: int) -> float:
+        expires_at = time.time() + max_age
+        await asyncio.to_thread(self._save_sync, session_id, orjson.dumps(data), expires_at)
+        return expires_at
+
+    async def delete(self, session_id: str):
+        await asyncio.to_thread(self._delete_sync, session_id)
+
+
+def new_session_id() -> str:
+    # 256 random bits: unguessable, so the cookie needs no signature
+    return secrets.token_urlsafe(32)
+
+
+def rotate_session_id(connection: HTTPConnection):
+    """
+    Moves the session to a new ID when the response is sent. Call it after
+    a login: the ID is a bearer credential, and one planted in the browser
+    before the login must not carry the new tokens.
+    """
+    connection.scope["session_rotate"] = True
+
+
+class ServerSessionMiddleware:
+    """
+    Drop-in replacement for Starlette's SessionMiddleware that keeps session
+    data server-side. The cookie carries only an opaque session ID and is
+    sent when the session is created, renewed, rotated (see
+    rotate_session_id) or cleared, not on every response.
+    `request.session` behaves exactly as before.
+    """
+
+    def __init__(self, app: ASGIApp, store, session_cookie: str = "session",
+                 max_age: int = SESSION_MAX_AGE, path: str = "/",
+                 same_site: Literal["lax", "strict", "none"] = "lax", https_only: bool = False):
+        self.app = app
+        self.store = store
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.path = path
+        self.security_flags = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+
+    def _cookie(self, value: str, max_age: int) -> str:
+        return f"{self.session_cookie}={value}; path={self.path}; Max-Age={max_age}; {self.security_flags}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
+        session_id = connection.cookies.get(self.session_cookie)
+        record = await self.store.load(session_id) if session_id else None
+        if record is None:
+            session_id, data, expires_at = None, {}, 0.0
+        else:
+            data, expires_at = record
+        scope["session"] = Session(data)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                session: Session = scope["session"]
+                headers = MutableHeaders(scope=message)
+                if session.accessed:
+                    headers.add_vary_header("Cookie")
+
+                # Sliding expiry: renew once half the lifetime has passed
+                renew = session_id is not None and expires_at - time.time() < self.max_age / 2
+                rotate = session_id is not None and scope.get("session_rotate", False)
+                if session and (session.modified or renew or rotate):
+                    sid = new_session_id() if rotate or session_id is None else session_id
+                    await self.store.save(sid, dict(session), self.max_age)
+                    if rotate:
+                        await self.store.delete(session_id)
+                    if sid != session_id or renew:
+                        headers.append("Set-Cookie", self._cookie(sid, self.max_age))
+                elif session.modified and session_id is not None:
+                    # The session has been cleared
+                    await self.store.delete(session_id)
+                    headers.append("Set-Cookie", self._cookie("null", 0))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+def create_session_store():
+    if SESSION_STORE == "sqlite":
+        return SQLiteSessionStore()
+    return MemorySessionStore()
+
+
+session_store = create_session_store()
@@ -0,0 +1,231 @@
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from typing import Optional, Tuple
+
+from services.metrics import create_thread_pool
+
+# memory: state lives in each worker process (fine for a single worker).
+# sqlite: one WAL database shared by every worker on the host.
+SHARED_STATE = os.environ.get("SHARED_STATE", "memory")  # memory | sqlite
+SHARED_STATE_PATH = os.environ.get("SHARED_STATE_PATH", "shared_state.sqlite3")
+SHARED_STATE_SIZE = int(os.environ.get("SHARED_STATE_SIZE", "10000"))
+
+
+class MemorySharedState:
+    """
+    In-process rate-limit counters and key/value entries, bounded in size
+    (least recently used keys go first) and expiring on their own.
+    """
+
+    shared = False
+
+    def __init__(self, max_keys: int = SHARED_STATE_SIZE):
+        self.max_keys = max_keys
+        self._hits: "OrderedDict[str, deque]" = OrderedDict()
+        self._values: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def hit(self, key: str, limit: int, window: float) -> bool:
+        """Counts a hit against `limit` per sliding `window` seconds; False when over it."""
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.pop(key, None) or deque()
+            while hits and now - hits[0] >= window:
+                hits.popleft()
+            allowed = len(hits) < limit
+            if allowed:
+                hits.append(now)
+            self._hits[key] = hits
+
+            # Drop expired or excess entries from the cold end
+            while self._hits:
+                oldest_key, oldest = next(iter(self._hits.items()))
+                if len(self._hits) > self.max_keys or not oldest or now - oldest[-1] >= window:
+                    del self._hits[oldest_key]
+                else:
+                    break
+            return allowed
+
+    async def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._values[key]
+                return None
+            self._values.move_to_end(key)
+            return entry[0]
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        with self._lock:
+            self._values[key] = (value, time.time() + ttl)
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_keys:
+                self._values.popitem(last=False)
+
+    async def delete(self, key: str):
+        with self._lock:
+            self._values.pop(key, None)
+
+
+class SQLiteSharedState:
+    """
+    Rate-limit counters, token buckets and key/value entries in one SQLite
+    file (WAL), shared by every worker process on the host. Each operation
+    is a single IMMEDIATE transaction, so concurrent workers never lose an
+    update or over-grant a limit.
+
+    Transactions run on the store's own thread rather than the default
+    executor: sync SDK calls wait for a token from a default-executor thread,
+    and a take queued behind them on that same pool would never run.
+    """
+
+    shared = True
+
+    # Expired rows are purged every this many writes
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str = SHARED_STATE_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        # One thread is enough: every operation holds the connection lock
+        self._executor = create_thread_pool(1, name="shared_state")
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # Autocommit; transactions are opened explicitly with BEGIN IMMEDIATE
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10.0)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(
+                """CREATE TABLE IF NOT EXISTS counters (
+                    key TEXT PRIMARY KEY,
+                    window_index INTEGER NOT NULL,
+                    window REAL NOT NULL,
+                    count INTEGER NOT NULL,
+                    previous_count INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    paused_until REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS kv (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS kv_expiry ON kv (expires_at);"""
+            )
+        return self._conn
+
+    def _transaction(self, fn, *args):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Read the clock only once holding the write lock: a time taken
+                # before waiting for it could be older than what another worker
+                # has already written, and would rewind its counter or bucket.
+                now = time.time()
+                result = fn(conn, *args, now)
+                self._writes += 1
+                if self._writes % self.PURGE_EVERY == 0:
+                    self._purge(conn, now)
+                conn.execute("COMMIT")
+                return result
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _purge(conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM kv WHERE expires_at <= ?", (now,))
+        # A counter whose window ended long ago counts for nothing
+        conn.execute("DELETE FROM counters WHERE (window_index + 2) * window < ?", (now,))
+
+    @staticmethod
+    def _hit(conn: sqlite3.Connection, key: str, limit: int, window: float, now: float) -> bool:
+        # Sliding window approximated from the current and previous fixed
+        # windows, weighting the previous one by how much of it still overlaps.
+        index = int(now // window)
+        row = conn.execute("SELECT window_index, count, previous_count FROM counters WHERE key = ?",
+                           (key,)).fetchone()
+        count, previous = 0, 0
+        if row is not None:
+            if row[0] == index:
+                count, previous = row[1], row[2]
+            elif row[0] == index - 1:
+                previous = row[1]
+        estimate = previous * (1 - (now - index * window) / window) + count
+        if estimate >= limit:
+            return False
+        conn.execute("INSERT OR REPLACE INTO counters (key, window_index, window, count, previous_count) "
+                     "VALUES (?, ?, ?, ?, ?)", (key, index, window, count + 1, previous))
+        return True
+
+    @staticmethod
+    def _take_token(conn: sqlite3.Connection, name: str, rate: float, burst: int,
+                    paused_until: float, now: float) -> float:
+        row = conn.execute("SELECT tokens, updated, paused_until FROM buckets WHERE name = ?", (name,)).fetchone()
+        tokens, updated, stored_pause = row if row is not None else (float(burst), now, 0.0)
+        tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+        paused_until = max(paused_until, stored_pause)
+        if now < paused_until:
+            wait = paused_until - now
+        elif tokens >= 1:
+            tokens, wait = tokens - 1, 0.0
+        else:
+            wait = (1 - tokens) / rate
+        conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated, paused_until) VALUES (?, ?, ?, ?)",
+                     (name, tokens, now, paused_until))
+        return wait
+
+    async def hit(self, key: str, limit: int, window: float) -> bool:
+        """Counts a hit against `limit` per sliding `window` seconds; False when over it."""
+        return await self._run(self._transaction, self._hit, key, limit, window)
+
+    async def take_token(self, name: str, rate: float, burst: int, paused_until: float = 0.0) -> float:
+        """
+        Takes one token from the named bucket and returns 0, or returns how
+        many seconds to wait before one is available without taking it.
+        `paused_until` (wall clock) pauses the bucket for every worker.
+        """
+        return await self._run(self._transaction, self._take_token, name, rate, burst, paused_until)
+
+    def _get_sync(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._connection().execute("SELECT value FROM kv WHERE key = ? AND expires_at > ?",
+                                             (key, time.time())).fetchone()
+        return row[0] if row is not None else None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._run(self._get_sync, key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self._run(self._transaction, lambda conn, now: conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl)))
+
+    async def delete(self, key: str):
+        await self._run(self._transaction, lambda conn, now: conn.execute(
+            "DELETE FROM kv WHERE key = ?", (key,)))
+
+
+def create_shared_state(kind: str = SHARED_STATE):
+    if kind == "sqlite":
+        return SQLiteSharedState()
+    return MemorySharedState()
+
+
+shared_state = create_shared_state()
@@ -0,0 +1,104 @@
+import asyncio
+import functools
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from services.metrics import CallbackMetric, registry
+
+# How many calls ran upstream versus piggybacked on an in-flight call
+counters = {"executed": 0, "coalesced": 0}
+
+
+class _AsyncFlights:
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Any]):
+        task = self._inflight.get(key)
+        if task is None:
+            counters["executed"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            counters["coalesced"] += 1
+        # Shield so one caller disconnecting does not cancel the shared call
+        return await asyncio.shield(task)
+
+
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _ThreadFlights:
+    """Same idea for sync service methods that run in worker threads (ytmusicapi)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]):
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                counters["executed"] += 1
+            else:
+                counters["coalesced"] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.event.set()
+
+
+_async_flights = _AsyncFlights()
+_thread_flights = _ThreadFlights()
+
+
+def single_flight(identity: Callable[[Any], Hashable]):
+    """
+    Decorates a service method so that identical concurrent calls share one
+    upstream request and its result. `identity(self)` must tell users apart
+    (e.g. a hash of their token); the method name and arguments complete the
+    key. Callers receive the same result object and must not mutate it.
+    """
+    def decorator(method):
+        def key(self, args, kwargs):
+            return (method.__qualname__, identity(self), args, tuple(sorted(kwargs.items())))
+
+        if asyncio.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(self, *args, **kwargs):
+                return await _async_flights.do(key(self, args, kwargs), lambda: method(self, *args, **kwargs))
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            return _thread_flights.do(key(self, args, kwargs), lambda: method(self, *args, **kwargs))
+        return wrapper
+
+    return decorator
+
+
+registry.register(CallbackMetric("single_flight_calls_total",
+                                 "Deduplicated service calls, by whether they ran upstream or joined one in flight.",
+                                 "counter", ("outcome",), lambda: [((outcome,), n) for outcome, n in counters.items()]))
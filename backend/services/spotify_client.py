@@ -0,0 +1,80 @@
+import os
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from services.http_client import get_http_client
+from services.rate_scheduler import outbound
+
+API_BASE_URL = os.environ.get("SPOTIFY_API_BASE_URL", "https://api.spotify.com/v1")
+
+
+class SpotifyClient:
+    """
+    Minimal native asyncio client for the Spotify Web API.
+
+    Covers only the endpoints the converter uses and runs on the shared pooled
+    httpx client, so no call needs a worker thread. Method names mirror the
+    spotipy ones they replace.
+    """
+
+    def __init__(self, access_token: str, user_key: Optional[str] = None):
+        self.access_token = access_token
+        # Identifies the caller for fair queuing in the outbound scheduler
+        self.user_key = user_key or hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:16]
+        # SpotifyTokenManager keeping access_token fresh, once attached to one
+        self.tokens = None
+
+    async def _request(self, method: str, endpoint: str, operation: str = "request", **kwargs) -> Dict[str, Any]:
+        client = get_http_client()
+
+        def send():
+            # Read the token per attempt so a refreshed token is picked up on retry
+            headers = {"Authorization": f"Bearer {self.access_token}"}
+            return client.request(method, f"{API_BASE_URL}{endpoint}", headers=headers, **kwargs)
+
+        if self.tokens is not None:
+            await self.tokens.ensure_fresh(self)
+        response = await outbound.send("spotify", self.user_key, send, operation, idempotent=method == "GET")
+        if response.status_code == 401 and self.tokens is not None:
+            # Token revoked or expired early: refresh once and resend
+            self.access_token = (await self.tokens.refresh(self.user_key))["access_token"]
+            response = await outbound.send("spotify", self.user_key, send, operation, idempotent=method == "GET")
+        response.raise_for_status()
+        # Some write endpoints answer with an empty body
+        return response.json() if response.content else {}
+
+    async def current_user(self) -> Dict[str, Any]:
+        return await self._request("GET", "/me", "current_user")
+
+    async def current_user_playlists(self, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        return await self._request("GET", "/me/playlists", "current_user_playlists", params={"limit": limit, "offset": offset})
+
+    async def playlist(self, playlist_id: str, fields: Optional[str] = None) -> Dict[str, Any]:
+        params = {"fields": fields} if fields else None
+        return await self._request("GET", f"/playlists/{playlist_id}", "playlist", params=params)
+
+    async def playlist_items(self, playlist_id: str, limit: int = 100, offset: int = 0,
+                             fields: Optional[str] = None) -> Dict[str, Any]:
+        params = {"limit": limit, "offset": offset}
+        if fields:
+            params["fields"] = fields
+        return await self._request("GET", f"/playlists/{playlist_id}/tracks", "playlist_items", params=params)
+
+    async def search(self, q: str, type: str = "track", limit: int = 10, offset: int = 0) -> Dict[str, Any]:
+        return await self._request("GET", "/search", "search", params={"q": q, "type": type, "limit": limit, "offset": offset})
+
+    async def user_playlist_create(self, user_id: str, name: str, public: bool = True,
+                                   description: str = "") -> Dict[str, Any]:
+        body = {"name": name, "public": public, "description": description}
+        return await self._request("POST", f"/users/{user_id}/playlists", "user_playlist_create", json=body)
+
+    async def playlist_add_items(self, playlist_id: str, items: List[str],
+                                 position: Optional[int] = None) -> Dict[str, Any]:
+        body: Dict[str, Any] = {"uris": items}
+        if position is not None:
+            body["position"] = position
+        return await self._request("POST", f"/playlists/{playlist_id}/tracks", "playlist_add_items", json=body)
+
+    async def playlist_remove_all_occurrences_of_items(self, playlist_id: str, items: List[str]) -> Dict[str, Any]:
+        body = {"tracks": [{"uri": uri} for uri in items]}
+        return await self._request("DELETE", f"/playlists/{playlist_id}/tracks", "playlist_remove_items", json=body)
@@ -1,28 +1,74 @@
 import os
 import asyncio
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+import threading
+import collections
 from models.auth import SpotifyToken, SpotifyUser
+from services.spotify_client import SpotifyClient
+from services.single_flight import single_flight
+from services.batch_writes import write_chunks
+from services.metrics import upstream_pages
+
+# Largest page sizes the Web API accepts for each listing endpoint
+PLAYLISTS_PAGE_SIZE = 50
+PLAYLIST_TRACKS_PAGE_SIZE = 100
+# Only what the track mappers and the matcher read, plus the paging fields;
+# a full item also carries both market lists, album art and URLs
+PLAYLIST_TRACKS_FIELDS = (
+    "total,limit,items(track(id,name,duration_ms,artists(name),album(name),external_ids(isrc)))"
+)
+# Most URIs the add-items and remove-items endpoints accept per call
+ADD_CHUNK_SIZE = 100
+REMOVE_CHUNK_SIZE = 100
+
+# How many pages of a single listing may be in flight at once
+PAGE_CONCURRENCY = int(os.environ.get("SPOTIFY_PAGE_CONCURRENCY", "8"))
+
+# Spotify has no multi-ISRC lookup, so ISRC searches run this many at a time
+ISRC_CONCURRENCY = int(os.environ.get("SPOTIFY_ISRC_CONCURRENCY", "8"))
+
+SCOPE = "playlist-read-private playlist-read-collaborative playlist-modify-public playlist-modify-private"
+# TEMPORARY FIX: Hardcoding the correct redirect URI to bypass environment issues.
+REDIRECT_URI = "http://localhost:8000/auth/spotify/callback"
+
+_oauth = None
+_oauth_lock = threading.Lock()
+
+
+def get_spotify_oauth():
+    """
+    The process-wide SpotifyOAuth. It holds only app credentials, so one
+    instance serves every user. spotipy is imported here, on the first login,
+    since API calls themselves go through SpotifyClient.
+    """
+    global _oauth
+    if _oauth is None:
+        with _oauth_lock:
+            if _oauth is None:
+                from spotipy.oauth2 import SpotifyOAuth
+                _oauth = SpotifyOAuth(
+                    client_id=os.environ["SPOTIFY_CLIENT_ID"],
+                    client_secret=os.environ["SPOTIFY_CLIENT_SECRET"],
+                    redirect_uri=REDIRECT_URI,
+                    scope=SCOPE,
+                )
+    return _oauth
+
 
 class SpotifyService:
-    def __init__(self, auth_token: dict = None):
-        self.scope = "playlist-read-private playlist-read-collaborative playlist-modify-public playlist-modify-private"
-        
-        # TEMPORARY FIX: Hardcoding the correct redirect URI to bypass environment issues.
-        redirect_uri = "http://localhost:8000/auth/spotify/callback"
-
-        self.sp_oauth = SpotifyOAuth(
-            client_id=os.environ["SPOTIFY_CLIENT_ID"],
-            client_secret=os.environ["SPOTIFY_CLIENT_SECRET"],
-            redirect_uri=redirect_uri,
-            scope=self.scope,
-        )
+    scope = SCOPE
 
+    def __init__(self, auth_token: dict = None, user_key: str = None):
+        # SpotifyOAuth is only used for the OAuth dance; API calls go through
+        # the native async client.
         if auth_token:
-            self.client = spotipy.Spotify(auth=auth_token['access_token'])
+            self.client = SpotifyClient(auth_token['access_token'], user_key)
         else:
             self.client = None
 
+    @property
+    def sp_oauth(self):
+        return get_spotify_oauth()
+
     def get_authorize_url(self, state: str) -> str:
         return self.sp_oauth.get_authorize_url(state=state)
 
@@ -36,44 +82,150 @@ class SpotifyService:
     async def get_current_user(self) -> SpotifyUser:
         if not self.client:
             raise Exception("Spotify client not initialized.")
-        # Run the synchronous spotipy call in a thread to avoid blocking
-        user_data = await asyncio.to_thread(self.client.current_user)
+        user_data = await self.client.current_user()
         return SpotifyUser(**user_data)
 
+    async def _iter_pages(self, fetch_page, page_size: int):
+        """
+        Yields pages of items in order. The first page tells us `total`; the
+        remaining offsets are then fetched concurrently through a sliding
+        window of PAGE_CONCURRENCY requests, so at most that many pages are
+        buffered ahead of the consumer.
+        """
+        first = await fetch_page(limit=page_size, offset=0)
+        upstream_pages.inc("spotify")
+        yield first['items']
+        total = first.get('total') or 0
+
+        # Step by the limit the API actually applied, in case it capped ours
+        step = first.get('limit') or page_size
+        offsets = iter(range(step, total, step))
+        window = collections.deque()
+
+        def schedule_next():
+            offset = next(offsets, None)
+            if offset is not None:
+                window.append(asyncio.ensure_future(fetch_page(limit=page_size, offset=offset)))
+
+        try:
+            for _ in range(PAGE_CONCURRENCY):
+                schedule_next()
+            while window:
+                page = await window.popleft()
+                schedule_next()
+                upstream_pages.inc("spotify")
+                yield page['items']
+        finally:
+            # Consumer stopped early (client disconnected, error): drop prefetches
+            for task in window:
+                task.cancel()
+
+    async def _fetch_all_pages(self, fetch_page, page_size: int):
+        items = []
+        async for page in self._iter_pages(fetch_page, page_size):
+            items.extend(page)
+        return items
+
+    @single_flight(lambda self: self.client.user_key if self.client else None)
     async def get_user_playlists(self):
         if not self.client:
             raise Exception("Spotify client not initialized.")
-        
-        # Run the synchronous spotipy call in a thread to avoid blocking
-        results = await asyncio.to_thread(self.client.current_user_playlists)
-        
-        playlists = []
-        while results:
-            playlists.extend(results['items'])
-            if results['next']:
-                # The 'next' method also makes a network request
-                results = await asyncio.to_thread(self.client.next, results)
-            else:
-                results = None
-        
+
+        playlists = await self._fetch_all_pages(self.client.current_user_playlists, PLAYLISTS_PAGE_SIZE)
+
         # Here we would map the raw data to a Pydantic model for consistency
         return playlists
 
-    async def get_playlist_tracks(self, playlist_id: str):
+    async def iter_playlist_tracks(self, playlist_id: str):
+        """Yields the playlist's items page by page, in playlist order."""
         if not self.client:
             raise Exception("Spotify client not initialized.")
-        
-        # Run the synchronous spotipy call in a thread to avoid blocking
-        results = await asyncio.to_thread(self.client.playlist_tracks, playlist_id)
 
+        async def fetch_page(limit: int, offset: int):
+            return await self._playlist_items_page(playlist_id, limit, offset)
+
+        async for page in self._iter_pages(fetch_page, PLAYLIST_TRACKS_PAGE_SIZE):
+            yield page
+
+    async def get_playlist_snapshot(self, playlist_id: str):
+        """The playlist's snapshot_id, which changes whenever its tracks do."""
+        if not self.client:
+            raise Exception("Spotify client not initialized.")
+        playlist = await self.client.playlist(playlist_id, fields="snapshot_id")
+        return playlist.get("snapshot_id")
+
+    @single_flight(lambda self: self.client.user_key)
+    async def _playlist_items_page(self, playlist_id: str, limit: int, offset: int):
+        # Coalesced per page so concurrent streams of one playlist share fetches
+        return await self.client.playlist_items(playlist_id, limit=limit, offset=offset,
+                                                fields=PLAYLIST_TRACKS_FIELDS)
+
+    @single_flight(lambda self: self.client.user_key if self.client else None)
+    async def get_playlist_tracks(self, playlist_id: str):
         tracks = []
-        while results:
-            tracks.extend(results['items'])
-            if results['next']:
-                # The 'next' method also makes a network request
-                results = await asyncio.to_thread(self.client.next, results)
-            else:
-                results = None
-        
+        async for page in self.iter_playlist_tracks(playlist_id):
+            tracks.extend(page)
+
         # Here we would map the raw data to a Pydantic model for consistency
-        return tracks 
\ No newline at end of file
+        return tracks
+
+    async def search_tracks(self, query: str, limit: int = 5):
+        if not self.client:
+            raise Exception("Spotify client not initialized.")
+        results = await self.client.search(query, type='track', limit=limit)
+        return results['tracks']['items']
+
+    async def lookup_isrcs(self, isrcs):
+        """
+        Resolves ISRCs to tracks with one `isrc:` search each, run
+        concurrently. Returns a mapping of upper-case ISRC to track object;
+        ISRCs with no match are left out.
+        """
+        if not self.client:
+            raise Exception("Spotify client not initialized.")
+        codes = list(dict.fromkeys(isrc.upper() for isrc in isrcs if isrc))
+        semaphore = asyncio.Semaphore(ISRC_CONCURRENCY)
+        found = {}
+
+        async def fetch(code: str):
+            async with semaphore:
+                results = await self.client.search(f"isrc:{code}", type='track', limit=1)
+            items = results['tracks']['items']
+            if items:
+                found[code] = items[0]
+
+        await asyncio.gather(*(fetch(code) for code in codes))
+        return found
+
+    async def create_playlist(self, name: str, description: str = "", public: bool = True) -> str:
+        if not self.client:
+            raise Exception("Spotify client not initialized.")
+        user = await self.client.current_user()
+        playlist = await self.client.user_playlist_create(user['id'], name, public=public, description=description)
+        return playlist['id']
+
+    async def add_tracks(self, playlist_id: str, track_ids, preserve_order: bool = True) -> int:
+        """
+        Appends tracks in chunks of 100 URIs and returns the number of calls.
+        Spotify applies concurrent appends in arrival order, so chunks only
+        run in parallel when the caller does not need the order kept.
+        """
+        if not self.client:
+            raise Exception("Spotify client not initialized.")
+        uris = [f"spotify:track:{track_id}" for track_id in track_ids]
+
+        async def write(chunk):
+            return await self.client.playlist_add_items(playlist_id, chunk)
+
+        return await write_chunks(uris, ADD_CHUNK_SIZE, write, ordered=preserve_order)
+
+    async def remove_tracks(self, playlist_id: str, track_ids) -> int:
+        """Removes every occurrence of the tracks, 100 URIs per call. Returns the number of calls."""
+        if not self.client:
+            raise Exception("Spotify client not initialized.")
+        uris = [f"spotify:track:{track_id}" for track_id in track_ids]
+
+        async def write(chunk):
+            return await self.client.playlist_remove_all_occurrences_of_items(playlist_id, chunk)
+
+        return await write_chunks(uris, REMOVE_CHUNK_SIZE, write, ordered=False)
@@ -0,0 +1,152 @@
+import os
+import time
+import asyncio
+import hashlib
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from services.http_client import get_http_client
+from services.rate_scheduler import outbound
+from services.single_flight import single_flight
+from services.metrics import CallbackMetric, registry
+from services.log import get_logger
+
+TOKEN_URL = os.environ.get("SPOTIFY_TOKEN_URL", "https://accounts.spotify.com/api/token")
+# Access tokens are refreshed this many seconds before they expire (they last an hour)
+REFRESH_MARGIN = float(os.environ.get("SPOTIFY_TOKEN_REFRESH_MARGIN", "300"))
+TOKEN_CACHE_SIZE = int(os.environ.get("SPOTIFY_TOKEN_CACHE_SIZE", "10000"))
+# Longest the background refresher sleeps before checking its clients are still alive
+CHECK_INTERVAL = 60.0
+RETRY_DELAY = 30.0
+
+logger = get_logger("spotify_tokens")
+
+
+class SpotifyReauthRequired(Exception):
+    """The user's Spotify token can no longer be refreshed; they must sign in again."""
+
+
+def spotify_token_key(token_info: dict, user_id: Optional[str] = None) -> str:
+    """Stable per-user key: the Spotify user ID, else a hash of the refresh token."""
+    if user_id:
+        return user_id
+    secret = token_info.get("refresh_token") or token_info.get("access_token", "")
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()[:16]
+
+
+class SpotifyTokenManager:
+    """
+    Keeps Spotify access tokens ahead of expiry.
+
+    Clients attached for a user are refreshed in the background shortly
+    before the token expires, and every attached client (e.g. those of a
+    running transfer) is switched to the new token in place, so long jobs
+    never send a request with an expired one. Concurrent refreshes for one
+    user share a single call. The newest token per user is kept so later
+    requests can write it back to their session.
+    """
+
+    def __init__(self, margin: float = REFRESH_MARGIN, size: int = TOKEN_CACHE_SIZE):
+        self.margin = margin
+        self.size = size
+        self._tokens: "OrderedDict[str, dict]" = OrderedDict()
+        self._clients: Dict[str, weakref.WeakSet] = {}
+        self._refreshers: Dict[str, asyncio.Task] = {}
+        self.counters = {"refreshed": 0, "failed": 0}
+
+    def current(self, user_key: str, token_info: dict) -> dict:
+        """The newest token known for the user: `token_info`, or one refreshed since it was issued."""
+        known = self._tokens.get(user_key)
+        if known is None or known.get("expires_at", 0) < token_info.get("expires_at", 0):
+            known = token_info
+        self._tokens[user_key] = known
+        self._tokens.move_to_end(user_key)
+        while len(self._tokens) > self.size:
+            self._tokens.popitem(last=False)
+        return known
+
+    def attach(self, user_key: str, client):
+        """Keeps `client` on the user's current token for as long as it is alive."""
+        client.tokens = self
+        self._clients.setdefault(user_key, weakref.WeakSet()).add(client)
+        refresher = self._refreshers.get(user_key)
+        if refresher is None or refresher.done():
+            self._refreshers[user_key] = asyncio.ensure_future(self._keep_fresh(user_key))
+
+    def _expiring(self, token: dict) -> bool:
+        return token.get("expires_at", 0) - self.margin <= time.time()
+
+    async def ensure_fresh(self, client):
+        """Called before each request: refreshes first if the token is about to expire."""
+        token = self._tokens.get(client.user_key)
+        if token is None:
+            return
+        if self._expiring(token) and token.get("refresh_token"):
+            token = await self.refresh(client.user_key)
+        client.access_token = token["access_token"]
+
+    @single_flight(id)
+    async def refresh(self, user_key: str) -> dict:
+        # Evicted from the cache, or a login that never came with a refresh token
+        token = self._tokens.get(user_key)
+        if token is None or not token.get("refresh_token"):
+            self.counters["failed"] += 1
+            raise SpotifyReauthRequired(f"No refreshable Spotify token for {user_key}")
+        client = get_http_client()
+
+        def send():
+            return client.post(
+                TOKEN_URL,
+                data={"grant_type": "refresh_token", "refresh_token": token["refresh_token"]},
+                auth=(os.environ["SPOTIFY_CLIENT_ID"], os.environ["SPOTIFY_CLIENT_SECRET"]),
+            )
+
+        try:
+            response = await outbound.send("spotify", user_key, send, "refresh_token", idempotent=False)
+            if response.status_code in (400, 401):
+                # invalid_grant: the refresh token was revoked or has expired
+                raise SpotifyReauthRequired(f"Spotify rejected the refresh token for {user_key}")
+            response.raise_for_status()
+        except Exception:
+            self.counters["failed"] += 1
+            raise
+        data = response.json()
+        # Spotify only sometimes rotates the refresh token; keep the old one otherwise
+        refreshed = {**token, **data, "expires_at": int(time.time()) + int(data.get("expires_in", 3600))}
+        self.current(user_key, refreshed)
+        for attached in list(self._clients.get(user_key, ())):
+            attached.access_token = refreshed["access_token"]
+        self.counters["refreshed"] += 1
+        logger.info("Refreshed Spotify token", extra={"fields": {"user": user_key}})
+        return refreshed
+
+    async def _keep_fresh(self, user_key: str):
+        try:
+            while self._clients.get(user_key):
+                token = self._tokens.get(user_key)
+                if token is None or not token.get("refresh_token"):
+                    return
+                delay = token.get("expires_at", 0) - self.margin - time.time()
+                if delay > 0:
+                    await asyncio.sleep(min(delay, CHECK_INTERVAL))
+                    continue
+                try:
+                    await self.refresh(user_key)
+                except SpotifyReauthRequired:
+                    return
+                except Exception as e:
+                    logger.warning("Spotify token refresh for %s failed: %s", user_key, e)
+                    await asyncio.sleep(RETRY_DELAY)
+        finally:
+            if not self._clients.get(user_key):
+                self._clients.pop(user_key, None)
+            if self._refreshers.get(user_key) is asyncio.current_task():
+                del self._refreshers[user_key]
+
+
+spotify_tokens = SpotifyTokenManager()
+
+registry.register(CallbackMetric("spotify_token_refreshes_total", "Spotify access token refreshes, by outcome.",
+                                 "counter", ("outcome",),
+                                 lambda: [((outcome,), n) for outcome, n in spotify_tokens.counters.items()]))
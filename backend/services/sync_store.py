@@ -0,0 +1,99 @@
+import os
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import orjson
+
+SYNC_STORE_PATH = os.environ.get("SYNC_STORE_PATH", "sync_state.sqlite3")
+
+# (source platform, source playlist ID, destination platform, destination playlist ID)
+SyncKey = Tuple[str, str, str, str]
+# (source track ID, destination track ID or None when it had no match), in source order
+SyncItem = Tuple[str, Optional[str]]
+
+
+def track_list_hash(track_ids: Iterable[str]) -> str:
+    """Snapshot for platforms without a version field of their own (YouTube Music)."""
+    digest = hashlib.sha256()
+    for track_id in track_ids:
+        digest.update(track_id.encode("utf-8"))
+        digest.update(b"\0")
+    return f"sha256:{digest.hexdigest()}"
+
+
+class SyncRecord:
+    """What the last transfer of a playlist pair saw at the source and wrote to the destination."""
+
+    def __init__(self, snapshot: Optional[str], playlist_name: str, items: List[SyncItem], updated_at: float):
+        self.snapshot = snapshot
+        self.playlist_name = playlist_name
+        self.items = items
+        self.updated_at = updated_at
+
+
+class SyncStore:
+    """
+    Per playlist pair sync state, persisted in SQLite. The track mapping is
+    stored as one orjson blob per pair, since it is always read and
+    replaced whole.
+    """
+
+    def __init__(self, path: str = SYNC_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS sync_pairs (
+                    source_platform TEXT NOT NULL,
+                    source_playlist_id TEXT NOT NULL,
+                    destination_platform TEXT NOT NULL,
+                    destination_playlist_id TEXT NOT NULL,
+                    snapshot TEXT,
+                    playlist_name TEXT NOT NULL,
+                    items BLOB NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (source_platform, source_playlist_id, destination_platform, destination_playlist_id)
+                )"""
+            )
+        return self._conn
+
+    def _load_sync(self, key: SyncKey) -> Optional[SyncRecord]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT snapshot, playlist_name, items, updated_at FROM sync_pairs WHERE source_platform = ? "
+                "AND source_playlist_id = ? AND destination_platform = ? AND destination_playlist_id = ?", key,
+            ).fetchone()
+        if row is None:
+            return None
+        snapshot, playlist_name, items, updated_at = row
+        return SyncRecord(snapshot, playlist_name, [tuple(item) for item in orjson.loads(items)], updated_at)
+
+    def _save_sync(self, key: SyncKey, record: SyncRecord):
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO sync_pairs (source_platform, source_playlist_id, destination_platform, "
+                "destination_playlist_id, snapshot, playlist_name, items, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                key + (record.snapshot, record.playlist_name, orjson.dumps(record.items), record.updated_at),
+            )
+            conn.commit()
+
+    async def load(self, key: SyncKey) -> Optional[SyncRecord]:
+        return await asyncio.to_thread(self._load_sync, key)
+
+    async def save(self, key: SyncKey, snapshot: Optional[str], playlist_name: str, items: List[SyncItem]):
+        record = SyncRecord(snapshot, playlist_name, items, time.time())
+        await asyncio.to_thread(self._save_sync, key, record)
+
+
+sync_store = SyncStore()
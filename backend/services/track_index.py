@@ -0,0 +1,168 @@
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+TRACK_INDEX_PATH = os.environ.get("TRACK_INDEX_PATH", "track_index.sqlite3")
+TRACK_INDEX_LRU_SIZE = int(os.environ.get("TRACK_INDEX_LRU_SIZE", "50000"))
+# Positive matches rarely go stale; "not found" is re-checked much sooner
+# since catalogs grow and search results change.
+POSITIVE_TTL = float(os.environ.get("TRACK_INDEX_POSITIVE_TTL", str(90 * 24 * 3600)))
+NEGATIVE_TTL = float(os.environ.get("TRACK_INDEX_NEGATIVE_TTL", str(24 * 3600)))
+# Matches below this confidence (fuzzy search results, as opposed to ISRC or
+# near-exact ones) are kept but not reused: the index is shared by all users
+MIN_REUSE_CONFIDENCE = float(os.environ.get("TRACK_INDEX_MIN_CONFIDENCE", "0.85"))
+
+# (key type, key, destination platform). The key type is "isrc" or the
+# platform the key ID belongs to.
+IndexKey = Tuple[str, str, str]
+# (destination ID or None for a negative result, confidence, updated_at)
+IndexEntry = Tuple[Optional[str], float, float]
+
+_MISS = object()
+
+
+class TrackIndex:
+    """
+    Cross-user map from ISRC / platform track IDs to matching track IDs on
+    the other platforms, persisted in SQLite with an in-memory LRU in front.
+
+    A lookup returns the destination ID, None for a cached "no match", or
+    _MISS when the index knows nothing usable and a search is needed.
+    """
+
+    MISS = _MISS
+
+    def __init__(self, path: str = TRACK_INDEX_PATH, lru_size: int = TRACK_INDEX_LRU_SIZE):
+        self.path = path
+        self.lru_size = lru_size
+        self._lru: "OrderedDict[IndexKey, IndexEntry]" = OrderedDict()
+        # The LRU lock is only ever held for dict operations, so the event
+        # loop can take it; SQLite I/O runs under the database lock alone
+        self._lru_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.stats_counters: Dict[str, int] = {
+            "memory_hits": 0, "disk_hits": 0, "negative_hits": 0, "misses": 0, "writes": 0,
+        }
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS track_map (
+                    key_type TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    destination_platform TEXT NOT NULL,
+                    destination_id TEXT,
+                    confidence REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (key_type, key, destination_platform)
+                )"""
+            )
+        return self._conn
+
+    def _is_usable(self, entry: IndexEntry) -> bool:
+        destination_id, confidence, updated_at = entry
+        if destination_id is not None and confidence < MIN_REUSE_CONFIDENCE:
+            return False
+        ttl = POSITIVE_TTL if destination_id is not None else NEGATIVE_TTL
+        return time.time() - updated_at <= ttl
+
+    def _remember(self, key: IndexKey, entry: IndexEntry):
+        self._lru[key] = entry
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _memory_lookup(self, keys) -> object:
+        with self._lru_lock:
+            for key in keys:
+                entry = self._lru.get(key)
+                if entry is not None and self._is_usable(entry):
+                    self._lru.move_to_end(key)
+                    self.stats_counters["negative_hits" if entry[0] is None else "memory_hits"] += 1
+                    return entry[0]
+        return _MISS
+
+    def _lookup_sync(self, keys) -> object:
+        for key in keys:
+            with self._lru_lock:
+                entry = self._lru.get(key)
+            source = "memory_hits"
+            if entry is None:
+                with self._db_lock:
+                    row = self._connection().execute(
+                        "SELECT destination_id, confidence, updated_at FROM track_map "
+                        "WHERE key_type = ? AND key = ? AND destination_platform = ?", key,
+                    ).fetchone()
+                if row is None:
+                    continue
+                entry, source = tuple(row), "disk_hits"
+            with self._lru_lock:
+                self._remember(key, entry)
+                if self._is_usable(entry):
+                    self.stats_counters["negative_hits" if entry[0] is None else source] += 1
+                    return entry[0]
+        with self._lru_lock:
+            self.stats_counters["misses"] += 1
+        return _MISS
+
+    def _record_sync(self, rows):
+        with self._db_lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO track_map "
+                "(key_type, key, destination_platform, destination_id, confidence, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", rows,
+            )
+            conn.commit()
+        with self._lru_lock:
+            for key_type, key, platform, destination_id, confidence, updated_at in rows:
+                self._remember((key_type, key, platform), (destination_id, confidence, updated_at))
+            self.stats_counters["writes"] += len(rows)
+
+    @staticmethod
+    def _keys(source_platform: str, source_id: str, isrc: Optional[str], destination_platform: str):
+        keys = []
+        if isrc:
+            keys.append(("isrc", isrc.upper(), destination_platform))
+        if source_id:
+            keys.append((source_platform, source_id, destination_platform))
+        return keys
+
+    async def lookup(self, source_platform: str, source_id: str, isrc: Optional[str],
+                     destination_platform: str):
+        keys = self._keys(source_platform, source_id, isrc, destination_platform)
+        # Serve straight from memory when possible; only go to disk off-loop
+        known = self._memory_lookup(keys)
+        if known is not _MISS:
+            return known
+        return await asyncio.to_thread(self._lookup_sync, keys)
+
+    async def record(self, source_platform: str, source_id: str, isrc: Optional[str],
+                     destination_platform: str, destination_id: Optional[str], confidence: float = 1.0):
+        now = time.time()
+        rows = [key + (destination_id, confidence, now)
+                for key in self._keys(source_platform, source_id, isrc, destination_platform)]
+        if destination_id is not None:
+            # Matches are symmetric, so also index the way back
+            rows.append((destination_platform, destination_id, source_platform, source_id, confidence, now))
+        if rows:
+            await asyncio.to_thread(self._record_sync, rows)
+
+    def stats(self) -> Dict[str, object]:
+        counters = dict(self.stats_counters)
+        hits = counters["memory_hits"] + counters["disk_hits"] + counters["negative_hits"]
+        lookups = hits + counters["misses"]
+        counters["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        counters["lru_entries"] = len(self._lru)
+        return counters
+
+
+track_index = TrackIndex()
@@ -0,0 +1,80 @@
+import sys
+from array import array
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+
+from models.playlist import Track
+
+# (id, title, artist, album, duration_ms, isrc), as produced by the row mappers
+TrackRow = Tuple[str, str, str, Optional[str], int, Optional[str]]
+
+
+class TrackBatch:
+    """
+    Column-oriented batch of normalized tracks.
+
+    Raw platform items are converted into it once, without building a
+    Pydantic model per track. Artist and album names repeat heavily within a
+    playlist and are interned; durations live in a typed array. Batches
+    encode straight to the same JSON a `Track` serializes to.
+    """
+
+    __slots__ = ("ids", "titles", "artists", "albums", "durations", "isrcs")
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.titles: List[str] = []
+        self.artists: List[str] = []
+        self.albums: List[Optional[str]] = []
+        self.durations = array("q")
+        self.isrcs: List[Optional[str]] = []
+
+    @classmethod
+    def from_items(cls, items: Iterable[dict], row_mapper: Callable[[dict], Optional[TrackRow]]) -> "TrackBatch":
+        batch = cls()
+        for item in items:
+            row = row_mapper(item)
+            if row is not None:
+                batch.append(*row)
+        return batch
+
+    def append(self, track_id: str, title: str, artist: str, album: Optional[str],
+               duration_ms: int, isrc: Optional[str] = None):
+        self.ids.append(track_id)
+        self.titles.append(title)
+        self.artists.append(sys.intern(artist))
+        self.albums.append(sys.intern(album) if album else album)
+        self.durations.append(duration_ms or 0)
+        self.isrcs.append(isrc)
+
+    def extend(self, other: "TrackBatch"):
+        self.ids.extend(other.ids)
+        self.titles.extend(other.titles)
+        self.artists.extend(other.artists)
+        self.albums.extend(other.albums)
+        self.durations.extend(other.durations)
+        self.isrcs.extend(other.isrcs)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows(self) -> Iterator[dict]:
+        """Yields each track as the dict `Track` serializes to (camelCase keys)."""
+        for track_id, title, artist, album, duration, isrc in zip(
+                self.ids, self.titles, self.artists, self.albums, self.durations, self.isrcs):
+            yield {"id": track_id, "title": title, "artist": artist, "album": album,
+                   "durationMs": duration, "isrc": isrc}
+
+    def track(self, index: int) -> Track:
+        return Track(id=self.ids[index], title=self.titles[index], artist=self.artists[index],
+                     album=self.albums[index], durationMs=self.durations[index], isrc=self.isrcs[index])
+
+    def to_json(self) -> bytes:
+        return orjson.dumps(list(self.rows()))
+
+    def to_ndjson(self) -> bytes:
+        return b"".join(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in self.rows())
+
+    def to_sse(self) -> bytes:
+        return b"".join(b"event: track\ndata: " + orjson.dumps(row) + b"\n\n" for row in self.rows())
@@ -0,0 +1,121 @@
+import os
+import asyncio
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+import orjson
+
+from services.transfer_service import FINISHED_STAGES, TransferEngine, transfer_engine
+from services.metrics import CallbackMetric, registry
+from services.log import get_logger
+
+# Minimum time between two updates of one transfer, however fast it moves;
+# changes in between are coalesced into the next update
+TRANSFER_EVENTS_INTERVAL = float(os.environ.get("TRANSFER_EVENTS_INTERVAL", "0.5"))
+# Comment line sent when nothing changed for this long, so proxies keep the stream open
+TRANSFER_EVENTS_KEEPALIVE = float(os.environ.get("TRANSFER_EVENTS_KEEPALIVE", "15"))
+
+logger = get_logger("transfer_events")
+
+# (serialized status or None, final)
+StatusEvent = Tuple[Optional[bytes], bool]
+
+
+def _offer(queue: asyncio.Queue, event: StatusEvent):
+    # Each subscriber holds at most one pending update: a slow reader skips
+    # intermediate states instead of building up a backlog
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+class TransferBroadcast:
+    """The status feed of one transfer, shared by everyone subscribed to it."""
+
+    def __init__(self, transfer_id: str):
+        self.transfer_id = transfer_id
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.last: Optional[bytes] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class TransferEvents:
+    """
+    Server-push transfer progress. One producer per transfer reads its
+    status at most every `interval` seconds and fans it out to all
+    subscribers, only when it differs from what was last sent; it stops
+    with the transfer or when the last subscriber leaves.
+    """
+
+    def __init__(self, engine: TransferEngine, interval: float = TRANSFER_EVENTS_INTERVAL,
+                 keepalive: float = TRANSFER_EVENTS_KEEPALIVE):
+        self.engine = engine
+        self.interval = interval
+        self.keepalive = keepalive
+        self._broadcasts: Dict[str, TransferBroadcast] = {}
+
+    async def _produce(self, broadcast: TransferBroadcast):
+        try:
+            while True:
+                status = await self.engine.status(broadcast.transfer_id)
+                if status is None:
+                    break
+                data = orjson.dumps(status.model_dump(mode="json", by_alias=True))
+                if data != broadcast.last:
+                    broadcast.last = data
+                    for queue in broadcast.subscribers:
+                        _offer(queue, (data, False))
+                if status.status in FINISHED_STAGES:
+                    break
+                await asyncio.sleep(self.interval)
+        except Exception as e:
+            logger.warning("Status feed for transfer %s failed: %s", broadcast.transfer_id, e)
+        finally:
+            if self._broadcasts.get(broadcast.transfer_id) is broadcast:
+                del self._broadcasts[broadcast.transfer_id]
+            # Replaces any update still pending, so it carries the latest state
+            for queue in broadcast.subscribers:
+                _offer(queue, (broadcast.last, True))
+
+    async def subscribe(self, transfer_id: str) -> AsyncIterator[Optional[bytes]]:
+        """
+        Yields the transfer's serialized status on every change until it
+        finishes, and None as a keep-alive after `keepalive` idle seconds.
+        """
+        broadcast = self._broadcasts.get(transfer_id)
+        if broadcast is None:
+            broadcast = self._broadcasts[transfer_id] = TransferBroadcast(transfer_id)
+            broadcast.task = asyncio.ensure_future(self._produce(broadcast))
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        if broadcast.last is not None:
+            queue.put_nowait((broadcast.last, False))
+        broadcast.subscribers.add(queue)
+        sent = None
+        try:
+            while True:
+                try:
+                    data, final = await asyncio.wait_for(queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if data is not None and data != sent:
+                    sent = data
+                    yield data
+                if final:
+                    return
+        finally:
+            broadcast.subscribers.discard(queue)
+            if not broadcast.subscribers and not broadcast.task.done():
+                # Detach first, so a new subscriber starts a fresh producer
+                if self._broadcasts.get(transfer_id) is broadcast:
+                    del self._broadcasts[transfer_id]
+                broadcast.task.cancel()
+
+    def subscriber_count(self) -> int:
+        return sum(len(b.subscribers) for b in self._broadcasts.values())
+
+
+transfer_events = TransferEvents(transfer_engine)
+
+registry.register(CallbackMetric("transfer_event_subscribers", "Open transfer progress streams.", "gauge", (),
+                                 lambda: [((), transfer_events.subscriber_count())]))
@@ -0,0 +1,605 @@
+import os
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Union
+from uuid import uuid4
+
+from models.playlist import Track
+import orjson
+
+from models.transfer import TransferRequest, TransferStatus, LibraryTransferStatus, FailedMatch
+from services.track_index import track_index
+from services.playlist_cache import playlist_cache
+from services.matching import best_matches, to_fields
+from services.sync_store import SyncItem, SyncRecord, sync_store, track_list_hash
+from services.shared_state import shared_state
+from services.log import get_logger
+
+# Concurrent destination searches allowed per platform, shared by every
+# running transfer. Each transfer also runs this many matcher workers.
+PLATFORM_CONCURRENCY = {
+    "spotify": int(os.environ.get("TRANSFER_SPOTIFY_CONCURRENCY", "8")),
+    "apple-music": int(os.environ.get("TRANSFER_APPLE_MUSIC_CONCURRENCY", "8")),
+    "youtube-music": int(os.environ.get("TRANSFER_YOUTUBE_MUSIC_CONCURRENCY", "4")),
+}
+
+# Matched tracks handed to the destination's add_tracks at a time. The
+# services split these into the largest chunks each platform accepts, so
+# keep these multiples of those chunk sizes.
+ADD_BATCH_SIZE = {
+    "spotify": int(os.environ.get("TRANSFER_SPOTIFY_ADD_BATCH", "100")),
+    "apple-music": int(os.environ.get("TRANSFER_APPLE_MUSIC_ADD_BATCH", "100")),
+    "youtube-music": int(os.environ.get("TRANSFER_YOUTUBE_MUSIC_ADD_BATCH", "100")),
+}
+
+# Bounded hand-off between pipeline stages; keeps a fast stage from running
+# arbitrarily far ahead of a slow one.
+STAGE_QUEUE_SIZE = int(os.environ.get("TRANSFER_QUEUE_SIZE", "500"))
+MAX_JOBS = int(os.environ.get("TRANSFER_MAX_JOBS", "1000"))
+# With shared state: how often a running job's status is published for the
+# other workers, and how long finished statuses stay readable there
+STATUS_PUBLISH_INTERVAL = float(os.environ.get("TRANSFER_STATUS_PUBLISH_INTERVAL", "0.5"))
+STATUS_RETENTION = float(os.environ.get("TRANSFER_STATUS_RETENTION", str(24 * 3600)))
+
+logger = get_logger("transfer")
+
+_DONE = object()
+_UNCHECKED = object()
+_platform_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+# A destination track ID, None for no match, or the error the search raised
+MatchResult = Union[Optional[str], Exception]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _platform_semaphore(platform: str) -> asyncio.Semaphore:
+    if platform not in _platform_semaphores:
+        _platform_semaphores[platform] = asyncio.Semaphore(PLATFORM_CONCURRENCY.get(platform, 4))
+    return _platform_semaphores[platform]
+
+
+async def call_service(method: Callable, *args, **kwargs):
+    """Awaits async service methods and runs sync ones (ytmusicapi) in a thread."""
+    if asyncio.iscoroutinefunction(method):
+        return await method(*args, **kwargs)
+    return await asyncio.to_thread(method, *args, **kwargs)
+
+
+async def forget_playlist_listing(platform: str, user_key: Optional[str], job_id: str):
+    """Drops the user's cached playlist list on `platform` after a job wrote to it."""
+    if not user_key:
+        return
+    try:
+        await playlist_cache.invalidate(platform, user_key)
+    except Exception as e:
+        # The entry is still revalidated once its TTL runs out
+        logger.warning("Could not invalidate the playlist cache after %s: %s", job_id, e)
+
+
+class TrackMatcher:
+    """
+    Resolves source tracks to destination track IDs: the shared track index
+    first, then a bulk ISRC lookup when the destination has one, then search.
+    """
+
+    def __init__(self, source_platform: str, destination_platform: str, destination, destination_mapper: Callable):
+        self.source_platform = source_platform
+        self.destination_platform = destination_platform
+        self.destination = destination
+        self.destination_mapper = destination_mapper
+        # Destination IDs resolved by bulk ISRC lookup, keyed by upper-case ISRC
+        self._isrc_matches: Dict[str, str] = {}
+
+    async def lookup_page(self, tracks: List[Track], job_id: str = "") -> List[Any]:
+        """
+        Checks a page of tracks against the track index, then resolves the
+        remaining ISRCs in bulk when the destination supports it, so those
+        tracks skip the per-track search.
+        """
+        known = await asyncio.gather(*(
+            track_index.lookup(self.source_platform, t.id, t.isrc, self.destination_platform) for t in tracks))
+
+        lookup_isrcs = getattr(self.destination, "lookup_isrcs", None)
+        isrcs = [t.isrc for t, k in zip(tracks, known)
+                 if k is track_index.MISS and t.isrc and t.isrc.upper() not in self._isrc_matches]
+        if lookup_isrcs is not None and isrcs:
+            try:
+                found = await call_service(lookup_isrcs, isrcs)
+            except Exception as e:
+                # Not fatal: these tracks fall back to a regular search
+                logger.warning("Bulk ISRC lookup failed for %s: %s", job_id, e)
+                found = {}
+            for isrc, item in found.items():
+                candidate = self.destination_mapper(item)
+                if candidate is not None:
+                    self._isrc_matches[isrc] = candidate.id
+        return known
+
+    async def _search(self, track: Track) -> List[Track]:
+        query = f"{track.title} {track.artist}"
+        async with _platform_semaphore(self.destination_platform):
+            results = await call_service(self.destination.search_tracks, query)
+        return [c for c in (self.destination_mapper(r) for r in results) if c is not None]
+
+    async def match_page(self, tracks: List[Track], known: Optional[List[Any]] = None) -> List[MatchResult]:
+        """
+        Matches a page of tracks. Index and ISRC hits cost no search; the
+        rest are searched concurrently (within the platform's limit) and all
+        their candidates scored in one batch, off the event loop. `known` is
+        the track index result per track when the caller already has it.
+        """
+        source_platform = self.source_platform
+        destination_platform = self.destination_platform
+        results: List[MatchResult] = [None] * len(tracks)
+        to_search: List[int] = []
+        records = []
+
+        for i, track in enumerate(tracks):
+            # Songs other users already moved cost no round trip
+            found = known[i] if known is not None else _UNCHECKED
+            if found is _UNCHECKED:
+                found = await track_index.lookup(source_platform, track.id, track.isrc, destination_platform)
+            if found is not track_index.MISS:
+                results[i] = found
+                continue
+            isrc_match = self._isrc_matches.get(track.isrc.upper()) if track.isrc else None
+            if isrc_match is not None:
+                results[i] = isrc_match
+                records.append((track, isrc_match, 1.0))
+                continue
+            to_search.append(i)
+
+        searched = await asyncio.gather(*(self._search(tracks[i]) for i in to_search), return_exceptions=True)
+        scored = []
+        for i, candidates in zip(to_search, searched):
+            if isinstance(candidates, Exception):
+                results[i] = candidates
+            elif isinstance(candidates, BaseException):
+                raise candidates
+            else:
+                scored.append((i, candidates))
+
+        if scored:
+            best = await asyncio.to_thread(best_matches, [to_fields(tracks[i]) for i, _ in scored],
+                                           [[to_fields(c) for c in candidates] for _, candidates in scored])
+            for (i, candidates), hit in zip(scored, best):
+                match, confidence = (candidates[hit[0]].id, hit[1]) if hit else (None, 0.0)
+                results[i] = match
+                records.append((tracks[i], match, confidence))
+
+        await asyncio.gather(*(track_index.record(source_platform, track.id, track.isrc, destination_platform,
+                                                  match, confidence) for track, match, confidence in records))
+        return results
+
+    async def match(self, track: Track, known: Any = _UNCHECKED) -> Optional[str]:
+        """
+        Returns the destination track ID for `track`, or None if there is no
+        match. `known` is the track index result when the caller already has it.
+        """
+        result = (await self.match_page([track], [known]))[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class TransferJob:
+    """
+    State of one playlist transfer.
+
+    The stages run as a pipeline: source pages feed matcher workers through
+    a bounded queue, and matched tracks feed the adder, which writes them in
+    source order as soon as a full batch is ready.
+
+    A completed transfer records its source snapshot and track mapping in the
+    sync store, so later runs can sync incrementally (see SyncJob).
+    """
+
+    mode = "full"
+
+    def __init__(self, request: TransferRequest, source, source_mapper: Callable,
+                 destination, destination_mapper: Callable, destination_cache_key: Optional[str] = None):
+        self.id = str(uuid4())
+        self.request = request
+        self.source = source
+        self.source_mapper = source_mapper
+        self.destination = destination
+        self.destination_mapper = destination_mapper
+        # Whose cached destination playlist list to drop once this job writes there
+        self.destination_cache_key = destination_cache_key
+        self.destination_changed = False
+
+        self.total_tracks = 0
+        self.successful_matches = 0
+        self.failed_matches: List[FailedMatch] = []
+        self.destination_playlist_id: Optional[str] = None
+        self.tracks_added = 0
+        self.tracks_removed = 0
+        self.up_to_date = False
+        self.start_time = _now()
+        self.end_time: Optional[str] = None
+        self.error: Optional[str] = None
+
+        self.source_done = False
+        self.matching_done = False
+        self.outcome: Optional[str] = None  # completed | failed | cancelled
+        self.task: Optional[asyncio.Task] = None
+        self._playlist_task: Optional[asyncio.Future] = None
+        self.matcher = TrackMatcher(request.source_platform, request.destination_platform,
+                                    destination, destination_mapper)
+        self._snapshot: Optional[str] = None
+        # (source ID, destination ID) in source order, for the sync store
+        self._synced: List[SyncItem] = []
+
+    @property
+    def processed_tracks(self) -> int:
+        return self.successful_matches + len(self.failed_matches)
+
+    @property
+    def stage(self) -> str:
+        # Stages overlap; report the earliest one still running
+        if self.outcome:
+            return self.outcome
+        if self.task is None:
+            return "starting"
+        if not self.source_done:
+            return "fetching_source"
+        if not self.matching_done:
+            return "matching_tracks"
+        if self.destination_playlist_id is None:
+            return "creating_playlist"
+        return "adding_tracks"
+
+    def to_status(self) -> TransferStatus:
+        total = self.total_tracks
+        progress = 100.0 if self.outcome == "completed" else (
+            round(self.processed_tracks / total * 100, 1) if total else 0.0)
+        return TransferStatus(
+            id=self.id,
+            sourcePlatform=self.request.source_platform,
+            destinationPlatform=self.request.destination_platform,
+            sourcePlaylistId=self.request.source_playlist_id,
+            playlistName=self.request.playlist_name,
+            playlistDescription=self.request.playlist_description or "",
+            status=self.stage,
+            progress=progress,
+            totalTracks=total,
+            processedTracks=self.processed_tracks,
+            successfulMatches=self.successful_matches,
+            failedMatches=self.failed_matches,
+            startTime=self.start_time,
+            endTime=self.end_time,
+            error=self.error,
+            destinationPlaylistId=self.destination_playlist_id,
+            mode=self.mode,
+            tracksAdded=self.tracks_added,
+            tracksRemoved=self.tracks_removed,
+            upToDate=self.up_to_date,
+        )
+
+    # --- Pipeline stages ---
+
+    def _ensure_playlist(self) -> asyncio.Future:
+        # Created once, as soon as the source proves readable
+        if self._playlist_task is None:
+            self._playlist_task = asyncio.ensure_future(self._create_playlist())
+        return self._playlist_task
+
+    async def _create_playlist(self) -> str:
+        self.destination_changed = True
+        self.destination_playlist_id = await call_service(
+            self.destination.create_playlist, self.request.playlist_name, self.request.playlist_description or "")
+        return self.destination_playlist_id
+
+    async def _source_snapshot(self) -> Optional[str]:
+        """The source's own version marker, or None where the platform has none."""
+        get_snapshot = getattr(self.source, "get_playlist_snapshot", None)
+        if get_snapshot is None:
+            return None
+        try:
+            return await call_service(get_snapshot, self.request.source_playlist_id)
+        except Exception as e:
+            # Without it the next sync compares track lists instead
+            logger.warning("Could not read the source snapshot for %s: %s", self.id, e)
+            return None
+
+    async def _save_sync_state(self):
+        snapshot = self._snapshot or track_list_hash(source_id for source_id, _ in self._synced)
+        key = (self.request.source_platform, self.request.source_playlist_id,
+               self.request.destination_platform, self.destination_playlist_id)
+        try:
+            await sync_store.save(key, snapshot, self.request.playlist_name, self._synced)
+        except Exception as e:
+            # The transfer itself succeeded; only a later incremental sync is affected
+            logger.warning("Could not save sync state for %s: %s", self.id, e)
+
+    async def _fetch_source(self, match_queue: asyncio.Queue, workers: int):
+        # Read before the tracks, so a change made mid-fetch shows up on the next sync
+        self._snapshot = await self._source_snapshot()
+        index = 0
+        async for page in self.source.iter_playlist_tracks(self.request.source_playlist_id):
+            self._ensure_playlist()
+            tracks = [t for t in (self.source_mapper(item) for item in page) if t is not None]
+            if not tracks:
+                continue
+            known = await self.matcher.lookup_page(tracks, self.id)
+            self.total_tracks += len(tracks)
+            await match_queue.put((index, tracks, known))
+            index += len(tracks)
+        self.source_done = True
+        for _ in range(workers):
+            await match_queue.put(_DONE)
+
+    def _count(self, track: Track, result: MatchResult) -> Optional[str]:
+        """Tallies one match result; returns the destination ID, if any."""
+        if isinstance(result, Exception):
+            self.failed_matches.append(FailedMatch(track=track, reason=f"Search failed: {result}"))
+            return None
+        if result is None:
+            self.failed_matches.append(FailedMatch(track=track, reason="No match found on destination"))
+        else:
+            self.successful_matches += 1
+        return result
+
+    async def _match(self, match_queue: asyncio.Queue, add_queue: asyncio.Queue):
+        while True:
+            item = await match_queue.get()
+            if item is _DONE:
+                await add_queue.put(_DONE)
+                return
+            start, tracks, known = item
+            results = await self.matcher.match_page(tracks, known)
+            for offset, (track, result) in enumerate(zip(tracks, results)):
+                await add_queue.put((start + offset, track.id, self._count(track, result)))
+
+    async def _add(self, add_queue: asyncio.Queue, workers: int):
+        # Matchers finish out of order; a reorder buffer releases tracks in
+        # source order so the destination playlist keeps the original order.
+        batch_size = ADD_BATCH_SIZE.get(self.request.destination_platform, 100)
+        pending: Dict[int, SyncItem] = {}
+        next_index, batch, finished = 0, [], 0
+
+        while finished < workers:
+            item = await add_queue.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            index, source_id, destination_id = item
+            pending[index] = (source_id, destination_id)
+            while next_index in pending:
+                source_id, destination_id = pending.pop(next_index)
+                self._synced.append((source_id, destination_id))
+                next_index += 1
+                if destination_id is not None:
+                    batch.append(destination_id)
+                if len(batch) >= batch_size:
+                    await self._write(batch)
+                    batch = []
+        self.matching_done = True
+
+        playlist_id = await self._ensure_playlist()
+        if batch:
+            await self._write(batch)
+        return playlist_id
+
+    async def _write(self, batch: List[str]):
+        playlist_id = await self._ensure_playlist()
+        await call_service(self.destination.add_tracks, playlist_id, batch)
+        self.tracks_added += len(batch)
+
+    async def run(self):
+        workers = PLATFORM_CONCURRENCY.get(self.request.destination_platform, 4)
+        # Source pages waiting for a matcher; each holds up to a page of tracks
+        match_queue: asyncio.Queue = asyncio.Queue(maxsize=workers)
+        add_queue: asyncio.Queue = asyncio.Queue(maxsize=STAGE_QUEUE_SIZE)
+        stages = [
+            asyncio.ensure_future(self._fetch_source(match_queue, workers)),
+            *(asyncio.ensure_future(self._match(match_queue, add_queue)) for _ in range(workers)),
+            asyncio.ensure_future(self._add(add_queue, workers)),
+        ]
+        try:
+            await asyncio.gather(*stages)
+            await self._save_sync_state()
+            self.outcome = "completed"
+        except asyncio.CancelledError:
+            self.outcome = "cancelled"
+        except Exception as e:
+            logger.error("Transfer %s failed: %s", self.id, e)
+            self.error = str(e)
+            self.outcome = "failed"
+        finally:
+            for stage in stages:
+                stage.cancel()
+            if self._playlist_task is not None and not self._playlist_task.done():
+                self._playlist_task.cancel()
+            await self._forget_destination_listing()
+            self.end_time = _now()
+
+    async def _forget_destination_listing(self):
+        if self.destination_changed:
+            await forget_playlist_listing(self.request.destination_platform, self.destination_cache_key, self.id)
+
+
+class SyncJob(TransferJob):
+    """
+    Incremental re-sync of a playlist pair an earlier transfer created.
+
+    Stops after one call when the source snapshot is unchanged. Otherwise it
+    reads the source, matches only tracks it has not mapped before (or
+    could not match last time), removes destination tracks whose source
+    tracks are gone and appends the new ones. Adds go to the end of the
+    destination playlist; existing tracks are not reordered.
+    """
+
+    mode = "incremental"
+
+    def __init__(self, request: TransferRequest, source, source_mapper: Callable,
+                 destination, destination_mapper: Callable, destination_playlist_id: str, record: SyncRecord,
+                 destination_cache_key: Optional[str] = None):
+        super().__init__(request, source, source_mapper, destination, destination_mapper, destination_cache_key)
+        self.destination_playlist_id = destination_playlist_id
+        self.record = record
+
+    def _finish_unchanged(self):
+        self.up_to_date = True
+        self.source_done = self.matching_done = True
+        self.successful_matches = sum(1 for _, destination_id in self.record.items if destination_id is not None)
+        self.total_tracks = len(self.record.items)
+
+    async def _match_new(self, tracks: List[Track]) -> Dict[str, Optional[str]]:
+        known = await self.matcher.lookup_page(tracks, self.id)
+        results = await self.matcher.match_page(tracks, known)
+        return {track.id: self._count(track, result) for track, result in zip(tracks, results)}
+
+    async def _sync(self):
+        self._snapshot = await self._source_snapshot()
+        if self._snapshot is not None and self._snapshot == self.record.snapshot:
+            self._finish_unchanged()
+            return
+
+        tracks: List[Track] = []
+        async for page in self.source.iter_playlist_tracks(self.request.source_playlist_id):
+            tracks.extend(t for t in (self.source_mapper(item) for item in page) if t is not None)
+        self.source_done = True
+        self.total_tracks = len(tracks)
+        if self._snapshot is None and track_list_hash(t.id for t in tracks) == self.record.snapshot:
+            self._finish_unchanged()
+            return
+
+        previous = dict(self.record.items)
+        self.successful_matches = sum(1 for t in tracks if previous.get(t.id) is not None)
+        unmapped = list({t.id: t for t in tracks if previous.get(t.id) is None}.values())
+        matches = await self._match_new(unmapped)
+        self.matching_done = True
+
+        self._synced = [(t.id, previous[t.id] if previous.get(t.id) is not None else matches.get(t.id))
+                        for t in tracks]
+        kept = {destination_id for _, destination_id in self._synced if destination_id is not None}
+        # A destination track stays if any current source track still maps to it
+        removed = list(dict.fromkeys(destination_id for source_id, destination_id in self.record.items
+                                     if destination_id is not None and destination_id not in kept))
+        existing = {destination_id for destination_id in previous.values() if destination_id is not None}
+        added = list(dict.fromkeys(matches[t.id] for t in unmapped
+                                   if matches.get(t.id) is not None and matches[t.id] not in existing))
+
+        remove_tracks = getattr(self.destination, "remove_tracks", None)
+        if removed and remove_tracks is not None:
+            self.destination_changed = True
+            await call_service(remove_tracks, self.destination_playlist_id, removed)
+            self.tracks_removed = len(removed)
+        elif removed:
+            logger.warning("%s can't remove playlist tracks; %d stale tracks left in %s",
+                           self.request.destination_platform, len(removed), self.destination_playlist_id)
+        if added:
+            self.destination_changed = True
+            await call_service(self.destination.add_tracks, self.destination_playlist_id, added)
+            self.tracks_added = len(added)
+        await self._save_sync_state()
+
+    async def run(self):
+        try:
+            await self._sync()
+            self.outcome = "completed"
+        except asyncio.CancelledError:
+            self.outcome = "cancelled"
+        except Exception as e:
+            logger.error("Sync %s failed: %s", self.id, e)
+            self.error = str(e)
+            self.outcome = "failed"
+        finally:
+            await self._forget_destination_listing()
+            self.end_time = _now()
+
+
+# Status models by name, for statuses read back from the shared state
+STATUS_MODELS = {model.__name__: model for model in (TransferStatus, LibraryTransferStatus)}
+FINISHED_STAGES = ("completed", "failed", "cancelled")
+
+
+class TransferEngine:
+    """
+    Registry of transfer jobs running as background tasks in this process.
+
+    With a shared `store`, each job's status is mirrored there while it
+    runs, so a worker other than the one running the job can report on it
+    and cancel it (through a flag the running worker picks up).
+    """
+
+    def __init__(self, max_jobs: int = MAX_JOBS, store=None):
+        self.max_jobs = max_jobs
+        self.store = store
+        self._jobs: "OrderedDict[str, TransferJob]" = OrderedDict()
+
+    def start(self, job: TransferJob) -> TransferJob:
+        self._jobs[job.id] = job
+        job.task = asyncio.ensure_future(job.run())
+        if self.store is not None:
+            asyncio.ensure_future(self._publish(job))
+        self._prune()
+        return job
+
+    def get(self, transfer_id: str) -> Optional[TransferJob]:
+        return self._jobs.get(transfer_id)
+
+    async def _publish(self, job):
+        published = None
+        while True:
+            finished = job.task.done()
+            status = job.to_status()
+            record = orjson.dumps({"model": type(status).__name__,
+                                   "status": status.model_dump(mode="json", by_alias=True)})
+            try:
+                if record != published:
+                    await self.store.set(f"transfer:{job.id}", record, STATUS_RETENTION)
+                    published = record
+                if finished:
+                    return
+                if await self.store.get(f"transfer-cancel:{job.id}") is not None:
+                    job.task.cancel()
+            except Exception as e:
+                logger.warning("Could not publish status of transfer %s: %s", job.id, e)
+                if finished:
+                    return
+            await asyncio.wait({job.task}, timeout=STATUS_PUBLISH_INTERVAL)
+
+    async def status(self, transfer_id: str):
+        """The job's TransferStatus / LibraryTransferStatus, wherever it runs; None if unknown."""
+        job = self._jobs.get(transfer_id)
+        if job is not None:
+            return job.to_status()
+        if self.store is None:
+            return None
+        record = await self.store.get(f"transfer:{transfer_id}")
+        if record is None:
+            return None
+        record = orjson.loads(record)
+        model = STATUS_MODELS.get(record["model"])
+        return model.model_validate(record["status"]) if model is not None else None
+
+    async def cancel(self, transfer_id: str) -> bool:
+        job = self._jobs.get(transfer_id)
+        if job is not None:
+            if job.task is None or job.task.done():
+                return False
+            job.task.cancel()
+            return True
+        status = await self.status(transfer_id)
+        if status is None or status.status in FINISHED_STAGES:
+            return False
+        # Running on another worker, which checks for this flag as it publishes
+        await self.store.set(f"transfer-cancel:{transfer_id}", b"1", STATUS_RETENTION)
+        return True
+
+    def _prune(self):
+        # Forget the oldest finished jobs once over capacity
+        for transfer_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[transfer_id].outcome:
+                del self._jobs[transfer_id]
+
+
+transfer_engine = TransferEngine(store=shared_state if shared_state.shared else None)
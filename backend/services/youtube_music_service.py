@@ -1,31 +1,121 @@
 from ytmusicapi import YTMusic
+from ytmusicapi.continuations import CONTINUATION_ITEMS, get_continuation_token
+from ytmusicapi.navigation import (
+    CONTENT, EDITABLE_PLAYLIST_DETAIL_HEADER, HEADER, RESPONSIVE_HEADER, SECTION, SECTION_LIST_ITEM,
+    TAB_CONTENT, TWO_COLUMN_RENDERER, nav,
+)
+from ytmusicapi.parsers.playlists import parse_playlist_header_meta, parse_playlist_items
 import ytmusicapi
-import tempfile
+import asyncio
 import os
+import requests
+from typing import Iterator, List
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+
+from services.rate_scheduler import outbound
+from services.ytmusic_pool import credentials_key
+from services.single_flight import single_flight
+from services.batch_writes import WriteNotApplied, write_chunks_blocking
+from services.metrics import create_thread_pool, upstream_pages
+from services.log import get_logger
+
+# Videos sent per add_playlist_items call (one edit_playlist request each)
+ADD_CHUNK_SIZE = int(os.environ.get("YOUTUBE_MUSIC_ADD_CHUNK_SIZE", "100"))
+# Threads fetching playlist pages. Separate from the asyncio.to_thread pool,
+# so long downloads cannot starve SQLite and the other sync SDK calls.
+FETCH_WORKERS = int(os.environ.get("YOUTUBE_MUSIC_FETCH_WORKERS", "4"))
+
+# Every InnerTube call is a POST; these only read, so they may be resent
+# after a 5xx. Anything else (playlist edits, creation) is a write.
+READ_OPERATIONS = frozenset({"browse", "search", "next", "player", "guide", "account/account_menu",
+                             "music/get_queue", "music/get_search_suggestions"})
+
+logger = get_logger("youtube_music")
+
+fetch_pool = create_thread_pool(FETCH_WORKERS, name="ytmusic_fetch")
+
+
+class YouTubeMusicWriteError(Exception):
+    """A playlist edit YouTube Music answered without SUCCEEDED."""
+
+
+class ScheduledHTTPAdapter(HTTPAdapter):
+    """Sends ytmusicapi's HTTP requests through the outbound rate scheduler."""
+
+    def __init__(self, user_key: str, **kwargs):
+        super().__init__(**kwargs)
+        self.user_key = user_key
+
+    def send(self, request, **kwargs):
+        # ytmusicapi endpoints look like /youtubei/v1/browse; label by the part after v1/
+        operation = urlsplit(request.url).path.split("/youtubei/v1/")[-1] or "request"
+        return outbound.send_blocking(
+            "youtube-music", self.user_key, lambda: super(ScheduledHTTPAdapter, self).send(request, **kwargs),
+            operation, idempotent=request.method == "GET" or operation in READ_OPERATIONS)
+
+
+def scheduled_session(user_key: str) -> requests.Session:
+    session = requests.Session()
+    session.mount("https://", ScheduledHTTPAdapter(user_key))
+    return session
+
+
+class YTMusicClient(YTMusic):
+    """YTMusic that can also hand back a playlist one continuation page at a time."""
+
+    def iter_playlist_pages(self, playlistId: str) -> Iterator[List[dict]]:
+        """
+        Yields the playlist's tracks page by page (about 100 each), following
+        continuations to the end, in the format of get_playlist()["tracks"].
+        """
+        browse_id = playlistId if playlistId.startswith("VL") else "VL" + playlistId
+        response = self._send_request("browse", {"browseId": browse_id})
+        try:
+            # Same layout get_playlist() reads; only what the tracks need
+            header_data = nav(response, [*TWO_COLUMN_RENDERER, *TAB_CONTENT, *SECTION_LIST_ITEM])
+            if EDITABLE_PLAYLIST_DETAIL_HEADER[0] in header_data:
+                header = nav(header_data, [*EDITABLE_PLAYLIST_DETAIL_HEADER, *HEADER, *RESPONSIVE_HEADER])
+            else:
+                header = nav(header_data, RESPONSIVE_HEADER)
+            is_collaborative = "collaborators" in parse_playlist_header_meta(header)
+            section_list = nav(response, [*TWO_COLUMN_RENDERER, "secondaryContents", *SECTION])
+            shelf = nav(section_list, [*CONTENT, "musicPlaylistShelfRenderer"])
+        except (KeyError, IndexError, TypeError):
+            # Other layouts (e.g. album audio playlists): let ytmusicapi read it whole
+            yield self.get_playlist(playlistId, limit=None)["tracks"]
+            return
+
+        contents = shelf.get("contents")
+        while contents:
+            tracks = parse_playlist_items(contents, is_collaborative=is_collaborative)
+            if tracks:
+                yield tracks
+            token = get_continuation_token(contents)
+            if not token:
+                return
+            response = self._send_request("browse", {"continuation": token})
+            contents = nav(response, CONTINUATION_ITEMS, True)
+
 
 class YouTubeMusicService:
-    def __init__(self, headers_raw: str = None, auth_file: str = None):
-        if auth_file and os.path.exists(auth_file):
+    def __init__(self, headers_raw: str = None, auth_file: str = None, client: YTMusic = None):
+        if client is not None:
+            # Reuse a ready client, e.g. one taken from the ytmusic_pool
+            self.client = client
+        elif auth_file and os.path.exists(auth_file):
             # Use existing auth file
-            self.client = YTMusic(auth_file)
+            self.client = YTMusicClient(auth_file, requests_session=scheduled_session(auth_file))
         elif headers_raw:
             # Convert raw headers to browser auth format using ytmusicapi setup
             try:
-                # Create a temporary auth file using ytmusicapi setup
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as temp_file:
-                    temp_path = temp_file.name
-                
-                # Use ytmusicapi setup to create proper auth file
-                auth_config = ytmusicapi.setup(filepath=temp_path, headers_raw=headers_raw)
-                
-                # Initialize client with the generated auth file
-                self.client = YTMusic(temp_path)
-                
-                # Clean up temp file
-                os.unlink(temp_path)
-                
+                # setup() returns the auth config as a JSON string that YTMusic
+                # accepts directly, so no temporary file is needed
+                auth_config = ytmusicapi.setup(headers_raw=headers_raw)
+                session = scheduled_session(credentials_key(headers_raw))
+                self.client = YTMusicClient(auth_config, requests_session=session)
             except Exception as e:
-                print(f"Error setting up YouTube Music authentication: {e}")
+                logger.error("Error setting up YouTube Music authentication: %s", e)
                 self.client = None
         else:
             self.client = None
@@ -41,24 +131,98 @@ class YouTubeMusicService:
             self.client.get_library_playlists(limit=1)
             return True
         except Exception as e:
-            print(f"YouTube Music auth test failed: {e}")
+            logger.warning("YouTube Music auth test failed: %s", e)
             return False
 
+    @single_flight(lambda self: id(self.client))
     def get_user_playlists(self):
         if not self.client:
             raise Exception("YouTube Music client not initialized.")
         
-        # This is a synchronous library, so we call it directly.
-        playlists = self.client.get_library_playlists()
+        # This is a synchronous library, so we call it directly. limit=None
+        # follows continuations past ytmusicapi's default of 25 playlists.
+        playlists = self.client.get_library_playlists(limit=None)
         
         # Here we would map the raw data to a Pydantic model for consistency
         return playlists
 
+    @single_flight(lambda self: id(self.client))
     def get_playlist_tracks(self, playlist_id: str):
         if not self.client:
             raise Exception("YouTube Music client not initialized.")
             
-        playlist = self.client.get_playlist(playlist_id)
-        
-        # Here we would map the raw data to a Pydantic model for consistency
-        return playlist['tracks'] 
\ No newline at end of file
+        # Every page, not just ytmusicapi's default first 100 tracks
+        return [track for page in self.client.iter_playlist_pages(playlist_id) for track in page]
+
+    def search_tracks(self, query: str, limit: int = 5):
+        if not self.client:
+            raise Exception("YouTube Music client not initialized.")
+        return self.client.search(query, filter="songs", limit=limit)
+
+    def create_playlist(self, name: str, description: str = ""):
+        if not self.client:
+            raise Exception("YouTube Music client not initialized.")
+        return self.client.create_playlist(name, description)
+
+    def add_tracks(self, playlist_id: str, track_ids) -> int:
+        """
+        Appends videos in ordered chunks of ADD_CHUNK_SIZE and returns the
+        number of calls. ytmusicapi reports some failures in the response
+        body instead of raising; those are raised here, and not retried.
+        """
+        if not self.client:
+            raise Exception("YouTube Music client not initialized.")
+
+        def write(chunk):
+            try:
+                response = self.client.add_playlist_items(playlist_id, chunk)
+            except requests.exceptions.ConnectTimeout as e:
+                raise WriteNotApplied(str(e)) from e
+            if "SUCCEEDED" not in str(response.get("status", "")):
+                raise YouTubeMusicWriteError(
+                    f"Adding tracks to YouTube Music playlist failed: {response.get('status')}")
+            return response
+
+        return write_chunks_blocking(list(track_ids), ADD_CHUNK_SIZE, write)
+
+    def remove_tracks(self, playlist_id: str, track_ids) -> int:
+        """
+        Removes every occurrence of the videos. YouTube Music removes by
+        setVideoId (the playlist entry), so the playlist is read first to
+        find the entries. Returns the number of removal calls.
+        """
+        if not self.client:
+            raise Exception("YouTube Music client not initialized.")
+        video_ids = set(track_ids)
+        entries = [{"videoId": t["videoId"], "setVideoId": t["setVideoId"]}
+                   for page in self.client.iter_playlist_pages(playlist_id) for t in page
+                   if t.get("videoId") in video_ids and t.get("setVideoId")]
+
+        def write(chunk):
+            try:
+                response = self.client.remove_playlist_items(playlist_id, chunk)
+            except requests.exceptions.ConnectTimeout as e:
+                raise WriteNotApplied(str(e)) from e
+            if "SUCCEEDED" not in str(response):
+                raise YouTubeMusicWriteError(f"Removing tracks from YouTube Music playlist failed: {response}")
+            return response
+
+        return write_chunks_blocking(entries, ADD_CHUNK_SIZE, write)
+
+    async def iter_playlist_tracks(self, playlist_id: str):
+        """
+        Async-generator counterpart of get_playlist_tracks, yielding each
+        continuation page as soon as it arrives. Pages are fetched on
+        fetch_pool, one request at a time, so a thread is only held per page
+        and several playlists can download side by side.
+        """
+        if not self.client:
+            raise Exception("YouTube Music client not initialized.")
+        loop = asyncio.get_running_loop()
+        pages = self.client.iter_playlist_pages(playlist_id)
+        while True:
+            page = await loop.run_in_executor(fetch_pool, next, pages, None)
+            if page is None:
+                return
+            upstream_pages.inc("youtube-music")
+            yield page
@@ -0,0 +1,57 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+MAX_POOL_SIZE = int(os.environ.get("YTM_CLIENT_POOL_SIZE", "256"))
+
+
+def credentials_key(headers_raw: str) -> str:
+    """Stable key for a set of YouTube Music browser headers."""
+    return hashlib.sha256(headers_raw.encode("utf-8")).hexdigest()
+
+
+class YTMusicClientPool:
+    """
+    Process-wide LRU of ready-to-use YTMusic clients keyed by credentials hash.
+
+    Each entry expires at the session's `youtube_music_auth.expires_at`, so a
+    pooled client never outlives the login it was built from. Sync FastAPI
+    dependencies run in a thread pool, hence the lock.
+    """
+
+    def __init__(self, max_size: int = MAX_POOL_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            client, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return client
+
+    def put(self, key: str, client: Any, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (client, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+ytmusic_pool = YTMusicClientPool()
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Tests import the backend modules the way the app does, from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("SPOTIFY_CLIENT_ID", "test-client-id")
+os.environ.setdefault("SPOTIFY_CLIENT_SECRET", "test-client-secret")
+os.environ.setdefault("APPLE_DEVELOPER_TOKEN", "test-developer-token")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
@@ -0,0 +1,32 @@
+import asyncio
+
+import httpx
+
+from benchmarks.mock_apple_music import build_apple_music_stand_in
+from routes.playlists import map_apple_music_track
+from services.apple_music_service import AppleMusicService
+
+
+def test_library_tracks_carry_the_catalog_isrc(monkeypatch):
+    stand_in = build_apple_music_stand_in(playlist_count=1, track_count=3)
+    params = []
+
+    async def record(request: httpx.Request):
+        params.append(request.url.params)
+
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=stand_in), event_hooks={"request": [record]})
+    monkeypatch.setattr("services.apple_music_service.get_http_client", lambda: client)
+
+    async def main():
+        service = AppleMusicService("user-token")
+        return [map_apple_music_track(item) async for page in service.iter_playlist_tracks("p.0") for item in page]
+
+    tracks = asyncio.run(main())
+
+    assert [t.isrc for t in tracks] == ["USRC10000000", "USRC10000001", "USRC10000002"]
+    assert params[0]["include"] == "catalog"
+
+
+def test_catalog_songs_keep_their_own_isrc():
+    song = {"id": "1", "type": "songs", "attributes": {"name": "Song", "artistName": "Artist", "isrc": "USRC1"}}
+    assert map_apple_music_track(song).isrc == "USRC1"
@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+import pytest
+
+from services.batch_writes import ChunkWriteError, WriteNotApplied, write_chunks, write_chunks_blocking
+
+
+def status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://api.example/playlists/p/tracks")
+    return httpx.HTTPStatusError("failed", request=request, response=httpx.Response(status, request=request))
+
+
+def flaky_writer(first_error: BaseException):
+    calls = []
+
+    def write(chunk):
+        calls.append(chunk)
+        if len(calls) == 1:
+            raise first_error
+
+    return write, calls
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr("services.batch_writes.backoff_delay", lambda attempt, retry_after=None: 0)
+
+
+@pytest.mark.parametrize("error", [httpx.ReadTimeout("slow"), status_error(502), Exception("unknown")])
+def test_appends_are_not_replayed_when_they_may_have_applied(error):
+    write, calls = flaky_writer(error)
+
+    async def write_async(chunk):
+        write(chunk)
+
+    with pytest.raises(ChunkWriteError) as raised:
+        asyncio.run(write_chunks(["a", "b"], 1, write_async))
+    assert raised.value.written == 0 and len(calls) == 1
+
+    write, calls = flaky_writer(error)
+    with pytest.raises(ChunkWriteError):
+        write_chunks_blocking(["a", "b"], 1, write)
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("error", [httpx.ConnectError("refused"), status_error(429), WriteNotApplied("unsent")])
+def test_appends_that_did_not_apply_are_retried(error):
+    write, calls = flaky_writer(error)
+
+    async def write_async(chunk):
+        write(chunk)
+
+    assert asyncio.run(write_chunks(["a", "b"], 1, write_async)) == 2
+    assert calls == [["a"], ["a"], ["b"]]
+
+    write, calls = flaky_writer(error)
+    assert write_chunks_blocking(["a", "b"], 1, write) == 2
+    assert calls == [["a"], ["a"], ["b"]]
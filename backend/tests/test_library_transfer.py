@@ -0,0 +1,101 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+import services.transfer_service as transfer_service
+from models.playlist import Playlist, Track
+from models.transfer import LibraryTransferRequest
+from services.library_transfer import LibraryPlaylist, LibraryTransferJob
+from services.track_index import TrackIndex
+
+TRACKS = [Track(id=f"t{n}", title=f"Song {n}", artist="Artist", durationMs=180000, isrc=f"USRC1000000{n}")
+          for n in range(3)]
+
+
+class SharedTracksSource:
+    """Every playlist holds the same tracks."""
+
+    async def iter_playlist_tracks(self, playlist_id: str):
+        yield TRACKS
+
+
+class FailingMatcher:
+    async def lookup_page(self, tracks, job_id=""):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("track index unavailable")
+
+
+def test_failed_lookup_does_not_strand_playlists_sharing_its_tracks():
+    job = LibraryTransferJob(LibraryTransferRequest(sourcePlatform="spotify", destinationPlatform="apple-music"),
+                             SharedTracksSource(), lambda track: track, None, None, None)
+    job.matcher = FailingMatcher()
+    first, second = (LibraryPlaylist(Playlist.model_construct(id=i, name=i)) for i in ("a", "b"))
+
+    async def main():
+        queue = asyncio.Queue()
+        fetching = asyncio.ensure_future(job._fetch(first, queue))
+        await asyncio.sleep(0)  # first registers the tracks, then waits on the lookup
+        shared = await job._fetch(second, queue)
+        with pytest.raises(RuntimeError):
+            await fetching
+        return await asyncio.wait_for(asyncio.gather(*shared), timeout=1)
+
+    assert asyncio.run(main()) == [None] * len(TRACKS)
+    assert [f.reason for f in job.failed_matches] == ["Lookup failed: track index unavailable"] * len(TRACKS)
+
+
+class Library(SharedTracksSource):
+    async def get_user_playlists(self):
+        return [Playlist.model_construct(id=i, name=i, description="") for i in ("a", "b")]
+
+
+class Destination:
+    def __init__(self):
+        self.added = {}
+
+    async def search_tracks(self, query):
+        title = query.rsplit(" ", 1)[0]
+        return [Track(id=f"d-{title}", title=title, artist="Artist", durationMs=180000)]
+
+    async def create_playlist(self, name, description):
+        return f"dest-{name}"
+
+    async def add_tracks(self, playlist_id, track_ids):
+        self.added.setdefault(playlist_id, []).extend(track_ids)
+
+
+class UnwritableIndex(TrackIndex):
+    async def record(self, *args, **kwargs):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_a_failing_match_page_settles_its_tracks(tmp_path, monkeypatch):
+    monkeypatch.setattr(transfer_service, "track_index", UnwritableIndex(str(tmp_path / "index.sqlite3")))
+    destination = Destination()
+    job = LibraryTransferJob(LibraryTransferRequest(sourcePlatform="spotify", destinationPlatform="apple-music"),
+                             Library(), lambda track: track, lambda playlist: playlist,
+                             destination, lambda track: track)
+
+    asyncio.run(asyncio.wait_for(job.run(), timeout=5))
+
+    assert job.outcome == "completed"
+    assert [p.status for p in job.playlists] == ["completed", "completed"]
+    assert destination.added == {}
+    assert {f.reason for f in job.failed_matches} == {"Search failed: database is locked"}
+
+
+def test_a_stopped_matcher_fails_the_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(transfer_service, "track_index", TrackIndex(str(tmp_path / "index.sqlite3")))
+    job = LibraryTransferJob(LibraryTransferRequest(sourcePlatform="spotify", destinationPlatform="apple-music"),
+                             Library(), lambda track: track, lambda playlist: playlist,
+                             Destination(), lambda track: track)
+
+    async def broken_match(match_queue):
+        raise RuntimeError("matcher crashed")
+
+    job._match = broken_match
+    asyncio.run(asyncio.wait_for(job.run(), timeout=5))
+
+    assert job.outcome == "failed"
+    assert job.error == "A track matcher stopped: matcher crashed"
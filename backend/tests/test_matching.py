@@ -0,0 +1,73 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import services.matching as matching
+import services.transfer_service as transfer_service
+from models.playlist import Track
+from services.matching import normalize
+from services.track_index import TrackIndex
+from services.transfer_service import TrackMatcher
+
+
+@pytest.mark.parametrize("title", [
+    "Song - Remastered 2011", "Song - 2011 Remaster", "Song - Live at Wembley", "Song (Live)",
+    "Song [2009 Remaster]", "Song - Radio Edit", "Song - 2009", "Song - Single Version",
+])
+def test_version_tags_are_stripped(title):
+    assert normalize(title) == "song"
+
+
+def test_titles_with_a_dash_keep_their_words():
+    assert normalize("Left - Live Forever") == "left live forever"
+
+
+class SearchDestination:
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.queries = []
+
+    async def search_tracks(self, query):
+        self.queries.append(query)
+        if query in self.fail:
+            raise RuntimeError("search unavailable")
+        title = query.rsplit(" ", 1)[0]
+        return [Track(id=f"d-{title}", title=title, artist="Artist", durationMs=180000)]
+
+
+def test_a_page_is_scored_in_one_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(transfer_service, "track_index", TrackIndex(str(tmp_path / "index.sqlite3")))
+    batches = []
+
+    def best_matches(sources, candidates):
+        batches.append(len(sources))
+        return [(0, 1.0)] * len(sources)
+
+    monkeypatch.setattr(transfer_service, "best_matches", best_matches)
+    tracks = [Track(id=f"t{n}", title=f"Song{n}", artist="Artist", durationMs=180000) for n in range(5)]
+    destination = SearchDestination(fail={"Song3 Artist"})
+    matcher = TrackMatcher("spotify", "apple-music", destination, lambda track: track)
+
+    results = asyncio.run(matcher.match_page(tracks))
+
+    assert batches == [4]
+    assert [r for n, r in enumerate(results) if n != 3] == ["d-Song0", "d-Song1", "d-Song2", "d-Song4"]
+    assert isinstance(results[3], RuntimeError)
+    # The recorded matches are reused without another search
+    assert asyncio.run(matcher.match(tracks[0])) == "d-Song0"
+    assert len(destination.queries) == 5
+
+
+def test_large_batches_score_the_same_in_the_process_pool(monkeypatch):
+    sources = [(f"Song {n}", "Artist", "Album", 180000, None) for n in range(8)]
+    candidates = [[(f"Song {n + k}", "Artist", "Album", 181000, None) for k in range(3)] for n in range(8)]
+    serial = matching.score_batch(sources, candidates)
+
+    monkeypatch.setattr(matching, "PROCESS_POOL_MIN_PAIRS", 1)
+    monkeypatch.setattr(matching, "PROCESS_POOL_WORKERS", 2)
+    monkeypatch.setattr(matching, "CHUNK_SOURCES", 2)
+    pooled = matching.score_batch(sources, candidates)
+
+    assert matching._get_process_pool()._mp_context.get_start_method() == "forkserver"
+    assert np.array_equal(serial, pooled)
@@ -0,0 +1,73 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from services.rate_scheduler import OutboundScheduler
+from services.shared_state import SQLiteSharedState
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+
+def test_blocking_sends_outnumbering_the_executor_complete_with_sqlite(tmp_path):
+    # Each blocking send holds a default-executor thread while it waits for a
+    # token; the shared bucket must not need one of those threads to grant it
+    store = SQLiteSharedState(str(tmp_path / "shared.sqlite3"))
+    scheduler = OutboundScheduler({"youtube-music": (1000.0, 1000)}, shared=store)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=4))
+        scheduler.attach(loop)
+        calls = [asyncio.to_thread(scheduler.send_blocking, "youtube-music", "user", FakeResponse)
+                 for _ in range(8)]
+        return await asyncio.wait_for(asyncio.gather(*calls), timeout=10)
+
+    responses = asyncio.run(main())
+    assert [r.status_code for r in responses] == [200] * 8
+
+
+def run_send(monkeypatch, outcomes, idempotent):
+    """Sends once through a fresh scheduler; `outcomes` are status codes or exceptions, one per attempt."""
+    monkeypatch.setattr("services.rate_scheduler.backoff_delay", lambda attempt, retry_after=None: 0)
+    scheduler = OutboundScheduler({"spotify": (1000.0, 1000)})
+    request = httpx.Request("POST", "https://api.example/playlists")
+    attempts = []
+
+    async def send():
+        outcome = outcomes[len(attempts)]
+        attempts.append(outcome)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, request=request)
+
+    async def main():
+        return await scheduler.send("spotify", "user", send, "write", idempotent=idempotent)
+
+    try:
+        return asyncio.run(main()), attempts
+    except httpx.TransportError as e:
+        return e, attempts
+
+
+def test_writes_are_not_resent_after_a_5xx(monkeypatch):
+    response, attempts = run_send(monkeypatch, [502, 201], idempotent=False)
+    assert response.status_code == 502 and attempts == [502]
+
+
+def test_writes_are_not_resent_after_a_read_timeout(monkeypatch):
+    error, attempts = run_send(monkeypatch, [httpx.ReadTimeout("slow"), 201], idempotent=False)
+    assert isinstance(error, httpx.ReadTimeout) and len(attempts) == 1
+
+
+def test_writes_are_resent_after_429_and_connect_errors(monkeypatch):
+    response, attempts = run_send(monkeypatch, [429, httpx.ConnectError("refused"), 201], idempotent=False)
+    assert response.status_code == 201 and len(attempts) == 3
+
+
+def test_reads_are_resent_after_a_5xx(monkeypatch):
+    response, attempts = run_send(monkeypatch, [502, httpx.ReadTimeout("slow"), 200], idempotent=True)
+    assert response.status_code == 200 and len(attempts) == 3
@@ -0,0 +1,50 @@
+import asyncio
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from services.session_store import MemorySessionStore, ServerSessionMiddleware, rotate_session_id
+
+
+def build_app(store):
+    async def visit(request: Request):
+        request.session["visited"] = True
+        return JSONResponse({})
+
+    async def login(request: Request):
+        request.session["token"] = "secret"
+        rotate_session_id(request)
+        return JSONResponse({})
+
+    async def whoami(request: Request):
+        return JSONResponse(dict(request.session))
+
+    app = Starlette(routes=[Route("/visit", visit), Route("/login", login, methods=["POST"]),
+                            Route("/whoami", whoami)])
+    return ServerSessionMiddleware(app, store=store)
+
+
+def test_login_moves_the_session_to_a_new_id():
+    store = MemorySessionStore()
+
+    async def main():
+        transport = httpx.ASGITransport(app=build_app(store))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await client.get("/visit")
+            planted = client.cookies["session"]
+            response = await client.post("/login")
+            rotated = client.cookies["session"]
+            assert "session=" in response.headers["set-cookie"]
+            assert (await client.get("/whoami")).json() == {"visited": True, "token": "secret"}
+        # Whoever holds the ID issued before the login gets nothing
+        async with httpx.AsyncClient(transport=transport, base_url="http://test",
+                                     cookies={"session": planted}) as attacker:
+            assert (await attacker.get("/whoami")).json() == {}
+        return planted, rotated
+
+    planted, rotated = asyncio.run(main())
+    assert planted != rotated
+    assert len(store) == 1
@@ -0,0 +1,33 @@
+import asyncio
+
+from services.metrics import registry
+from services.single_flight import single_flight
+
+
+class Service:
+    def __init__(self):
+        self.calls = 0
+
+    @single_flight(id)
+    async def fetch(self, item):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return item
+
+
+def exported(outcome: str) -> float:
+    prefix = f'single_flight_calls_total{{outcome="{outcome}"}} '
+    return float(next(line for line in registry.render().splitlines() if line.startswith(prefix))[len(prefix):])
+
+
+def test_concurrent_calls_share_one_upstream_call_and_are_counted():
+    service = Service()
+    executed, coalesced = exported("executed"), exported("coalesced")
+
+    async def main():
+        return await asyncio.gather(*(service.fetch("a") for _ in range(3)))
+
+    assert asyncio.run(main()) == ["a"] * 3
+    assert service.calls == 1
+    assert exported("executed") == executed + 1
+    assert exported("coalesced") == coalesced + 2
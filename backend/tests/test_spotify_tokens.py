@@ -0,0 +1,74 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from services.spotify_tokens import SpotifyReauthRequired, SpotifyTokenManager
+
+
+@pytest.fixture
+def token_endpoint(monkeypatch):
+    """Stands in for Spotify's token endpoint; records every refresh request."""
+    endpoint = SimpleNamespace(requests=[], status=200)
+
+    async def handle(request: httpx.Request):
+        endpoint.requests.append(request)
+        await asyncio.sleep(0.01)
+        if endpoint.status != 200:
+            return httpx.Response(endpoint.status, json={"error": "invalid_grant"})
+        return httpx.Response(200, json={"access_token": f"fresh-{len(endpoint.requests)}", "expires_in": 3600})
+
+    monkeypatch.setattr("services.spotify_tokens.get_http_client",
+                        lambda: httpx.AsyncClient(transport=httpx.MockTransport(handle)))
+    return endpoint
+
+
+def register(manager: SpotifyTokenManager, expires_in: float, **token):
+    token = {"access_token": "old", "refresh_token": "refresh", "expires_at": time.time() + expires_in, **token}
+    manager.current("user", token)
+    return SimpleNamespace(user_key="user", access_token="old")
+
+
+def test_token_is_refreshed_only_when_about_to_expire(token_endpoint):
+    manager = SpotifyTokenManager(margin=300)
+    client = register(manager, expires_in=3000)
+    asyncio.run(manager.ensure_fresh(client))
+    assert client.access_token == "old" and not token_endpoint.requests
+
+    manager = SpotifyTokenManager(margin=300)
+    client = register(manager, expires_in=60)
+    asyncio.run(manager.ensure_fresh(client))
+    assert client.access_token == "fresh-1" and len(token_endpoint.requests) == 1
+    assert manager.current("user", {"expires_at": 0})["refresh_token"] == "refresh"
+
+
+def test_concurrent_requests_share_one_refresh(token_endpoint):
+    manager = SpotifyTokenManager(margin=300)
+    clients = [register(manager, expires_in=60) for _ in range(10)]
+
+    async def main():
+        await asyncio.gather(*(manager.ensure_fresh(client) for client in clients))
+
+    asyncio.run(main())
+    assert len(token_endpoint.requests) == 1
+    assert {client.access_token for client in clients} == {"fresh-1"}
+
+
+@pytest.mark.parametrize("token", [None, {"refresh_token": None}])
+def test_unrefreshable_tokens_ask_for_a_new_login(token_endpoint, token):
+    manager = SpotifyTokenManager()
+    if token is not None:
+        register(manager, expires_in=60, **token)
+    with pytest.raises(SpotifyReauthRequired):
+        asyncio.run(manager.refresh("user"))
+    assert not token_endpoint.requests and manager.counters["failed"] == 1
+
+
+def test_revoked_refresh_token_asks_for_a_new_login(token_endpoint):
+    token_endpoint.status = 400
+    manager = SpotifyTokenManager()
+    register(manager, expires_in=60)
+    with pytest.raises(SpotifyReauthRequired):
+        asyncio.run(manager.refresh("user"))
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import time
+
+from services.track_index import MIN_REUSE_CONFIDENCE, TrackIndex
+
+
+def test_low_confidence_matches_are_not_reused(tmp_path):
+    index = TrackIndex(str(tmp_path / "index.sqlite3"))
+
+    async def main():
+        await index.record("spotify", "fuzzy", None, "apple-music", "a1", MIN_REUSE_CONFIDENCE - 0.1)
+        await index.record("spotify", "sure", None, "apple-music", "a2", MIN_REUSE_CONFIDENCE)
+        await index.record("spotify", "absent", None, "apple-music", None, 0.0)
+        return [await index.lookup("spotify", track, None, "apple-music") for track in ("fuzzy", "sure", "absent")]
+
+    assert asyncio.run(main()) == [TrackIndex.MISS, "a2", None]
+    # Likewise once read back from disk
+    cold = TrackIndex(str(tmp_path / "index.sqlite3"))
+    assert asyncio.run(cold.lookup("spotify", "fuzzy", None, "apple-music")) is TrackIndex.MISS
+    assert asyncio.run(cold.lookup("spotify", "sure", None, "apple-music")) == "a2"
+
+
+def test_memory_hits_do_not_wait_for_sqlite(tmp_path):
+    index = TrackIndex(str(tmp_path / "index.sqlite3"))
+    asyncio.run(index.record("spotify", "t1", "USRC10000001", "apple-music", "a1", 1.0))
+    held = threading.Event()
+
+    def slow_write():
+        with index._db_lock:
+            held.set()
+            time.sleep(0.5)
+
+    writer = threading.Thread(target=slow_write)
+    writer.start()
+    held.wait()
+    started = time.perf_counter()
+    assert asyncio.run(index.lookup("spotify", "t1", "USRC10000001", "apple-music")) == "a1"
+    assert time.perf_counter() - started < 0.25
+    writer.join()
@@ -0,0 +1,170 @@
+import asyncio
+
+import pytest
+
+import services.transfer_service as transfer_service
+from models.playlist import Track
+from models.transfer import TransferRequest
+from services.playlist_cache import PlaylistCache
+from services.sync_store import SyncRecord, SyncStore, track_list_hash
+from services.track_index import TrackIndex
+from services.transfer_service import SyncJob, TransferJob
+
+TRACKS = [Track(id=f"t{n}", title=f"Song{n}", artist="Artist", durationMs=180000) for n in range(3)]
+
+
+class Source:
+    def __init__(self, fail=False):
+        self.fail = fail
+
+    async def iter_playlist_tracks(self, playlist_id):
+        if self.fail:
+            raise RuntimeError("source unavailable")
+        yield TRACKS
+
+
+class Destination:
+    def __init__(self):
+        self.added = []
+
+    async def search_tracks(self, query):
+        title = query.rsplit(" ", 1)[0]
+        return [Track(id=f"d-{title}", title=title, artist="Artist", durationMs=180000)]
+
+    async def create_playlist(self, name, description):
+        return "dest"
+
+    async def add_tracks(self, playlist_id, track_ids):
+        self.added.extend(track_ids)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(transfer_service, "track_index", TrackIndex(str(tmp_path / "index.sqlite3")))
+    monkeypatch.setattr(transfer_service, "sync_store", SyncStore(str(tmp_path / "sync.sqlite3")))
+    cache = PlaylistCache()
+    monkeypatch.setattr(transfer_service, "playlist_cache", cache)
+    return cache
+
+
+def run_transfer(cache, source):
+    request = TransferRequest(sourcePlatform="spotify", destinationPlatform="apple-music",
+                              sourcePlaylistId="src", playlistName="Copy")
+    destination = Destination()
+    job = TransferJob(request, source, lambda track: track, destination, lambda track: track,
+                      destination_cache_key="user")
+
+    async def main():
+        await cache.put("apple-music", "user", [], "before")
+        await job.run()
+        return await cache.get("apple-music", "user")
+
+    return job, destination, asyncio.run(main())
+
+
+def test_transfer_drops_the_cached_destination_playlists(cache):
+    job, destination, cached = run_transfer(cache, Source())
+    assert job.outcome == "completed"
+    assert destination.added == ["d-Song0", "d-Song1", "d-Song2"]
+    assert cached is None
+
+
+def test_transfer_that_wrote_nothing_keeps_the_cache(cache):
+    job, _, cached = run_transfer(cache, Source(fail=True))
+    assert job.outcome == "failed"
+    assert cached is not None
+
+
+class SyncSource:
+    """A source playlist with `tracks`; `snapshot` None means the platform has no version field."""
+
+    def __init__(self, tracks, snapshot=None):
+        self.tracks = tracks
+        self.reads = 0
+        if snapshot is not None:
+            async def get_playlist_snapshot(playlist_id):
+                return snapshot
+            self.get_playlist_snapshot = get_playlist_snapshot
+
+    async def iter_playlist_tracks(self, playlist_id):
+        self.reads += 1
+        yield self.tracks
+
+
+class SyncDestination(Destination):
+    def __init__(self, can_remove=True):
+        super().__init__()
+        self.calls = []
+        if can_remove:
+            async def remove_tracks(playlist_id, track_ids):
+                self.calls.append(("remove", playlist_id, track_ids))
+            self.remove_tracks = remove_tracks
+
+    async def search_tracks(self, query):
+        self.calls.append(("search", query))
+        return await super().search_tracks(query)
+
+    async def add_tracks(self, playlist_id, track_ids):
+        self.calls.append(("add", playlist_id, track_ids))
+
+
+def track(n: int, title: str = None) -> Track:
+    return Track(id=f"t{n}", title=title or f"Song{n}", artist="Artist", durationMs=180000)
+
+
+def run_sync(source, destination, record_items, record_snapshot):
+    request = TransferRequest(sourcePlatform="spotify", destinationPlatform="apple-music",
+                              sourcePlaylistId="src", playlistName="Copy")
+    record = SyncRecord(record_snapshot, "Copy", record_items, 0.0)
+    job = SyncJob(request, source, lambda t: t, destination, lambda t: t, "dest", record)
+    asyncio.run(job.run())
+    saved = asyncio.run(transfer_service.sync_store.load(("spotify", "src", "apple-music", "dest")))
+    return job, saved
+
+
+def test_sync_with_an_unchanged_snapshot_makes_no_calls(cache):
+    source, destination = SyncSource([track(0)], snapshot="snap-1"), SyncDestination()
+    job, saved = run_sync(source, destination, [("t0", "d-Song0"), ("t1", None)], "snap-1")
+
+    assert job.outcome == "completed" and job.up_to_date
+    assert source.reads == 0 and destination.calls == []
+    assert (job.total_tracks, job.successful_matches) == (2, 1)
+    assert saved is None
+
+
+def test_sync_without_snapshots_compares_track_lists(cache):
+    items = [("t0", "d-Song0"), ("t1", "d-Song1")]
+    source, destination = SyncSource([track(0), track(1)]), SyncDestination()
+    job, _ = run_sync(source, destination, items, track_list_hash(["t0", "t1"]))
+
+    assert job.outcome == "completed" and job.up_to_date
+    assert source.reads == 1 and destination.calls == []
+
+
+def test_sync_applies_adds_and_removes_once(cache):
+    items = [("t0", "d-Song0"), ("t1", "d-Song1"), ("t2", None)]
+    # t3 twice; t4 matches a destination track the playlist already has
+    tracks = [track(0), track(3), track(3), track(4, title="Song0")]
+    source, destination = SyncSource(tracks, snapshot="snap-2"), SyncDestination()
+    job, saved = run_sync(source, destination, items, "snap-1")
+
+    assert job.outcome == "completed" and not job.up_to_date
+    assert [c for c in destination.calls if c[0] != "search"] == [
+        ("remove", "dest", ["d-Song1"]),
+        ("add", "dest", ["d-Song3"]),
+    ]
+    assert sorted(c[1] for c in destination.calls if c[0] == "search") == ["Song0 Artist", "Song3 Artist"]
+    assert (job.tracks_added, job.tracks_removed) == (1, 1)
+    assert saved.snapshot == "snap-2"
+    assert saved.items == [("t0", "d-Song0"), ("t3", "d-Song3"), ("t3", "d-Song3"), ("t4", "d-Song0")]
+
+
+def test_sync_to_a_destination_without_removal_still_adds(cache):
+    items = [("t0", "d-Song0"), ("t1", "d-Song1")]
+    source, destination = SyncSource([track(0), track(2)]), SyncDestination(can_remove=False)
+    job, saved = run_sync(source, destination, items, track_list_hash(["t0", "t1"]))
+
+    assert job.outcome == "completed"
+    assert [c for c in destination.calls if c[0] != "search"] == [("add", "dest", ["d-Song2"])]
+    assert (job.tracks_added, job.tracks_removed) == (1, 0)
+    assert saved.snapshot == track_list_hash(["t0", "t2"])
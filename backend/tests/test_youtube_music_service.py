@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from services.youtube_music_service import YTMusicClient
+
+DATA = Path(__file__).parent / "data"
+PLAYLIST_ID = "PLxyTaDz8f5PBc-8kE36gvB-eflhODG2dw"
+
+
+def load(name: str) -> dict:
+    with open(DATA / name, encoding="utf8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """A YTMusicClient whose InnerTube calls are answered from `client.responses`, in order."""
+    client = YTMusicClient()
+    client.requests, client.responses = [], []
+
+    def send_request(endpoint, body, *args, **kwargs):
+        client.requests.append((endpoint, body))
+        return client.responses.pop(0)
+
+    monkeypatch.setattr(client, "_send_request", send_request)
+    return client
+
+
+def test_playlist_pages_follow_continuations_in_order(client):
+    # A recorded collaborative playlist (ytmusicapi's test data), split into
+    # a first page ending in a continuation item and one continuation response
+    client.responses = [load("ytm_playlist_browse.json"), load("ytm_playlist_continuation.json")]
+
+    pages = list(client.iter_playlist_pages(PLAYLIST_ID))
+
+    assert [[t["videoId"] for t in page] for page in pages] == [["lYBUbBu4W08"], ["dQw4w9WgXcQ"]]
+    assert all(t["title"] == "Never Gonna Give You Up" and t["artists"] for page in pages for t in page)
+    assert client.requests == [
+        ("browse", {"browseId": "VL" + PLAYLIST_ID}),
+        ("browse", {"continuation": "4qmFsgKlARIkVkxQTHh5VGFEejhmNVBCYy04a0UzNmd2QjA"}),
+    ]
+    assert not client.responses
+
+
+def test_other_layouts_fall_back_to_get_playlist(client, monkeypatch):
+    client.responses = [{"contents": {"singleColumnBrowseResultsRenderer": {}}}]
+    calls = []
+
+    def get_playlist(playlist_id, limit=100, **kwargs):
+        calls.append((playlist_id, limit))
+        return {"tracks": [{"videoId": "a"}, {"videoId": "b"}]}
+
+    monkeypatch.setattr(client, "get_playlist", get_playlist)
+
+    assert list(client.iter_playlist_pages(PLAYLIST_ID)) == [[{"videoId": "a"}, {"videoId": "b"}]]
+    assert calls == [(PLAYLIST_ID, None)]
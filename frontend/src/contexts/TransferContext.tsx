@@ -1,4 +1,4 @@
-import React, { createContext, useContext, useState, ReactNode, useCallback } from 'react';
+import React, { createContext, useContext, useState, ReactNode, useCallback, useEffect, useRef } from 'react';
 import { TransferStatus, TransferRequest, Playlist, Track, Platform } from '../types';
 import { transferAPI, playlistAPI } from '../services/api';
 
@@ -51,6 +51,16 @@ export const TransferProvider: React.FC<TransferProviderProps> = ({ children })
   const [sourcePlaylistTracks, setSourcePlaylistTracks] = useState<Track[]>([]);
   const [selectedSourcePlaylist, setSelectedSourcePlaylist] = useState<Playlist | null>(null);
 
+  // Open progress stream for the current transfer, if any
+  const statusStream = useRef<EventSource | null>(null);
+
+  const closeStatusStream = useCallback(() => {
+    statusStream.current?.close();
+    statusStream.current = null;
+  }, []);
+
+  useEffect(() => closeStatusStream, [closeStatusStream]);
+
   const startTransfer = useCallback(async (request: TransferRequest): Promise<string> => {
     try {
       setLoading(true);
@@ -59,8 +69,8 @@ export const TransferProvider: React.FC<TransferProviderProps> = ({ children })
       const response = await transferAPI.startTransfer(request);
       const transferId = response.transferId;
       
-      // Start polling for transfer status
-      pollTransferStatus(transferId);
+      // Follow the transfer's progress as the server pushes it
+      watchTransferStatus(transferId);
       
       return transferId;
     } catch (err: any) {
@@ -72,6 +82,36 @@ export const TransferProvider: React.FC<TransferProviderProps> = ({ children })
     }
   }, []);
 
+  const watchTransferStatus = useCallback((transferId: string) => {
+    closeStatusStream();
+    if (typeof EventSource === 'undefined') {
+      pollTransferStatus(transferId);
+      return;
+    }
+
+    // The server sends the status only when it changes (coalesced, at most
+    // every half second), then `end` once the transfer has finished
+    const source = transferAPI.subscribeTransferStatus(transferId);
+    statusStream.current = source;
+    let received = false;
+    source.addEventListener('status', (event) => {
+      received = true;
+      setCurrentTransfer(JSON.parse((event as MessageEvent).data) as TransferStatus);
+    });
+    source.addEventListener('end', () => {
+      source.close();
+      if (statusStream.current === source) statusStream.current = null;
+    });
+    source.onerror = () => {
+      // EventSource reconnects by itself after dropped connections; if the
+      // stream could not be opened at all, fall back to polling
+      if (source.readyState === EventSource.CLOSED && !received) {
+        if (statusStream.current === source) statusStream.current = null;
+        pollTransferStatus(transferId);
+      }
+    };
+  }, [closeStatusStream]);
+
   const pollTransferStatus = useCallback(async (transferId: string) => {
     const poll = async () => {
       try {
@@ -164,12 +204,13 @@ export const TransferProvider: React.FC<TransferProviderProps> = ({ children })
   }, []);
 
   const clearTransferData = useCallback(() => {
+    closeStatusStream();
     setCurrentTransfer(null);
     setSourcePlaylists([]);
     setSourcePlaylistTracks([]);
     setSelectedSourcePlaylist(null);
     setError(null);
-  }, []);
+  }, [closeStatusStream]);
 
   const value: TransferContextType = {
     currentTransfer,
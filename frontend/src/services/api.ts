@@ -74,6 +74,11 @@ export const transferAPI = {
     return response.data as TransferStatus;
   },
 
+  // Subscribe to transfer status updates (server-sent events, sent on change)
+  subscribeTransferStatus: (transferId: string): EventSource => {
+    return new EventSource(`${API_BASE_URL}/api/transfer/events/${transferId}`, { withCredentials: true });
+  },
+
   // Get transfer history
   getTransferHistory: async (): Promise<TransferStatus[]> => {
     const response = await api.get('/api/transfer/history');